@@ -0,0 +1,257 @@
+"""Generate a synthetic history of papers for the benchmarks.
+
+The papers have realistic shapes: several authors drawn from a pool with a
+few prolific authors, affiliations, links, a venue per year and a handful of
+topics. A fraction of the papers, set by the duplication rate, are new
+versions of a recent paper, as when a preprint and its published version are
+scraped separately: the title is reformatted, some author names are
+abbreviated, the venue differs and only the arXiv link is shared. These are
+what the merges have to find.
+
+The output only depends on the number of papers, the duplication rate and
+the seed.
+
+Usage: python benchmarks/generate.py OUTPUT [--papers N] [--duplication R]
+"""
+
+import argparse
+import random
+from collections import deque
+from datetime import datetime
+
+from paperoni.model import (
+    Author,
+    DatePrecision,
+    Institution,
+    InstitutionCategory,
+    Link,
+    Meta,
+    Paper,
+    PaperAuthor,
+    Release,
+    Topic,
+    Venue,
+    VenueType,
+)
+
+SIZES = {"small": 10_000, "medium": 100_000, "large": 1_000_000}
+
+FIRST_NAMES = """
+    Aaron Alice Amir Ana Bruno Camille Chen Daniel Diana Emma Fatima Felix
+    Gabriel Hana Hugo Ian Ines Jian Julia Karim Laura Leo Li Lucas Maria
+    Mehdi Mila Nadia Noah Olga Omar Pascal Paula Quentin Rafael Sara Simon
+    Sofia Tariq Wei Yann Yoshua Zoe
+""".split()
+
+SYLLABLES = """
+    ba be bi bo da de di do fa fe ka ke ki ko la le li lo ma me mi mo na ne
+    ni no ra re ri ro sa se si so ta te ti to va ve vi vo za ze
+""".split()
+
+WORDS = """
+    learning deep neural networks representation generative adversarial
+    models graph attention transformers language vision reinforcement policy
+    optimization stochastic gradient descent variational inference bayesian
+    causal discovery robust efficient scalable sparse recurrent convolutional
+    diffusion contrastive self-supervised semi-supervised transfer meta
+    few-shot continual federated private fair interpretable uncertainty
+    estimation calibration exploration planning control agents multi-agent
+    molecules proteins climate speech audio video segmentation detection
+    retrieval reasoning memory compression pruning quantization distillation
+    kernels manifolds geometry equivariant symmetry dynamics systems networks
+""".split()
+
+TOPICS = [
+    "Machine Learning",
+    "Computer Vision",
+    "Natural Language Processing",
+    "Reinforcement Learning",
+    "Optimization",
+    "Computational Biology",
+    "Robotics",
+    "Theory",
+]
+
+INSTITUTIONS = [
+    ("Mila", InstitutionCategory.academia),
+    ("Université de Montréal", InstitutionCategory.academia),
+    ("McGill University", InstitutionCategory.academia),
+    ("University of Toronto", InstitutionCategory.academia),
+    ("Stanford University", InstitutionCategory.academia),
+    ("ETH Zürich", InstitutionCategory.academia),
+    ("Google DeepMind", InstitutionCategory.industry),
+    ("Microsoft Research", InstitutionCategory.industry),
+    ("Meta AI", InstitutionCategory.industry),
+    ("ServiceNow Research", InstitutionCategory.industry),
+]
+
+VENUES = [
+    ("NeurIPS", VenueType.conference),
+    ("ICML", VenueType.conference),
+    ("ICLR", VenueType.conference),
+    ("AAAI", VenueType.conference),
+    ("CVPR", VenueType.conference),
+    ("ACL", VenueType.conference),
+    ("JMLR", VenueType.journal),
+    ("TMLR", VenueType.journal),
+    ("Nature", VenueType.journal),
+]
+
+# Number of recent papers that may get a duplicate
+DUPLICATE_WINDOW = 10_000
+
+# Date of the scrape recorded in the history
+SCRAPE_DATE = datetime(2024, 1, 1)
+
+
+class Generator:
+    def __init__(self, papers, duplication=0.1, seed=0):
+        self.papers = papers
+        self.duplication = duplication
+        self.rng = random.Random(seed)
+        # One author for every three papers, at least a few hundred
+        self.nauthors = max(300, papers // 3)
+        self.recent = deque(maxlen=DUPLICATE_WINDOW)
+        self.names = {}
+        self.institutions = [
+            Institution(name=name, category=category, aliases=[])
+            for name, category in INSTITUTIONS
+        ]
+
+    def author_name(self, i):
+        if (name := self.names.get(i, None)) is None:
+            rng = random.Random(i)
+            first = rng.choice(FIRST_NAMES)
+            last = "".join(
+                rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))
+            )
+            name = self.names[i] = f"{first} {last.capitalize()}"
+        return name
+
+    def author(self, i, abbreviate=False):
+        name = self.author_name(i)
+        if abbreviate:
+            first, last = name.split(" ", 1)
+            name = f"{first[0]}. {last}"
+        # Half of the authors have an identifier, shared by all versions
+        links = [Link(type="semantic_scholar", link=str(i))] if i % 2 else []
+        return Author(name=name, roles=[], aliases=[], links=links)
+
+    def pick_author(self):
+        # Skewed towards the first authors, who write many papers
+        return int(self.nauthors * self.rng.random() ** 3)
+
+    def title(self):
+        words = self.rng.sample(WORDS, self.rng.randint(5, 10))
+        return " ".join(words).capitalize()
+
+    def venue(self, series, vtype, year, month):
+        return Venue(
+            type=vtype,
+            name=f"{series} {year}",
+            series=series,
+            date=datetime(year, month, 1),
+            date_precision=DatePrecision.month,
+            volume=None,
+            publisher=None,
+            aliases=[],
+            links=[],
+            peer_reviewed=series != "arXiv",
+        )
+
+    def make_paper(self, i, params, duplicate=False):
+        title, authors, year, month, series_index, arxiv = params
+        rng = self.rng
+        if duplicate:
+            title = title.lower() + "."
+            series, vtype = "arXiv", VenueType.preprint
+            status = "preprint"
+            links = [Link(type="arxiv", link=arxiv)]
+        else:
+            series, vtype = VENUES[series_index]
+            status = "published"
+            links = [
+                Link(type="arxiv", link=arxiv),
+                Link(type="doi", link=f"10.5555/bench.{i}"),
+            ]
+        paper_authors = [
+            PaperAuthor(
+                author=self.author(
+                    a, abbreviate=duplicate and rng.random() < 0.5
+                ),
+                affiliations=[self.institutions[a % len(self.institutions)]],
+            )
+            for a in authors
+        ]
+        return Paper(
+            title=title,
+            abstract=" ".join(rng.choices(WORDS, k=rng.randint(30, 60))),
+            authors=paper_authors,
+            releases=[
+                Release(
+                    venue=self.venue(series, vtype, year, month),
+                    status=status,
+                    pages=None,
+                )
+            ],
+            topics=[Topic(name=t) for t in rng.sample(TOPICS, 2)],
+            links=links,
+            citation_count=rng.randint(0, 500),
+        )
+
+    def __iter__(self):
+        rng = self.rng
+        for i in range(self.papers):
+            if self.recent and rng.random() < self.duplication:
+                params = rng.choice(self.recent)
+                yield self.make_paper(i, params, duplicate=True)
+                continue
+            year = rng.randint(2010, 2023)
+            month = rng.randint(1, 12)
+            nauthors = min(1 + int(rng.expovariate(0.3)), 20)
+            authors = list(
+                dict.fromkeys(self.pick_author() for _ in range(nauthors))
+            )
+            arxiv = f"{year % 100:02d}{month:02d}.{i % 100000:05d}"
+            params = (
+                self.title(),
+                authors,
+                year,
+                month,
+                rng.randrange(len(VENUES)),
+                arxiv,
+            )
+            self.recent.append(params)
+            yield self.make_paper(i, params)
+
+
+def generate(papers, duplication=0.1, seed=0):
+    """Yield a Meta entry, then the synthetic papers."""
+    yield Meta(scraper="benchmark", date=SCRAPE_DATE)
+    yield from Generator(papers, duplication=duplication, seed=seed)
+
+
+def write_history(path, papers, duplication=0.1, seed=0):
+    """Write the synthetic papers to path in the history format."""
+    with open(path, "w") as f:
+        for entry in generate(papers, duplication=duplication, seed=seed):
+            f.write(entry.tagged_json() + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("output")
+    parser.add_argument("--papers", type=int, default=SIZES["small"])
+    parser.add_argument("--duplication", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+    write_history(
+        options.output,
+        options.papers,
+        duplication=options.duplication,
+        seed=options.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark the normalization of author names.
+
+The author lists of the papers in a history file are run through the same
+name operations as a merge: associating the authors of two versions of each
+paper, checking the consistency of aliases and picking the best name. The
+operations are timed with and without the cache of normalized forms.
+
+Usage: python benchmarks/names.py [history.jsonl] [--database DB] [--repeat N]
+
+The small history used by the tests is read by default. Pass a paperoni
+database with --database for realistic figures.
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from paperoni import utils
+
+DEFAULT_HISTORY = (
+    Path(__file__).parent.parent / "tests" / "data" / "refine.jsonl"
+)
+
+
+def load_author_lists(path):
+    author_lists = []
+    with open(path, newline="\n") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("__type__") != "Paper":
+                continue
+            author_lists.append(
+                [
+                    [pa["author"]["name"], *pa["author"]["aliases"]]
+                    for pa in entry["authors"]
+                ]
+            )
+    return author_lists
+
+
+def load_author_lists_from_database(path):
+    conn = sqlite3.connect(path)
+    aliases = defaultdict(list)
+    for author_id, alias in conn.execute(
+        "SELECT author_id, alias FROM author_alias"
+    ):
+        aliases[author_id].append(alias)
+    papers = defaultdict(list)
+    for paper_id, author_id, name in conn.execute(
+        """
+        SELECT pa.paper_id, pa.author_id, author.name FROM paper_author AS pa
+        JOIN author ON author.author_id = pa.author_id
+        ORDER BY pa.paper_id, pa.author_position
+        """
+    ):
+        papers[paper_id].append([name, *aliases[author_id]])
+    return list(papers.values())
+
+
+def _variant(name, rng):
+    first, *rest = name.split(" ")
+    if rest and rng.random() < 0.5:
+        return " ".join([f"{first[0]}.", *rest])
+    return name
+
+
+def workload(author_lists, seed=0):
+    rng = random.Random(seed)
+    for authors in author_lists:
+        names = [aliases[0] for aliases in authors]
+        variants = [_variant(name, rng) for name in names]
+        rng.shuffle(variants)
+        utils.associate(names, variants)
+        for aliases in authors:
+            utils.best_name(aliases[0], [*aliases, _variant(aliases[0], rng)])
+            utils.asciiify(aliases[0]).lower()
+
+
+def measure(author_lists, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        workload(author_lists, seed=i)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("history", nargs="?", default=DEFAULT_HISTORY)
+    parser.add_argument("--database", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    if options.database:
+        author_lists = load_author_lists_from_database(options.database)
+    else:
+        author_lists = load_author_lists(options.history)
+    cached = utils.normalized
+    try:
+        # Bypass the cache: the forms are recomputed at every call
+        utils.normalized = utils.NormalizedName
+        uncached_time = measure(author_lists, options.repeat)
+    finally:
+        utils.normalized = cached
+    cached.cache_clear()
+    cached_time = measure(author_lists, options.repeat)
+
+    results = {
+        "papers": len(author_lists),
+        "authors": sum(map(len, author_lists)),
+        "repeat": options.repeat,
+        "uncached": uncached_time,
+        "cached": cached_time,
+        "cache": cached.cache_info()._asdict(),
+    }
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark the import time of the paperoni command line.
+
+The module is imported in fresh interpreters with ``python -X importtime``
+and the median cumulative time of each module is reported, for the module
+itself and for the slowest of the modules it imports.
+
+Usage: python benchmarks/startup.py [--module paperoni.cli] [--repeat N]
+           [--top N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+
+def importtimes(module):
+    """Return the cumulative import time of each module, in seconds."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--module", default="paperoni.cli")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    options = parser.parse_args()
+
+    runs = defaultdict(list)
+    for _ in range(options.repeat):
+        for name, t in importtimes(options.module).items():
+            runs[name].append(t)
+    medians = {name: statistics.median(ts) for name, ts in runs.items()}
+
+    print(f"{options.module}: {medians[options.module] * 1000:.0f}ms")
+    print(f"{len(medians)} modules imported")
+    del medians[options.module]
+    slowest = sorted(medians.items(), key=lambda kv: kv[1], reverse=True)
+    for name, t in slowest[: options.top]:
+        print(f"{t * 1000:8.0f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Benchmark the main operations of paperoni on a synthetic database.
+
+A history of synthetic papers (see generate.py) is imported in a fresh
+database, then the following operations are timed:
+
+* import_all: import of the papers in the database
+* replay: replay of the history in a second database
+* merge.<method>: computation of the merges of each method, and
+  merge.<method>.apply to apply them, in the order of jobs/scrape.sh
+* search.<query>: search() with common filters
+* export: export() of every paper, as done for JSON reports
+* report.<format>: the streaming path behind the /report route
+
+The results are printed as JSON, with the time spent in the instrumented
+stages of paperoni, and can be written to a file to compare commits.
+
+Usage: python benchmarks/suite.py [--size small|medium|large] [--papers N]
+           [--duplication R] [--seed S] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from generate import SIZES, Generator, generate
+
+from paperoni.cli_helper import search
+from paperoni.config import load_config
+from paperoni.db import merge as mergers
+from paperoni.db.database import Database
+from paperoni.export import export
+from paperoni.profiling import Profile
+from paperoni.utils import EquivalenceGroups
+
+MERGES = [
+    ("author_link", mergers.merge_authors_by_shared_link),
+    ("paper_link", mergers.merge_papers_by_shared_link),
+    ("paper_name", mergers.merge_papers_by_name),
+    ("author_name", mergers.merge_authors_by_name),
+    ("venue_link", mergers.merge_venues_by_shared_link),
+    ("author_fuzzy", mergers.merge_authors_fuzzy),
+    ("paper_fuzzy", mergers.merge_papers_fuzzy),
+]
+
+
+def searches(generator):
+    return {
+        "title": {"title": "learning"},
+        # The most prolific author of the synthetic papers
+        "author": {"author": generator.author_name(0)},
+        "affiliation": {"affiliation": "Mila"},
+        "venue": {"venue": "NeurIPS"},
+        "year": {"year": 2020, "sort": "-date"},
+    }
+
+
+class Results:
+    def __init__(self, **info):
+        self.info = info
+        self.timings = {}
+        self.counts = {}
+
+    @contextmanager
+    def timed(self, name):
+        print(f"Running {name}")
+        start = time.perf_counter()
+        yield
+        self.timings[name] = time.perf_counter() - start
+
+    def count(self, db, name):
+        for table in ("paper", "author", "venue"):
+            ((n,),) = db.session.execute(f"SELECT count(*) FROM {table}")
+            self.counts[f"{name}.{table}"] = n
+
+    def json(self, profile):
+        return {
+            **self.info,
+            "timings": self.timings,
+            "counts": self.counts,
+            "stages": profile.summary(),
+        }
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+async def _consume(chunks):
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+    return size
+
+
+def run(results, papers, duplication, seed, workdir):
+    paths = {
+        "database": str(workdir / "paperoni.db"),
+        "history": str(workdir / "history"),
+        "cache": str(workdir / "cache"),
+    }
+    with load_config({"paperoni": {"paths": paths}}) as cfg:
+        with results.timed("generate"):
+            entries = list(generate(papers, duplication, seed))
+
+        db = cfg.database
+        with results.timed("import_all"):
+            db.import_all(entries)
+        del entries
+        with db:
+            results.count(db, "import_all")
+
+        with results.timed("replay"):
+            Database(workdir / "replay.db").replay(history=cfg.paths.history)
+
+        for name, method in MERGES:
+            with db:
+                eqv = EquivalenceGroups()
+                with results.timed(f"merge.{name}"):
+                    method(db, eqv)
+                merges = [*eqv.merges()]
+                results.counts[f"merge.{name}"] = len(merges)
+                with results.timed(f"merge.{name}.apply"):
+                    db.import_all(merges, history_file=False)
+        with db:
+            results.count(db, "merge")
+
+        with db:
+            for name, query in searches(Generator(papers, seed=seed)).items():
+                with results.timed(f"search.{name}"):
+                    n = sum(1 for _ in search(db=db, **query))
+                results.counts[f"search.{name}"] = n
+
+            with results.timed("export"):
+                for paper in search(db=db):
+                    json.dumps(export(paper))
+
+        # Imported here because the web app has more dependencies
+        from paperoni.webapp.report import formatters
+
+        for fmt, formatter in formatters.items():
+            with results.timed(f"report.{fmt}"):
+                size = asyncio.run(_consume(formatter.generate({})))
+            results.counts[f"report.{fmt}.bytes"] = size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--papers", type=int, default=None)
+    parser.add_argument("--duplication", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    options = parser.parse_args()
+
+    papers = options.papers or SIZES[options.size]
+    results = Results(
+        papers=papers,
+        duplication=options.duplication,
+        seed=options.seed,
+        commit=commit(),
+        python=platform.python_version(),
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        with Profile() as profile:
+            run(
+                results,
+                papers,
+                options.duplication,
+                options.seed,
+                Path(workdir),
+            )
+
+    data = json.dumps(results.json(profile), indent=4)
+    print(data)
+    if options.output:
+        Path(options.output).write_text(data + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,3 +16,9 @@ echo Cleaning up $CACHE_PATH
 
 # Clean up downloaded pdfs
 find $CACHE_PATH -name '*.pdf' -delete
+
+# Evict expired and old responses from the HTTP response store
+paperoni cache cleanup --older-than 30
+
+# Delete parsed layouts that are outdated or whose layout file is gone
+paperoni cache documents
@@ -8,7 +8,7 @@ fi
 
 # Acquire and refine papers
 paperoni acquire semantic_scholar
-paperoni merge author_link
+paperoni merge --incremental author_link
 paperoni acquire semantic_scholar_author
 paperoni acquire openreview
 paperoni acquire openreview2
@@ -18,8 +18,8 @@ paperoni acquire jmlr
 paperoni acquire refine --limit 500
 
 # Merge duplicates
-paperoni merge author_link
-paperoni merge paper_link
-paperoni merge paper_name
-paperoni merge author_link
-paperoni merge author_name
+paperoni merge --incremental author_link
+paperoni merge --incremental paper_link
+paperoni merge --incremental paper_name
+paperoni merge --incremental author_link
+paperoni merge --incremental author_name
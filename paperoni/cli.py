@@ -1,11 +1,13 @@
 import json
 import os
 import re
+import sys
 from contextlib import contextmanager
 from datetime import datetime
 from fnmatch import fnmatch
 from functools import partial
 from typing import Union
+from uuid import UUID
 
 from coleo import Option, auto_cli, tooled, with_extras
 from ovld import ovld
@@ -14,6 +16,13 @@ from sqlalchemy import select
 from .cli_helper import query_papers
 from .config import load_config
 from .db import merge as mergers, schema as sch
+from .db.plan import (
+    affected_rows,
+    estimate_time,
+    group_sizes,
+    read_plan,
+    write_plan,
+)
 from .display import (
     HTMLDisplayer,
     JSONDisplayer,
@@ -22,8 +31,10 @@ from .display import (
     display,
 )
 from .mila_upload import misc
-from .sources.helpers import filter_researchers, prepare_interface
-from .sources.scrapers import load_scrapers
+from .model import AuthorMerge, PaperMerge, ScraperData, VenueMerge
+from .profiling import Profile
+from .sources.scrapers import load_scraper, scraper_entry_points
+from .sources.store import ResponseStore
 from .utils import EquivalenceGroups
 
 
@@ -56,9 +67,16 @@ def set_database(tag=None):
 
 
 class ScraperWrapper:
-    def __init__(self, name, scraper):
+    def __init__(self, name, scraper=None):
         self.name = name
         self.scraper = scraper
+        if scraper is None:
+            # Placeholder for a scraper that is not invoked, see main()
+            self.__coleo_extras__ = []
+            return
+
+        from .sources.helpers import filter_researchers, prepare_interface
+
         self.__coleo_extras__ = [
             self.scraper.query,
             self.scraper.acquire,
@@ -80,6 +98,9 @@ class ScraperWrapper:
     def acquire(self):
         dry: Option & bool = False
 
+        # Pick up where the last interrupted acquire stopped
+        resume: Option & bool = False
+
         with set_config(tag=f"acquire_{self.name}") as config:
             if dry:
                 with config.database as db:
@@ -88,8 +109,31 @@ class ScraperWrapper:
                         display(paper)
             else:
                 with config.database as db:
-                    data = list(self.scraper(config, db).acquire())
-                    config.database.import_all(data)
+                    scraper = self.scraper(config, db)
+                    scraper.resume = resume
+                    data = []
+                    unlogged = []
+                    for entry in scraper.acquire():
+                        # Commit everything up to each checkpoint, so that
+                        # it is not lost if the acquire is interrupted. The
+                        # checkpoints and the other bookkeeping entries of
+                        # the scraper are kept out of the history.
+                        if (
+                            isinstance(entry, ScraperData)
+                            and entry.scraper in scraper.unlogged_scopes
+                        ):
+                            unlogged.append(entry)
+                            if entry.scraper == scraper.checkpoint_scope:
+                                db.import_all(data)
+                                db.import_all(unlogged, history_file=False)
+                                db.session.commit()
+                                data = []
+                                unlogged = []
+                        else:
+                            data.append(entry)
+                    db.import_all(data)
+                    db.import_all(unlogged, history_file=False)
+                    scraper.clear_checkpoints()
 
     @tooled
     def prepare(self):
@@ -396,6 +440,97 @@ class report:
         run_sql_query(query)
 
 
+class cache:
+    def stats():
+        """Show the contents of the HTTP response store."""
+        with set_config() as config:
+            if not config.paths.requests_cache:
+                exit("No request cache is configured.")
+            store = ResponseStore(config.paths.requests_cache)
+            for host, count, size in store.stats():
+                print(f"{host}: {count} responses, {size / 1e6:.1f} MB")
+
+    def cleanup():
+        """Evict old responses from the HTTP response store."""
+        # Evict responses older than this number of days
+        older_than: Option & float = None
+
+        # Evict the oldest responses until the store is under this size (MB)
+        max_size: Option & float = None
+
+        # Evict all responses from these hosts
+        # [nargs: *]
+        host: Option = []
+
+        # Clean up the permanent request cache instead
+        permanent: Option & bool = False
+
+        with set_config() as config:
+            if permanent:
+                path = config.paths.permanent_requests_cache
+            else:
+                path = config.paths.requests_cache
+            if not path:
+                exit("No request cache is configured.")
+            results = ResponseStore(path).cleanup(
+                older_than=older_than,
+                max_size=max_size and max_size * 1e6,
+                hosts=host,
+            )
+            print(
+                f"Evicted {results['evicted']} responses,"
+                f" deleted {results['deleted']} files"
+            )
+
+    def documents():
+        """Delete outdated parsed layouts from the PDF cache."""
+        from .sources.scrapers.pdftools import cleanup_documents
+
+        with set_config() as config:
+            if not config.paths.cache:
+                exit("No cache is configured.")
+            deleted = cleanup_documents(config.paths.cache)
+            print(f"Deleted {deleted} cached documents")
+
+
+merge_tables = {
+    AuthorMerge: (sch.Author, "author_id", "name"),
+    PaperMerge: (sch.Paper, "paper_id", "title"),
+    VenueMerge: (sch.Venue, "venue_id", "name"),
+}
+
+
+def report_merges(db, eqv):
+    """Print the groups of entries that would be merged."""
+    groups = eqv.groups()
+    for main, entries in groups.items():
+        table, id_field, name_field = merge_tables[eqv.classes[main]]
+        column = getattr(table, id_field)
+        ids = [
+            e.id if isinstance(e.id, bytes) else UUID(str(e.id)).bytes
+            for e in entries
+        ]
+        stmt = select(table).filter(column.in_(ids))
+        print(f"Would merge {len(entries)} IDs for {eqv.names[main]}")
+        for (row,) in db.session.execute(stmt):
+            print(
+                f"    {getattr(row, id_field).hex()} {getattr(row, name_field)}"
+            )
+    print(f"{len(groups)} merges")
+
+
+def report_plan(db, merges):
+    """Print the statistics of a list of merges and the time to apply them."""
+    rows = affected_rows(db, merges)
+    for cls, histogram in group_sizes(merges).items():
+        print(f"{cls.__name__}: {sum(histogram.values())} merges")
+        sizes = ", ".join(f"{n} of {b}" for b, n in histogram.items())
+        print(f"    Groups by number of IDs: {sizes}")
+        for table, count in rows[cls].items():
+            print(f"    {table}: {count} rows")
+    print(f"Estimated time: {estimate_time(db, merges):.2f}s")
+
+
 def merge():
     # Merging methods to use
     # [positional: *]
@@ -404,11 +539,26 @@ def merge():
     # List the methods
     list: Option & bool = False
 
+    # Report the merges that would be done, without doing them
+    dry: Option & bool = False
+
+    # Only consider the entries acquired since the last run of each method
+    incremental: Option & bool = False
+
+    # Write the merges to this file with a report, instead of applying them
+    plan: Option = None
+
+    # Apply the merges in a file written with --plan
+    apply: Option = None
+
     method_map = {
         "paper_link": mergers.merge_papers_by_shared_link,
         "paper_name": mergers.merge_papers_by_name,
+        "paper_fuzzy": mergers.merge_papers_fuzzy,
+        "paper_fuzzy_abstract": mergers.merge_papers_fuzzy_with_abstract,
         "author_link": mergers.merge_authors_by_shared_link,
         "author_name": mergers.merge_authors_by_name,
+        "author_fuzzy": mergers.merge_authors_fuzzy,
         # "author_position": mergers.merge_authors_by_position,
         "venue_link": mergers.merge_venues_by_shared_link,
     }
@@ -419,39 +569,81 @@ def merge():
             print(f"    {fn.__doc__}")
         exit()
 
-    to_apply = set()
+    if apply:
+        merges = read_plan(apply)
+        with set_database(tag="merge") as db:
+            db.import_all(merges)
+        return
+
+    to_apply = {}
     for m in methods:
         for mm, fn in method_map.items():
             if fnmatch(pat=m, name=mm):
-                to_apply.add(fn)
+                to_apply[mm] = fn
 
     if not to_apply:
         exit(
             "Found no merge function to apply. Use --list to list the options."
         )
 
+    # Entries acquired during the merge will be picked up by the next one
+    now = datetime.now().timestamp()
+
     with set_database(tag="merge") as db:
         eqv = EquivalenceGroups()
-        for method in to_apply:
-            method(db, eqv)
-        db.import_all(eqv)
-
-
-scrapers = load_scrapers()
+        for name, method in to_apply.items():
+            if incremental:
+                since = mergers.merge_checkpoint(db, name)
+                method(db, eqv, since=since)
+            else:
+                method(db, eqv)
+        if dry:
+            report_merges(db, eqv)
+        elif plan:
+            merges = [*eqv.merges()]
+            report_plan(db, merges)
+            write_plan(merges, plan)
+            print(f"Wrote {len(merges)} merges to {plan}")
+        else:
+            db.import_all(eqv)
+            db.import_all(
+                [
+                    mergers.merge_checkpoint_entry(name, now)
+                    for name in to_apply
+                ],
+                history_file=False,
+            )
+
+
+def scraper_commands(argv):
+    """Return the query, acquire and prepare commands of the scrapers.
+
+    Only the module of the scraper named in argv is imported, the other
+    scrapers are listed but have no options.
+    """
+    selected = None
+    if argv[:1] in (["query"], ["acquire"], ["prepare"]) and len(argv) > 1:
+        selected = argv[1]
+    wrapped = {
+        name: ScraperWrapper(
+            name, load_scraper(name) if name == selected else None
+        )
+        for name in scraper_entry_points
+    }
+    return {
+        "query": {name: w.query for name, w in wrapped.items()},
+        "acquire": {name: w.acquire for name, w in wrapped.items()},
+        "prepare": {name: w.prepare for name, w in wrapped.items()},
+    }
 
-wrapped = {
-    name: ScraperWrapper(name, scraper) for name, scraper in scrapers.items()
-}
 
 commands = {
-    "query": {name: w.query for name, w in wrapped.items()},
-    "acquire": {name: w.acquire for name, w in wrapped.items()},
-    "prepare": {name: w.prepare for name, w in wrapped.items()},
     "replay": replay,
     "merge": merge,
     "search": search,
     "sql": sql,
     "report": report,
+    "cache": cache,
     "misc": misc,
 }
 
@@ -472,9 +664,23 @@ def main():
     from giving import give, given
 
     builtins.give = give
-    with given() as gv:
-        covers = gv.where(situation="cover").accum()
-        auto_cli(commands)
+
+    # paperoni --profile <command> prints the time spent in the main stages
+    argv = sys.argv[1:]
+    profiling = bool(os.environ.get("PAPERONI_PROFILE", False))
+    if argv[:1] == ["--profile"]:
+        argv = argv[1:]
+        profiling = True
+    profile = Profile().start() if profiling else None
+
+    try:
+        with given() as gv:
+            covers = gv.where(situation="cover").accum()
+            auto_cli({**scraper_commands(argv), **commands}, argv=argv)
+    finally:
+        if profile:
+            profile.stop()
+            print(profile.format())
 
     if covers and os.environ.get("PAPERONI_LOG_NEW_COVERAGE", False):
         covdict = {}
@@ -7,7 +7,8 @@ from sqlalchemy import or_, select
 
 from .config import papconf
 from .db import schema as sch
-from .paper_utils import fulltext
+from .paper_utils import fulltext, prefetch_fulltexts
+from .profiling import profiled, profiled_iter
 
 
 @tooled
@@ -195,6 +196,19 @@ class ExtendAttr:
         return attr
 
 
+def _prefetched(papers, batch_size=32):
+    # Download the PDFs of the papers in batches, to search excerpts faster
+    batch = []
+    for paper in papers:
+        batch.append(paper)
+        if len(batch) == batch_size:
+            prefetch_fulltexts(batch)
+            yield from batch
+            batch = []
+    prefetch_fulltexts(batch)
+    yield from batch
+
+
 def search(
     title=None,
     author=None,
@@ -231,7 +245,13 @@ def search(
             sort=sort,
         )
 
-        for (paper,) in db.session.execute(stmt):
+        with profiled("search.execute"):
+            results = db.session.execute(stmt)
+        papers = (paper for (paper,) in profiled_iter("search.fetch", results))
+        if excerpt and allow_download:
+            papers = _prefetched(papers)
+
+        for paper in papers:
             paper = ExtendAttr(paper)
             if excerpt:
                 ranges = find_excerpt(paper, excerpt, allow_download)
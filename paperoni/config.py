@@ -7,6 +7,8 @@ import gifnoc
 import requests_cache
 from gifnoc import Extensible
 
+from .sources.store import ResponseStore, expiry_policies
+
 
 @dataclass
 class PaperoniPaths:
@@ -54,6 +56,11 @@ class PaperoniConfig:
     writable: bool = True
     # Optional email to use for polite pool in scrapers (e.g. in OpenAlex)
     mailto: str | None = None
+    # Number of days before cached responses expire, for each URL pattern
+    # (-1: never expire, 0: do not cache). Other URLs expire after six days.
+    request_expiry: dict[str, float] = None
+    # Number of pages of each PDF to look at to find affiliations (0: all)
+    affiliation_pages: int = 2
 
     def __post_init__(self):
         self._database = None
@@ -92,7 +99,7 @@ class PaperoniConfig:
             # in-between, the finalization of disabled() will put back the
             # previous session cache, so it's a kind of workaround
             with requests_cache.disabled():
-                with requests_cache.enabled(rq):
+                with requests_cache.enabled(backend=ResponseStore(rq)):
                     yield
         else:
             yield
@@ -106,7 +113,11 @@ class PaperoniConfig:
         * Import requests_cache and set up with cache path ``paths.requests_cache``.
         """
         if rq := self.paths.requests_cache:
-            requests_cache.install_cache(rq, expire_after=timedelta(days=6))
+            requests_cache.install_cache(
+                backend=ResponseStore(rq),
+                expire_after=timedelta(days=6),
+                urls_expire_after=expiry_policies(self.request_expiry),
+            )
 
     def __exit__(self, exct, excv, tb):
         """Undo what has been done in __enter__.
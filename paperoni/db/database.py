@@ -18,6 +18,7 @@ from ..model import (
     AuthorMerge,
     Base,
     Institution,
+    Merge,
     MergeEntry,
     Meta,
     Paper,
@@ -30,6 +31,7 @@ from ..model import (
     VenueMerge,
     from_dict,
 )
+from ..profiling import profiled
 from ..utils import get_uuid_tag, is_canonical_uuid, squash_text, tag_uuid
 from . import schema as sch
 
@@ -37,6 +39,50 @@ logger = logging.getLogger("paperoni.database")
 logger.setLevel(level=logging.INFO)
 
 
+# For each type of merge: the table of the merged entries, its id field, and
+# the fields of other tables that refer to that id and must be redirected
+merge_tables = {
+    AuthorMerge: (
+        sch.Author,
+        "author_id",
+        {
+            sch.PaperAuthor: "author_id",
+            sch.PaperAuthorInstitution: "author_id",
+            sch.AuthorLink: "author_id",
+            sch.AuthorAlias: "author_id",
+            sch.AuthorInstitution: "author_id",
+            sch.Scraper: "hashid",
+            sch.CanonicalId: "canonical",
+        },
+    ),
+    PaperMerge: (
+        sch.Paper,
+        "paper_id",
+        {
+            sch.PaperAuthor: "paper_id",
+            sch.PaperLink: "paper_id",
+            sch.PaperFlag: "paper_id",
+            sch.PaperAuthorInstitution: "paper_id",
+            sch.t_paper_release: "paper_id",
+            sch.t_paper_topic: "paper_id",
+            sch.Scraper: "hashid",
+            sch.CanonicalId: "canonical",
+        },
+    ),
+    VenueMerge: (
+        sch.Venue,
+        "venue_id",
+        {
+            sch.Release: "venue_id",
+            sch.VenueLink: "venue_id",
+            sch.VenueAlias: "venue_id",
+            sch.Scraper: "hashid",
+            sch.CanonicalId: "canonical",
+        },
+    ),
+}
+
+
 class Database(OvldBase):
     DATABASE_SCRIPT_FILE = os.path.join(
         os.path.dirname(__file__), "database.sql"
@@ -276,52 +322,15 @@ class Database(OvldBase):
             data=x.data,
         )
 
-    def _acquire(self, merge: AuthorMerge):
-        self._merge_ids_for_table(
-            table=sch.Author,
-            id_field="author_id",
-            ids=merge.ids,
-            redirects={
-                sch.PaperAuthor: "author_id",
-                sch.PaperAuthorInstitution: "author_id",
-                sch.AuthorLink: "author_id",
-                sch.AuthorAlias: "author_id",
-                sch.AuthorInstitution: "author_id",
-                sch.Scraper: "hashid",
-                sch.CanonicalId: "canonical",
-            },
-        )
-
-    def _acquire(self, merge: PaperMerge):
-        self._merge_ids_for_table(
-            table=sch.Paper,
-            id_field="paper_id",
-            ids=merge.ids,
-            redirects={
-                sch.PaperAuthor: "paper_id",
-                sch.PaperLink: "paper_id",
-                sch.PaperFlag: "paper_id",
-                sch.PaperAuthorInstitution: "paper_id",
-                sch.t_paper_release: "paper_id",
-                sch.t_paper_topic: "paper_id",
-                sch.Scraper: "hashid",
-                sch.CanonicalId: "canonical",
-            },
-        )
-
-    def _acquire(self, merge: VenueMerge):
-        self._merge_ids_for_table(
-            table=sch.Venue,
-            id_field="venue_id",
-            ids=merge.ids,
-            redirects={
-                sch.Release: "venue_id",
-                sch.VenueLink: "venue_id",
-                sch.VenueAlias: "venue_id",
-                sch.Scraper: "hashid",
-                sch.CanonicalId: "canonical",
-            },
-        )
+    def _acquire(self, merge: Merge):
+        table, id_field, redirects = merge_tables[type(merge)]
+        with profiled("db.merge", key=table.__tablename__, ids=len(merge.ids)):
+            self._merge_ids_for_table(
+                table=table,
+                id_field=id_field,
+                ids=merge.ids,
+                redirects=redirects,
+            )
 
     def import_all(self, xs: list[BaseModel], history_file=True):
         if not xs:
@@ -331,7 +340,8 @@ class Database(OvldBase):
         xs = list(xs)
         with self:
             for x in tqdm(xs):
-                self.acquire(x)
+                with profiled("db.acquire", key=type(x).__name__):
+                    self.acquire(x)
         if history_file:
             with open(history_file, "a") as f:
                 data = [x.tagged_json() + "\n" for x in xs]
@@ -374,7 +384,9 @@ class Database(OvldBase):
                     lines = f.readlines()
                     for l in tqdm(lines):
                         if l.strip():
-                            self.acquire(from_dict(json.loads(l)))
+                            x = from_dict(json.loads(l))
+                            with profiled("db.acquire", key=type(x).__name__):
+                                self.acquire(x)
 
     def _filter_ids(self, ids, create_canonical):
         for x in ids:
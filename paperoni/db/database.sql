@@ -261,3 +261,13 @@ CREATE TABLE IF NOT EXISTS scraper_data (
 	date UNSIGNED BIG INT NOT NULL,
 	PRIMARY KEY (scraper, tag)
 );
+
+
+-- Indexes for the merges, which join the tables on these columns. The index on
+-- the scraper's date finds the rows that were acquired since the last merge.
+CREATE INDEX IF NOT EXISTS paper_squashed_index ON paper(squashed);
+CREATE INDEX IF NOT EXISTS paper_link_index ON paper_link(type, link);
+CREATE INDEX IF NOT EXISTS author_name_index ON author(name);
+CREATE INDEX IF NOT EXISTS author_link_index ON author_link(type, link);
+CREATE INDEX IF NOT EXISTS venue_link_index ON venue_link(type, link);
+CREATE INDEX IF NOT EXISTS scraper_date_index ON scraper(date);
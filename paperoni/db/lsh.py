@@ -0,0 +1,103 @@
+"""Near-duplicate detection with MinHash and locality-sensitive hashing.
+
+Each text is reduced to the set of its character shingles, and the set to a
+short MinHash signature. The signature is cut into bands, and texts that have
+an identical band land in the same bucket of the index. Texts with similar
+shingle sets are likely to share at least one band, so candidate pairs are
+found without comparing all pairs of texts.
+"""
+
+import random
+import zlib
+from collections import defaultdict
+from itertools import combinations
+
+from ..utils import squash_text
+
+# Large prime for the universal hash functions of the MinHash
+_PRIME = (1 << 61) - 1
+
+
+def shingles(text, k=4):
+    """Return the hashes of the k-character shingles of the squashed text."""
+    text = squash_text(text)
+    if len(text) <= k:
+        return {zlib.crc32(text.encode("utf8"))} if text else set()
+    return {
+        zlib.crc32(text[i : i + k].encode("utf8"))
+        for i in range(len(text) - k + 1)
+    }
+
+
+def jaccard(s1, s2):
+    if not s1 or not s2:
+        return 0
+    return len(s1 & s2) / len(s1 | s2)
+
+
+class MinHasher:
+    """Compute MinHash signatures of num_perm values for sets of hashes."""
+
+    def __init__(self, num_perm, seed=1234):
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, hashes):
+        return [
+            min([(a * h + b) % _PRIME for h in hashes])
+            for a, b in self.permutations
+        ]
+
+
+class LSHIndex:
+    """Index MinHash signatures by bands of rows values.
+
+    Two sets with Jaccard similarity s share at least one band with
+    probability ``1 - (1 - s ** rows) ** bands``.
+    """
+
+    def __init__(self, bands, rows, max_bucket_size=50):
+        self.bands = bands
+        self.rows = rows
+        self.max_bucket_size = max_bucket_size
+        self.hasher = MinHasher(bands * rows)
+        self.buckets = defaultdict(list)
+
+    def band_keys(self, hashes):
+        """Return the bucket of each band of the signature of hashes.
+
+        The buckets only depend on the hashes and on the parameters of the
+        index, so they can be saved and added again with add_bands.
+        """
+        if not hashes:
+            return []
+        sig = self.hasher.signature(hashes)
+        r = self.rows
+        return [
+            hash((band, *sig[band * r : (band + 1) * r]))
+            for band in range(self.bands)
+        ]
+
+    def add(self, key, hashes):
+        """Add the set of hashes under key."""
+        self.add_bands(key, self.band_keys(hashes))
+
+    def add_bands(self, key, band_keys):
+        """Add key under band_keys, as returned by band_keys."""
+        for bucket in band_keys:
+            self.buckets[bucket].append(key)
+
+    def candidates(self):
+        """Return the set of pairs of keys that share a band.
+
+        Buckets with more than max_bucket_size keys (e.g. generic titles)
+        are ignored.
+        """
+        pairs = set()
+        for keys in self.buckets.values():
+            if 1 < len(keys) <= self.max_bucket_size:
+                pairs.update(combinations(sorted(keys), 2))
+        return pairs
@@ -1,10 +1,86 @@
+import json
+import re
+import zlib
 from collections import defaultdict
+from datetime import datetime
 
-from sqlalchemy import select
+from sqlalchemy import delete, select
 
 from ..db import schema as sch
-from ..model import AuthorMerge, MergeEntry, PaperMerge, VenueMerge
-from ..utils import associate, similarity
+from ..model import (
+    AuthorMerge,
+    MergeEntry,
+    PaperMerge,
+    ScraperData,
+    VenueMerge,
+)
+from ..utils import associate, consistent, normalized, similarity
+from .lsh import LSHIndex, jaccard, shingles
+
+# Name under which the checkpoints of the merges are saved in scraper_data
+MERGE_CHECKPOINT_SCOPE = "merge"
+
+
+def merge_checkpoint(db, method):
+    """Return the timestamp at which method was last run, or None."""
+    q = select(sch.ScraperData).filter(
+        sch.ScraperData.scraper == MERGE_CHECKPOINT_SCOPE,
+        sch.ScraperData.tag == method,
+    )
+    for (sd,) in db.session.execute(q):
+        return int(sd.data)
+    return None
+
+
+def merge_checkpoint_entry(method, timestamp):
+    """Return a ScraperData entry that saves the timestamp of a merge.
+
+    Incremental merges with the same method will only consider the rows
+    acquired after that timestamp.
+    """
+    return ScraperData(
+        scraper=MERGE_CHECKPOINT_SCOPE,
+        tag=method,
+        data=str(int(timestamp)),
+        date=datetime.fromtimestamp(timestamp),
+    )
+
+
+def _source(table, id_field, since):
+    """Return the SQL source for the rows of table to merge.
+
+    This is the whole table if since is None, otherwise only the rows that
+    were acquired after the since timestamp, according to the scraper table.
+    """
+    if since is None:
+        return table
+    # The date column has TEXT affinity, so the comparison is textual, which
+    # works because the timestamps all have the same number of digits
+    return f"""(
+        SELECT * FROM {table} WHERE {id_field} IN (
+            SELECT hashid FROM scraper WHERE date >= '{int(since)}'
+        )
+    )"""
+
+
+def _pair(since):
+    """Return the operator that pairs the first and second ids in a merge.
+
+    The ids of a full merge are ordered so that each pair is seen once, but
+    an incremental merge must pair new rows with older and newer ones.
+    """
+    return ">" if since is None else "!="
+
+
+def touched_ids(db, since):
+    """Return the set of hex ids acquired after the since timestamp."""
+    return {
+        hashid
+        for (hashid,) in db.session.execute(
+            "SELECT hex(hashid) FROM scraper WHERE date >= :since",
+            {"since": str(int(since))},
+        )
+    }
 
 
 def _process_standard_rows(rows, eqv, cls):
@@ -68,19 +144,19 @@ def _generate_author_merges(db, eqv, ids):
             )
 
 
-def merge_papers_by_shared_link(db, eqv):
+def merge_papers_by_shared_link(db, eqv, since=None):
     """Merge papers that share a link or ID."""
     results = db.session.execute(
-        """
+        f"""
         SELECT
             p1.title,
             hex(p1.paper_id),
             group_concat(hex(p2.paper_id), ';'),
             p1.quality,
             group_concat(p2.quality, ';')
-        FROM paper as p1
+        FROM {_source("paper", "paper_id", since)} as p1
             JOIN paper as p2
-                ON p1.paper_id > p2.paper_id
+                ON p1.paper_id {_pair(since)} p2.paper_id
             JOIN paper_link as pl1
                 ON pl1.paper_id == p1.paper_id
             JOIN paper_link as pl2
@@ -93,19 +169,19 @@ def merge_papers_by_shared_link(db, eqv):
     _process_paper_rows(db, results, eqv)
 
 
-def merge_authors_by_shared_link(db, eqv):
+def merge_authors_by_shared_link(db, eqv, since=None):
     """Merge authors that share a link or ID."""
     results = db.session.execute(
-        """
+        f"""
         SELECT
             a1.name,
             hex(a1.author_id),
             group_concat(hex(a2.author_id), ';'),
             a1.quality,
             group_concat(a2.quality, ';')
-        FROM author as a1
+        FROM {_source("author", "author_id", since)} as a1
             JOIN author as a2
-                ON a1.author_id > a2.author_id
+                ON a1.author_id {_pair(since)} a2.author_id
             JOIN author_link as al1
                 ON al1.author_id == a1.author_id
             JOIN author_link as al2
@@ -118,19 +194,19 @@ def merge_authors_by_shared_link(db, eqv):
     _process_standard_rows(results, eqv, AuthorMerge)
 
 
-def merge_papers_by_name(db, eqv):
+def merge_papers_by_name(db, eqv, since=None):
     """Merge papers with the same name."""
     results = db.session.execute(
-        """
+        f"""
         SELECT
             p1.title,
             hex(p1.paper_id),
             group_concat(hex(p2.paper_id), ';'),
             p1.quality,
             group_concat(p2.quality, ';')
-        FROM paper as p1
+        FROM {_source("paper", "paper_id", since)} as p1
             JOIN paper as p2
-                ON p1.paper_id > p2.paper_id
+                ON p1.paper_id {_pair(since)} p2.paper_id
         WHERE p1.squashed = p2.squashed
             AND length(p1.title) >= 25
         GROUP BY p1.paper_id
@@ -139,19 +215,177 @@ def merge_papers_by_name(db, eqv):
     _process_paper_rows(db, results, eqv)
 
 
-def merge_authors_by_name(db, eqv):
+# LSH parameters for near-duplicate papers: with 8 bands of 4 rows, pairs
+# with a Jaccard similarity of 0.8 are found with probability 0.98
+FUZZY_PAPER_BANDS = 8
+FUZZY_PAPER_ROWS = 4
+# Minimal Jaccard similarity of the shingles of near-duplicate papers
+FUZZY_PAPER_THRESHOLD = 0.7
+# Minimal length of the squashed titles to consider
+FUZZY_PAPER_MIN_LENGTH = 25
+# Name under which the LSH bands of each paper are saved in scraper_data
+FUZZY_PAPER_BANDS_SCOPE = f"merge-bands:{FUZZY_PAPER_BANDS}x{FUZZY_PAPER_ROWS}"
+# Number of ids in each of the queries on a set of papers
+FUZZY_PAPER_CHUNK_SIZE = 500
+
+
+def _paper_bands(db, index, texts, scope):
+    """Return the LSH bands of the text of each paper.
+
+    The bands are saved in scraper_data along with a checksum of the text,
+    so that only the papers that are new or whose text changed since the
+    last run are hashed again. The bands of the papers that no longer
+    exist are removed.
+    """
+    saved = {
+        tag: json.loads(data)
+        for tag, data in db.session.execute(
+            "SELECT tag, data FROM scraper_data WHERE scraper = :scope",
+            {"scope": scope},
+        )
+    }
+    bands = {}
+    updates = []
+    now = int(datetime.now().timestamp())
+    for paper_id, text in texts.items():
+        checksum = zlib.crc32(text.encode("utf8"))
+        entry = saved.pop(paper_id, None)
+        if entry is None or entry[0] != checksum:
+            entry = [checksum, index.band_keys(shingles(text))]
+            updates.append(
+                {
+                    "scraper": scope,
+                    "tag": paper_id,
+                    "data": json.dumps(entry),
+                    "date": now,
+                }
+            )
+        bands[paper_id] = entry[1]
+
+    if updates:
+        db.session.execute(
+            sch.ScraperData.__table__.insert().prefix_with("OR REPLACE"),
+            updates,
+        )
+    stale = list(saved)
+    for i in range(0, len(stale), FUZZY_PAPER_CHUNK_SIZE):
+        db.session.execute(
+            delete(sch.ScraperData).where(
+                sch.ScraperData.scraper == scope,
+                sch.ScraperData.tag.in_(stale[i : i + FUZZY_PAPER_CHUNK_SIZE]),
+            )
+        )
+    return bands
+
+
+def _paper_authors(db, paper_ids):
+    """Return the names of the authors of each paper, in order."""
+    paper_ids = list(paper_ids)
+    authors = defaultdict(list)
+    for i in range(0, len(paper_ids), FUZZY_PAPER_CHUNK_SIZE):
+        chunk = paper_ids[i : i + FUZZY_PAPER_CHUNK_SIZE]
+        values = ", ".join(f"X'{paper_id}'" for paper_id in chunk)
+        for paper_id, name in db.session.execute(
+            f"""
+            SELECT hex(pa.paper_id), author.name
+            FROM paper_author as pa
+                JOIN author
+                    ON author.author_id = pa.author_id
+            WHERE pa.paper_id IN ({values})
+            ORDER BY pa.paper_id, pa.author_position
+            """
+        ):
+            authors[paper_id].append(name)
+    return authors
+
+
+def _shared_authors(names1, names2):
+    return sum(
+        1
+        for i, j in associate(names1, names2)
+        if i is not None and j is not None
+    )
+
+
+def merge_papers_fuzzy(db, eqv, abstract=False, since=None):
+    """Merge papers with near-identical titles and similar authors."""
+
+    def text(title, abstract_text=None):
+        if abstract and abstract_text:
+            return f"{title} {abstract_text}"
+        return title
+
+    columns = "hex(paper_id), title, quality"
+    if abstract:
+        columns += ", abstract"
+    papers = {}
+    for paper_id, title, quality, *rest in db.session.execute(
+        f"SELECT {columns} FROM paper"
+    ):
+        if len(normalized(title).squashed) < FUZZY_PAPER_MIN_LENGTH:
+            continue
+        papers[paper_id] = (title, quality, *rest)
+
+    # Only the papers that changed since the last run are hashed
+    index = LSHIndex(bands=FUZZY_PAPER_BANDS, rows=FUZZY_PAPER_ROWS)
+    scope = FUZZY_PAPER_BANDS_SCOPE + (":abstract" if abstract else "")
+    texts = {
+        paper_id: text(title, *rest)
+        for paper_id, (title, _, *rest) in papers.items()
+    }
+    for paper_id, bands in _paper_bands(db, index, texts, scope).items():
+        index.add_bands(paper_id, bands)
+
+    candidates = index.candidates()
+    if since is not None:
+        touched = touched_ids(db, since)
+        candidates = {
+            (p1, p2) for p1, p2 in candidates if p1 in touched or p2 in touched
+        }
+
+    # Verify the candidates with the actual similarity of their shingles
+    pairs = []
+    for p1, p2 in candidates:
+        (t1, _, *a1), (t2, _, *a2) = papers[p1], papers[p2]
+        sim = jaccard(shingles(text(t1, *a1)), shingles(text(t2, *a2)))
+        if sim >= FUZZY_PAPER_THRESHOLD:
+            pairs.append((p1, p2))
+    if not pairs:
+        return
+
+    # Then verify that at least half of the authors can be associated
+    authors = _paper_authors(db, {p for pair in pairs for p in pair})
+
+    rows = []
+    for p1, p2 in pairs:
+        names1, names2 = authors[p1], authors[p2]
+        if not names1 or not names2:
+            continue
+        shared = _shared_authors(names1, names2)
+        if 2 * shared >= min(len(names1), len(names2)):
+            (t1, q1, *_), (_, q2, *_) = papers[p1], papers[p2]
+            rows.append((t1, p1, p2, q1, str(q2)))
+    _process_paper_rows(db, rows, eqv)
+
+
+def merge_papers_fuzzy_with_abstract(db, eqv, since=None):
+    """Merge papers with near-identical titles and abstracts."""
+    merge_papers_fuzzy(db, eqv, abstract=True, since=since)
+
+
+def merge_authors_by_name(db, eqv, since=None):
     """Merge authors with the same name."""
     results = db.session.execute(
-        """
+        f"""
         SELECT
             a1.name,
             hex(a1.author_id),
             group_concat(hex(a2.author_id), ';'),
             a1.quality,
             group_concat(a2.quality, ';')
-        FROM author as a1
+        FROM {_source("author", "author_id", since)} as a1
             JOIN author as a2
-                ON a1.author_id > a2.author_id
+                ON a1.author_id {_pair(since)} a2.author_id
         WHERE a1.name = a2.name
         GROUP BY a1.author_id
         """
@@ -185,7 +419,7 @@ def merge_authors_by_position(db, eqv):
     by_paper = defaultdict(list)
     for r in results:
         id1, id2, name1, name2, paper, q1, q2 = r
-        sim = similarity(name1, name2)
+        sim = similarity(name1, name2, cutoff=0.5)
         by_paper[paper].append((sim, id1, id2, name1, name2, q1, q2))
 
     for paper, data in by_paper.items():
@@ -207,19 +441,174 @@ def merge_authors_by_position(db, eqv):
             )
 
 
-def merge_venues_by_shared_link(db, eqv):
+# Name suffixes that are not surnames
+_name_suffixes = {"jr", "sr", "ii", "iii", "iv"}
+
+# Blocks with more authors than this (very common names) are skipped, which
+# keeps the number of comparisons linear in the number of authors
+FUZZY_MAX_BLOCK_SIZE = 100
+
+# Evidence needed to merge two authors with compatible names: a shared link
+# is enough, otherwise they need e.g. two co-authors, or one co-author and
+# two venues in common
+FUZZY_LINK_WEIGHT = 3
+FUZZY_COAUTHOR_WEIGHT = 1
+FUZZY_VENUE_WEIGHT = 0.5
+FUZZY_THRESHOLD = 2
+
+
+def author_block_key(name):
+    """Return the (surname, first initial) of a name, or None.
+
+    Authors whose names have different keys are never fuzzy-merged.
+    """
+    if "," in name:
+        last, _, first = name.partition(",")
+        name = f"{first} {last}"
+    words = [
+        w
+        for w in (
+            normalized(w).squashed for w in normalized(name).plain.split()
+        )
+        if w and w not in _name_suffixes
+    ]
+    if len(words) < 2:
+        return None
+    return (words[-1], words[0][0])
+
+
+def _fuzzy_author_score(a1, a2):
+    if a1["orcid"] and a2["orcid"] and not (a1["orcid"] & a2["orcid"]):
+        return 0
+    coauthors = len(a1["coauthors"] & a2["coauthors"])
+    venues = len(a1["venues"] & a2["venues"])
+    return (
+        FUZZY_LINK_WEIGHT * bool(a1["links"] & a2["links"])
+        + FUZZY_COAUTHOR_WEIGHT * min(coauthors, 2)
+        + FUZZY_VENUE_WEIGHT * min(venues, 2)
+    )
+
+
+def merge_authors_fuzzy(db, eqv, since=None):
+    """Merge authors with similar names, co-authors, links and venues."""
+    authors = {}
+    blocks = defaultdict(list)
+    for author_id, name, quality in db.session.execute(
+        "SELECT hex(author_id), name, quality FROM author"
+    ):
+        key = author_block_key(name)
+        authors[author_id] = {
+            "id": author_id,
+            "name": name,
+            "quality": quality,
+            "key": key,
+            "coauthors": set(),
+            "links": set(),
+            "orcid": set(),
+            "venues": set(),
+        }
+        if key:
+            blocks[key].append(author_id)
+
+    blocks = [
+        block
+        for block in blocks.values()
+        if 1 < len(block) <= FUZZY_MAX_BLOCK_SIZE
+    ]
+    if since is not None:
+        # Only the blocks with a new author can have new merges
+        touched = touched_ids(db, since)
+        blocks = [block for block in blocks if any(a in touched for a in block)]
+    candidates = {author_id for block in blocks for author_id in block}
+    if not candidates:
+        return
+
+    # Co-authors are compared through their block keys, so that duplicates
+    # of the same co-author count as one
+    papers = defaultdict(list)
+    for paper_id, author_id in db.session.execute(
+        "SELECT hex(paper_id), hex(author_id) FROM paper_author"
+    ):
+        papers[paper_id].append(author_id)
+    for paper_authors in papers.values():
+        keys = {authors[a]["key"] for a in paper_authors if a in authors}
+        for author_id in paper_authors:
+            if author_id in candidates:
+                author = authors[author_id]
+                author["coauthors"].update(keys - {author["key"], None})
+
+    for author_id, typ, link in db.session.execute(
+        "SELECT hex(author_id), type, link FROM author_link"
+    ):
+        if author_id in candidates:
+            authors[author_id]["links"].add((typ, link))
+            if typ == "orcid":
+                authors[author_id]["orcid"].add(link)
+
+    for author_id, venue in db.session.execute(
+        """
+        SELECT DISTINCT hex(pa.author_id), venue.name
+        FROM paper_author as pa
+            JOIN paper_release as pr
+                ON pr.paper_id = pa.paper_id
+            JOIN release
+                ON release.release_id = pr.release_id
+            JOIN venue
+                ON venue.venue_id = release.venue_id
+        """
+    ):
+        if author_id in candidates:
+            # Drop the years and numbers to compare venues across editions
+            series = re.sub(r"[0-9]+", "", normalized(venue).squashed)
+            authors[author_id]["venues"].add(series)
+
+    for block in blocks:
+        members = [authors[a] for a in block]
+        pairs = [
+            (score, i, j)
+            for i, a1 in enumerate(members)
+            for j, a2 in enumerate(members[i + 1 :], start=i + 1)
+            if (score := _fuzzy_author_score(a1, a2)) >= FUZZY_THRESHOLD
+        ]
+        # Group the authors, strongest evidence first, but never put names
+        # that are inconsistent (e.g. John and Jane Smith) in the same group
+        groups = {i: [i] for i in range(len(members))}
+        for score, i, j in sorted(pairs, reverse=True):
+            gi, gj = groups[i], groups[j]
+            if gi is gj or not consistent(
+                [members[k]["name"] for k in gi + gj]
+            ):
+                continue
+            gi.extend(gj)
+            for k in gj:
+                groups[k] = gi
+        for group in {id(g): g for g in groups.values()}.values():
+            if len(group) > 1:
+                eqv.equiv_all(
+                    [
+                        MergeEntry(
+                            id=members[k]["id"], quality=members[k]["quality"]
+                        )
+                        for k in group
+                    ],
+                    under=members[group[0]]["name"],
+                    cls=AuthorMerge,
+                )
+
+
+def merge_venues_by_shared_link(db, eqv, since=None):
     """Merge venues that share a link or ID."""
     results = db.session.execute(
-        """
+        f"""
         SELECT
             v1.name,
             hex(v1.venue_id),
             group_concat(hex(v2.venue_id), ';'),
             v1.quality,
             group_concat(v2.quality, ';')
-        FROM venue as v1
+        FROM {_source("venue", "venue_id", since)} as v1
             JOIN venue as v2
-                ON v1.venue_id > v2.venue_id
+                ON v1.venue_id {_pair(since)} v2.venue_id
             JOIN venue_link as vl1
                 ON vl1.venue_id == v1.venue_id
             JOIN venue_link as vl2
@@ -0,0 +1,103 @@
+"""Plan merges ahead of time, to review them before they are applied.
+
+A plan is a list of merges in the same JSON lines format as the history
+files, so applying it is the same as importing them.
+"""
+
+import json
+import time
+from collections import Counter, defaultdict
+
+from ..model import from_dict
+from .database import merge_tables
+
+# Number of ids in each of the queries that count affected rows
+COUNT_CHUNK_SIZE = 500
+
+
+def size_bucket(size):
+    """Return the histogram bucket for a group size, e.g. "4-7" for 5."""
+    if size < 4:
+        return str(size)
+    lo = 1 << (size.bit_length() - 1)
+    return f"{lo}-{2 * lo - 1}"
+
+
+def group_sizes(merges):
+    """Return a histogram of the group sizes for each type of merge.
+
+    The histograms map size buckets to numbers of groups, by increasing size.
+    """
+    sizes = defaultdict(list)
+    for merge in merges:
+        sizes[type(merge)].append(len(merge.ids))
+    return {
+        cls: Counter(size_bucket(size) for size in sorted(cls_sizes))
+        for cls, cls_sizes in sizes.items()
+    }
+
+
+def _count_rows(db, table, field, ids):
+    total = 0
+    for i in range(0, len(ids), COUNT_CHUNK_SIZE):
+        chunk = ids[i : i + COUNT_CHUNK_SIZE]
+        values = ", ".join(f"X'{x.hex()}'" for x in chunk)
+        ((count,),) = db.session.execute(
+            f"SELECT count(*) FROM {table} WHERE {field} IN ({values})"
+        )
+        total += count
+    return total
+
+
+def affected_rows(db, merges):
+    """Count the rows of each table that the merges will modify.
+
+    Returns a dictionary from merge type to a dictionary from table name to
+    the number of rows that refer to one of the merged ids.
+    """
+    ids = defaultdict(set)
+    for merge in merges:
+        ids[type(merge)].update(entry.id.bytes for entry in merge.ids)
+
+    results = {}
+    for cls, cls_ids in ids.items():
+        table, id_field, redirects = merge_tables[cls]
+        cls_ids = sorted(cls_ids)
+        counts = {}
+        for subtable, field in {table: id_field, **redirects}.items():
+            subtable = getattr(subtable, "__table__", subtable)
+            counts[subtable.name] = _count_rows(db, subtable, field, cls_ids)
+        results[cls] = counts
+    return results
+
+
+def estimate_time(db, merges, sample=20):
+    """Estimate the time it will take to apply the merges, in seconds.
+
+    A sample of the merges is applied and timed, then rolled back, so this
+    must not be called with pending changes in the session.
+    """
+    if not merges:
+        return 0.0
+    step = max(1, len(merges) // sample)
+    subset = merges[::step][:sample]
+    start = time.perf_counter()
+    try:
+        for merge in subset:
+            db._acquire(merge)
+        db.session.flush()
+    finally:
+        db.session.rollback()
+    return (time.perf_counter() - start) / len(subset) * len(merges)
+
+
+def write_plan(merges, path):
+    """Write the merges to path, one JSON object per line."""
+    with open(path, "w") as f:
+        f.writelines(merge.tagged_json() + "\n" for merge in merges)
+
+
+def read_plan(path):
+    """Read the merges written by write_plan."""
+    with open(path) as f:
+        return [from_dict(json.loads(line)) for line in f if line.strip()]
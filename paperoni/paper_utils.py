@@ -1,10 +1,35 @@
-from paperoni.sources.scrapers.pdftools import PDF
+# The PDF tooling is imported on first use, so that importing the search
+# does not pay for it
 
 
 def fulltext(paper, cache_policy="use"):
+    from paperoni.sources.scrapers.pdftools import PDF
+
     for lnk in paper.links:
         pdf = PDF(lnk, cache_policy=cache_policy)
         text = pdf.get_fulltext(fulldata=False)
         if text is not None:
             return text
     return None
+
+
+def prefetch_fulltexts(papers, workers=8, processes=None):
+    """Download and process the PDFs that fulltext() will first look for.
+
+    This is done concurrently for all papers, see ``process_pdfs``.
+    """
+    from paperoni.sources.scrapers.pdftools import (
+        PDF,
+        PDF_LINK_TYPES,
+        process_pdfs,
+    )
+
+    pdfs = {}
+    for paper in papers:
+        for lnk in paper.links:
+            if lnk.type in PDF_LINK_TYPES:
+                pdf = PDF(lnk)
+                pdfs.setdefault(pdf.pdf_path, pdf)
+                break
+    for _ in process_pdfs(pdfs.values(), workers=workers, processes=processes):
+        pass
@@ -0,0 +1,172 @@
+"""Timing instrumentation for the expensive stages of paperoni.
+
+Instrumented stages give a ``situation="profile"`` event with the name of the
+stage, the time it took in seconds and, where relevant, a key that refines
+the stage (the type of an acquired entry, the host of a request...) and the
+number of bytes that were processed.
+
+A ``Profile`` accumulates these events into statistics for each stage while
+it is active. Profiles receive the events directly rather than through
+``given()``, because the stages often run in worker threads or in server
+tasks that do not share the context of the listener.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from giving import give
+
+# Profiles that are currently active
+_active_profiles = []
+
+
+def _emit(event):
+    give(situation="profile", **event)
+    for profile in list(_active_profiles):
+        profile.add(event)
+
+
+@contextmanager
+def profiled(stage, key=None, **info):
+    """Time the block and give a profile event for the stage.
+
+    The block may set ``bytes`` and other information in the event that
+    is yielded.
+    """
+    event = {"stage": stage, "key": key, **info}
+    start = time.perf_counter()
+    try:
+        yield event
+    finally:
+        event["time"] = time.perf_counter() - start
+        _emit(event)
+
+
+def profiled_iter(stage, iterable, key=None, **info):
+    """Yield from iterable, timing the steps of the iteration.
+
+    The event is given once the iteration ends or is abandoned, with the
+    number of items in ``items``. The time spent by the consumer between the
+    steps is not counted.
+    """
+    elapsed = 0
+    count = 0
+    it = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            count += 1
+            yield item
+    finally:
+        _emit(
+            {
+                "stage": stage,
+                "key": key,
+                "time": elapsed,
+                "items": count,
+                **info,
+            }
+        )
+
+
+def percentile(values, p):
+    """Return the p-th percentile of sorted values (nearest rank)."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+class StageStatistics:
+    """Statistics of the events of a single stage.
+
+    Counts, total time and bytes are exact, but the percentiles are computed
+    over the last ``window`` events only.
+    """
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.bytes = 0
+        self.times = deque(maxlen=window)
+
+    def add(self, event):
+        self.count += 1
+        self.total += event["time"]
+        self.bytes += event.get("bytes", None) or 0
+        self.times.append(event["time"])
+
+    def summary(self):
+        times = sorted(self.times)
+        return {
+            "count": self.count,
+            "total": self.total,
+            "p50": percentile(times, 50),
+            "p95": percentile(times, 95),
+            "max": times[-1] if times else 0.0,
+            "bytes": self.bytes,
+        }
+
+
+class Profile:
+    """Accumulate the profile events given while the profile is active."""
+
+    def __init__(self, window=10_000):
+        self.window = window
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        _active_profiles.append(self)
+        return self
+
+    def stop(self):
+        if self in _active_profiles:
+            _active_profiles.remove(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def add(self, event):
+        stage = event["stage"]
+        if event.get("key", None) is not None:
+            stage = f"{stage}[{event['key']}]"
+        with self.lock:
+            if (stats := self.stages.get(stage, None)) is None:
+                stats = self.stages[stage] = StageStatistics(self.window)
+            stats.add(event)
+
+    def summary(self):
+        """Return the statistics of each stage, by decreasing total time."""
+        with self.lock:
+            results = {
+                stage: stats.summary() for stage, stats in self.stages.items()
+            }
+        return dict(
+            sorted(results.items(), key=lambda kv: kv[1]["total"], reverse=True)
+        )
+
+    def format(self):
+        """Return the summary as a text table."""
+        lines = [
+            f"{'stage':40} {'count':>8} {'total':>9} {'p50':>9}"
+            f" {'p95':>9} {'bytes':>12}"
+        ]
+        for stage, s in self.summary().items():
+            lines.append(
+                f"{stage[:40]:40} {s['count']:8} {s['total']:8.3f}s"
+                f" {s['p50'] * 1000:7.2f}ms {s['p95'] * 1000:7.2f}ms"
+                f" {s['bytes']:12}"
+            )
+        return "\n".join(lines)
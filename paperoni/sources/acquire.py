@@ -1,53 +1,207 @@
 import json
 import re
+import threading
+import time
 import urllib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
 
 import backoff
 import requests
+import requests_cache
 import yaml
 from bs4 import BeautifulSoup
+from giving import give
+
+from ..profiling import profiled
+
+
+class RateLimiter:
+    """Enforce a minimal delay between successive calls, across threads."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delta = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.delay
+        if delta > 0:
+            time.sleep(delta)
+
+
+def concurrent_map(fn, items, workers=4, ordered=True):
+    """Apply fn on each item using a pool of threads.
+
+    At most ``2 * workers`` items are in flight at any given time, so that
+    ``items`` can be a lazy (or long) iterator. Results are yielded as soon
+    as they are available, in the same order as ``items`` if ``ordered`` is
+    True, or in order of completion otherwise.
+    """
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def fill():
+            while len(pending) < 2 * workers:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                pending.append(executor.submit(fn, item))
+
+        fill()
+        while pending:
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    pending.remove(fut)
+                    yield fut.result()
+            fill()
+
+
+class Progress:
+    """Track the completion of a known number of jobs.
+
+    ``step()`` emits a ``progress`` event and returns a short status string
+    with the count of completed jobs and the estimated time remaining. It
+    should be called from the thread that consumes the results, since the
+    events given in other threads do not reach the ``given()`` listeners.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.start = time.time()
+        self.lock = threading.Lock()
+
+    def step(self, **info):
+        with self.lock:
+            self.done += 1
+            done = self.done
+        elapsed = time.time() - self.start
+        eta = elapsed / done * (self.total - done)
+        give(progress=done, total=self.total, elapsed=elapsed, eta=eta, **info)
+        return f"[{done}/{self.total}, ETA {timedelta(seconds=int(eta))}]"
+
+
+def _giveup(exc):
+    # Retrying will not help if the resource does not exist or if the request
+    # itself is invalid
+    return exc.response is not None and exc.response.status_code in (400, 404)
 
 
 class HTTPSAcquirer:
     """Acquire resources from an HTTPS connection."""
 
-    def __init__(self, url, format="text"):
+    def __init__(self, url, format="text", delay=None):
         self.base_url = url
         self.format = format
+        self.limiter = RateLimiter(delay) if delay else None
+
+    def _url(self, url, params):
+        if params:
+            params = urllib.parse.urlencode(params)
+            return f"https://{self.base_url}{url}?{params}"
+        else:
+            return f"https://{self.base_url}{url}"
 
     @backoff.on_exception(
         backoff.expo,
         requests.exceptions.RequestException,
-        giveup=lambda exc: exc.response.status_code == 404,
+        giveup=_giveup,
         max_time=5,
     )
     def get(self, url, params=None, headers={}):
-        if params:
-            params = urllib.parse.urlencode(params)
-            url = f"https://{self.base_url}{url}?{params}"
-        else:
-            url = f"https://{self.base_url}{url}"
+        url = self._url(url, params)
+        if self.limiter:
+            self.limiter.wait()
         return readpage(url, format=self.format, headers=headers)
 
+    @backoff.on_exception(
+        backoff.expo,
+        requests.exceptions.RequestException,
+        giveup=_giveup,
+        max_time=5,
+    )
+    def post(self, url, params=None, json=None, headers={}):
+        url = self._url(url, params)
+        if self.limiter:
+            self.limiter.wait()
+        return readpage(
+            url, format=self.format, method="post", json=json, headers=headers
+        )
 
-def readpage(url, format=None, cache_into=None, **kwargs):
-    if cache_into and cache_into.exists():
-        content = cache_into.read_text()
 
+def _decode(resp):
+    if resp.encoding == resp.apparent_encoding:
+        return resp.text
     else:
-        resp = requests.get(url, **kwargs)
-        resp.raise_for_status()
-        if resp.encoding == resp.apparent_encoding:
-            content = resp.text
-        else:
-            content = resp.content.decode(
-                resp.apparent_encoding, errors="ignore"
-            )
+        return resp.content.decode(resp.apparent_encoding, errors="ignore")
+
+
+def _validators_path(cache_into):
+    return cache_into.with_name(f"{cache_into.name}.validators.json")
+
+
+def revalidate_into(url, cache_into, **kwargs):
+    """Download url into cache_into, unless the cached copy is still valid.
+
+    The ETag and Last-Modified headers of the response are saved alongside
+    cache_into, and sent back as If-None-Match and If-Modified-Since when
+    revalidating, so that the server may answer with 304 Not Modified instead
+    of sending the whole page again.
+
+    Returns True if the contents of cache_into changed.
+    """
+    vpath = _validators_path(cache_into)
+    headers = dict(kwargs.pop("headers", None) or {})
+    if cache_into.exists() and vpath.exists():
+        validators = json.loads(vpath.read_text())
+        if etag := validators.get("etag", None):
+            headers["If-None-Match"] = etag
+        if modified := validators.get("last_modified", None):
+            headers["If-Modified-Since"] = modified
+
+    # Bypass requests_cache, which would answer in place of the server
+    with requests_cache.disabled():
+        resp = requests.get(url, headers=headers, **kwargs)
 
-        if cache_into:
-            cache_into.parent.mkdir(parents=True, exist_ok=True)
-            cache_into.write_text(content)
+    if resp.status_code == 304:
+        return False
 
+    resp.raise_for_status()
+    content = _decode(resp)
+    changed = not cache_into.exists() or cache_into.read_text() != content
+    cache_into.parent.mkdir(parents=True, exist_ok=True)
+    cache_into.write_text(content)
+    vpath.write_text(
+        json.dumps(
+            {
+                "etag": resp.headers.get("ETag", None),
+                "last_modified": resp.headers.get("Last-Modified", None),
+            }
+        )
+    )
+    return changed
+
+
+def parse_page(content, format=None, raw=None):
+    """Parse the text of a page according to format.
+
+    The format may be "json", "yaml", "xml" or "html", otherwise the text
+    is returned as is. For XML, raw bytes are parsed instead if given.
+    """
     match format:
         case "json":
             try:
@@ -64,8 +218,32 @@ def readpage(url, format=None, cache_into=None, **kwargs):
             )
             return yaml.safe_load(content)
         case "xml":
-            return BeautifulSoup(resp.content, features="xml")
+            return BeautifulSoup(
+                raw if raw is not None else content, features="xml"
+            )
         case "html":
             return BeautifulSoup(content, features="lxml")
         case _:
             return content
+
+
+def readpage(url, format=None, cache_into=None, method="get", **kwargs):
+    resp = None
+    host = urllib.parse.urlparse(url).netloc
+    with profiled("readpage", key=host) as event:
+        if cache_into and cache_into.exists():
+            content = cache_into.read_text()
+
+        else:
+            resp = requests.request(method, url, **kwargs)
+            resp.raise_for_status()
+            content = _decode(resp)
+
+            if cache_into:
+                cache_into.parent.mkdir(parents=True, exist_ok=True)
+                cache_into.write_text(content)
+        event["bytes"] = len(content)
+
+    return parse_page(
+        content, format, raw=resp.content if resp is not None else None
+    )
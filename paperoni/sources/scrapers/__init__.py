@@ -1,11 +1,31 @@
-from pathlib import Path
+from importlib import import_module
+
+# Entry point of each scraper, as module:attribute relative to this package.
+# The modules are only imported when load_scraper is called, so that the
+# commands that do not scrape do not pay for their dependencies.
+scraper_entry_points = {
+    "jmlr": "jmlr:JMRLScraper",
+    "mlr": "mlr:MLRScraper",
+    "neurips": "neurips:NeurIPSScraper",
+    "openalex": "openalex:OpenAlexScraper",
+    "openreview": "openreview:OpenReviewPaperScraperV1",
+    "openreview-venues": "openreview:OpenReviewVenueScraperV1",
+    "openreview-profiles": "openreview:OpenReviewProfileScraperV1",
+    "openreview2": "openreview:OpenReviewPaperScraperV2",
+    "openreview2-venues": "openreview:OpenReviewVenueScraperV2",
+    "openreview2-profiles": "openreview:OpenReviewProfileScraperV2",
+    "refine": "refine:Refiner",
+    "semantic_scholar": "semantic_scholar:SemanticScholarScraper",
+    "semantic_scholar_author": "semantic_scholar:SemanticScholarAuthorScraper",
+    "zeta-alpha": "zeta-alpha:ZetaAlphaScraper",
+}
+
+
+def load_scraper(name):
+    """Import the module of the named scraper and return the scraper."""
+    module, attribute = scraper_entry_points[name].split(":")
+    return getattr(import_module(f"{__name__}.{module}"), attribute)
 
 
 def load_scrapers():
-    scrapers = {}
-    for file in Path(__file__).parent.iterdir():
-        if file.name.endswith(".py") and not file.name.startswith("__"):
-            mod = __import__(__spec__.name, fromlist=[file.stem])
-            mod = getattr(mod, file.stem)
-            scrapers.update(getattr(mod, "__scrapers__", {}))
-    return scrapers
+    return {name: load_scraper(name) for name in scraper_entry_points}
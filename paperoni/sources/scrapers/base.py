@@ -1,13 +1,22 @@
+import hashlib
+import json
+import re
 import time
 from datetime import datetime, timedelta
 
 from coleo import Option, tooled
-from sqlalchemy import select
+from sqlalchemy import delete, select
 
-from paperoni.sources.acquire import readpage
+from paperoni.sources.acquire import (
+    concurrent_map,
+    parse_page,
+    readpage,
+    revalidate_into,
+)
 from paperoni.utils import asciiify
 
 from ... import model as M
+from ...config import papconf
 from ...db import schema as sch
 
 
@@ -15,6 +24,67 @@ class BaseScraper:
     def __init__(self, config, db):
         self.config = config
         self.db = db
+        # Whether acquire should pick up where an interrupted run stopped
+        self.resume = False
+        # Name under which checkpoints are saved in scraper_data
+        self.checkpoint_scope = f"checkpoint:{type(self).__name__}"
+        # Scopes of the ScraperData that are bookkeeping for the scraper
+        # itself and are kept out of the history
+        self.unlogged_scopes = {self.checkpoint_scope}
+        self._checkpoints = None
+
+    def checkpoint(self, key, cursor=None):
+        """Return a ScraperData entry that saves the progress made on key.
+
+        Without a cursor, key is marked as completed, and a later
+        ``acquire --resume`` skips it altogether. With a cursor, key was only
+        acquired up to that cursor, and ``acquire --resume`` continues from
+        there (see saved_cursor).
+        """
+        return M.ScraperData(
+            scraper=self.checkpoint_scope,
+            tag=str(key),
+            data=json.dumps({"cursor": cursor, "done": cursor is None}),
+            date=datetime.now(),
+        )
+
+    def saved_checkpoint(self, key):
+        """Return the checkpoint saved for key, if we are resuming.
+
+        The checkpoint is a dict with a "cursor" and a "done" field, or None
+        if there is nothing to resume from.
+        """
+        if not self.resume:
+            return None
+        if self._checkpoints is None:
+            q = select(sch.ScraperData).filter(
+                sch.ScraperData.scraper == self.checkpoint_scope
+            )
+            self._checkpoints = {
+                sd.tag: json.loads(sd.data)
+                for (sd,) in self.db.session.execute(q)
+                if sd.data
+            }
+        return self._checkpoints.get(str(key), None)
+
+    def saved_cursor(self, key):
+        """Return the cursor to continue key from, if we are resuming."""
+        ckpt = self.saved_checkpoint(key)
+        return ckpt and ckpt.get("cursor", None)
+
+    def is_done(self, key):
+        """Check whether key was completed by the run we are resuming."""
+        ckpt = self.saved_checkpoint(key)
+        return bool(ckpt and ckpt["done"])
+
+    def clear_checkpoints(self):
+        """Remove all checkpoints, once an acquire ran to completion."""
+        self.db.session.execute(
+            delete(sch.ScraperData).where(
+                sch.ScraperData.scraper == self.checkpoint_scope
+            )
+        )
+        self._checkpoints = None
 
     @tooled
     def generate_ids(
@@ -92,6 +162,54 @@ class BaseScraper:
 
 
 class ProceedingsScraper(BaseScraper):
+    def __init__(self, config, db):
+        super().__init__(config, db)
+        # Signature of the index of each volume that was completely acquired
+        self.completed_volumes = {}
+        # Signature of the index of each volume read in this run
+        self.volume_signatures = {}
+        # Volumes skipped in this run because their index did not change
+        self.unchanged_volumes = set()
+
+    def cache_path(self, *parts, cache=True):
+        if not cache or not papconf.paths.cache:
+            return None
+        return papconf.paths.cache.joinpath(self.scraper_name, *parts)
+
+    def read_index(self, volume, url, format, names=None, cache=True):
+        """Read the index of a volume.
+
+        If caching is enabled, the cached index is revalidated with a
+        conditional request. Returns None if neither the index nor the names
+        to look for changed since the last time the volume was completely
+        acquired, in which case the volume can be skipped.
+        """
+        cache_into = self.cache_path(f"{volume}", cache=cache)
+        if cache_into:
+            revalidate_into(url, cache_into)
+            content = cache_into.read_text()
+        else:
+            content = readpage(url)
+        sig = hashlib.sha256(content.encode("utf8"))
+        sig.update("\n".join(sorted(names or [])).encode("utf8"))
+        signature = sig.hexdigest()
+        if self.completed_volumes.get(volume, None) == signature:
+            print(f"Volume {volume} is unchanged, skipping")
+            self.unchanged_volumes.add(volume)
+            return None
+        self.volume_signatures[volume] = signature
+        return parse_page(content, format)
+
+    def load_completed_volumes(self):
+        q = select(sch.ScraperData).filter(
+            sch.ScraperData.scraper == self.scraper_name
+        )
+        return {
+            sd.tag.removeprefix("volume:"): sd.data
+            for (sd,) in self.db.session.execute(q)
+            if sd.tag.startswith("volume:")
+        }
+
     @tooled
     def query(
         self,
@@ -106,12 +224,14 @@ class ProceedingsScraper(BaseScraper):
         # Whether to cache the download
         # [negate]
         cache: Option & bool = True,
+        # Number of papers to fetch in parallel
+        workers: Option & int = 8,
     ):
         names = name and {asciiify(n).lower() for n in name}
         for i, vol in enumerate(volume):
             if i > 0:
                 time.sleep(1)
-            results = self.get_volume(vol, names, cache)
+            results = self.get_volume(vol, names, cache, workers)
             for paper in results:
                 if not paper:
                     continue
@@ -121,6 +241,30 @@ class ProceedingsScraper(BaseScraper):
                 ):
                     yield paper
 
+    def name_filter(self, names):
+        """Return a function that checks if a string contains any of names.
+
+        The names should be normalized with ``asciiify(name).lower()``, and so
+        should the string given to the function. If names is empty or None,
+        the filter accepts everything.
+        """
+        if not names:
+            return lambda text: True
+        rx = re.compile(
+            "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+        )
+        return lambda text: rx.search(text) is not None
+
+    def fetch_papers(self, fn, jobs, workers=1):
+        """Call fn(*job) for each job using a pool of workers.
+
+        Papers are yielded in the same order as jobs, skipping failures
+        (None).
+        """
+        for paper in concurrent_map(lambda job: fn(*job), jobs, workers):
+            if paper:
+                yield paper
+
     def extract_volumes(self, index, selector, map=None, filter=None):
         main = readpage(index, format="html")
         urls = [lnk.attrs["href"] for lnk in main.select(selector)]
@@ -149,14 +293,34 @@ class ProceedingsScraper(BaseScraper):
     def acquire(self):
         volumes = self.list_volumes()
         names = self.list_names()
+        self.completed_volumes = self.load_completed_volumes()
         yield M.Meta(
             scraper=self.scraper_name,
             date=datetime.now(),
         )
-        yield from self.query(
-            volume=volumes,
-            name=names,
-        )
+        for i, vol in enumerate(volumes):
+            if self.is_done(f"volume:{vol}"):
+                print(f"Volume {vol} was acquired by the interrupted run")
+                continue
+            if i > 0:
+                time.sleep(1)
+            yield from self.query(
+                volume=[vol],
+                name=names,
+            )
+            # The signature is only registered once the index has been read
+            # successfully, so we can mark the volume as complete. A volume
+            # that failed is neither, and will be acquired again on resume.
+            if vol in self.volume_signatures:
+                yield M.ScraperData(
+                    scraper=self.scraper_name,
+                    tag=f"volume:{vol}",
+                    data=self.volume_signatures.pop(vol),
+                    date=datetime.now(),
+                )
+                yield self.checkpoint(f"volume:{vol}")
+            elif vol in self.unchanged_volumes:
+                yield self.checkpoint(f"volume:{vol}")
 
     @tooled
     def prepare(self):
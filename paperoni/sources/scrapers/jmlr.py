@@ -3,7 +3,6 @@ from traceback import print_exc
 
 import bibtexparser
 
-from ...config import papconf
 from ...model import (
     Author,
     DatePrecision,
@@ -23,9 +22,14 @@ class JMRLScraper(ProceedingsScraper):
     scraper_name = "jmlr"
     urlbase = "https://jmlr.org"
 
-    def get_paper(self, links):
+    def get_paper(self, volume, links, cache=False):
         biblink = f"{self.urlbase}{links['bib']}"
-        raw_data = readpage(biblink)
+        raw_data = readpage(
+            biblink,
+            cache_into=self.cache_path(
+                "papers", volume, links["bib"].split("/")[-1], cache=cache
+            ),
+        )
         data = bibtexparser.parse_string(
             raw_data,
             append_middleware=[
@@ -78,31 +82,37 @@ class JMRLScraper(ProceedingsScraper):
             ],
         )
 
-    def get_volume(self, volume, names, cache=False):
+    def get_volume(self, volume, names, cache=False, workers=1):
         print(f"Fetching JMLR {volume}")
         try:
-            index = readpage(
+            index = self.read_index(
+                volume,
                 f"{self.urlbase}/papers/{volume}",
                 format="html",
-                cache_into=cache
-                and papconf.paths.cache
-                and papconf.paths.cache / "jmlr" / f"{volume}",
+                names=names,
+                cache=cache,
             )
         except Exception:
             print_exc()
             return
 
+        if index is None:
+            return
+
+        # Only fetch the bibtex of papers with at least one matching author
+        accept = self.name_filter(names)
+        jobs = []
         for entry in index.select("dl"):
             links = {x.text: x.attrs["href"] for x in entry.select("a")}
             if "bib" not in links:
                 continue
             if names:
                 authors = asciiify(entry.select_one("b").text).lower()
-                if not any(name in authors for name in names):
+                if not accept(authors):
                     continue
-            paper = self.get_paper(links)
-            if paper:
-                yield paper
+            jobs.append((volume, links, cache))
+
+        yield from self.fetch_papers(self.get_paper, jobs, workers)
 
     def list_volumes(self):
         return self.extract_volumes(
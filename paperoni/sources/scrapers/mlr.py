@@ -16,9 +16,7 @@ from paperoni.model import (
     VenueType,
 )
 
-from ...config import papconf
 from ...utils import asciiify
-from ..acquire import readpage
 from .base import ProceedingsScraper
 
 
@@ -71,19 +69,28 @@ def parse_paper(entry):
 class MLRScraper(ProceedingsScraper):
     scraper_name = "mlr"
 
-    def get_volume(self, volume, cache=False):
+    def get_volume(self, volume, names=None, cache=False):
         print(f"Fetching PMLR {volume}")
         try:
-            papers = readpage(
+            papers = self.read_index(
+                volume,
                 f"https://proceedings.mlr.press/{volume}/assets/bib/citeproc.yaml",
                 format="yaml",
-                cache_into=cache
-                and papconf.paths.cache
-                and papconf.paths.cache / "mlr" / f"{volume}",
+                names=names,
+                cache=cache,
             )
-            for paper in papers:
+            for paper in papers or []:
+                # Skip parsing papers that cannot match
+                if names and not any(
+                    asciiify(f"{a.get('given')} {a.get('family')}").lower()
+                    in names
+                    for a in paper.get("author", None) or []
+                ):
+                    continue
                 yield parse_paper(paper)
         except Exception:
+            # Do not mark the volume as complete
+            self.volume_signatures.pop(volume, None)
             print_exc()
 
     @tooled
@@ -105,7 +112,7 @@ class MLRScraper(ProceedingsScraper):
         for i, vol in enumerate(volume):
             if i > 0:
                 time.sleep(1)
-            results = self.get_volume(vol, cache)
+            results = self.get_volume(vol, names, cache)
             for paper in results:
                 try:
                     if paper and (
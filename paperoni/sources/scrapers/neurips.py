@@ -4,7 +4,6 @@ from traceback import print_exc
 import bibtexparser
 from requests import HTTPError
 
-from ...config import papconf
 from ...model import (
     Author,
     DatePrecision,
@@ -26,14 +25,20 @@ class NeurIPSScraper(ProceedingsScraper):
     scraper_name = "neurips"
     urlbase = "https://proceedings.neurips.cc"
 
-    def get_paper_json(self, volume, hsh, html, conference_title):
+    def get_paper_json(self, volume, hsh, html, conference_title, cache=False):
         pdf_path = (
             html.replace("Abstract", "Paper")
             .replace(".html", ".pdf")
             .replace("/hash/", "/file/")
         )
         metalink = f"{self.urlbase}/paper_files/paper/{volume}/file/{hsh}-Metadata.json"
-        entry = readpage(metalink, format="json")
+        entry = readpage(
+            metalink,
+            format="json",
+            cache_into=self.cache_path(
+                "papers", volume, f"{hsh}-Metadata.json", cache=cache
+            ),
+        )
         return Paper(
             title=entry["title"],
             abstract=entry.get("abstract", ""),
@@ -83,11 +88,18 @@ class NeurIPSScraper(ProceedingsScraper):
             ],
         )
 
-    def get_paper_bibtex(self, volume, hsh, html, conference_title):
+    def get_paper_bibtex(
+        self, volume, hsh, html, conference_title, cache=False
+    ):
         biblink = (
             f"{self.urlbase}/paper_files/paper/{volume}/file/{hsh}-Bibtex.bib"
         )
-        raw_data = readpage(biblink)
+        raw_data = readpage(
+            biblink,
+            cache_into=self.cache_path(
+                "papers", volume, f"{hsh}-Bibtex.bib", cache=cache
+            ),
+        )
         data = bibtexparser.parse_string(
             raw_data,
             append_middleware=[
@@ -139,40 +151,50 @@ class NeurIPSScraper(ProceedingsScraper):
             ],
         )
 
-    def get_paper(self, volume, hsh, html, conference_title):
+    def get_paper(self, volume, hsh, html, conference_title, cache=False):
         try:
-            return self.get_paper_json(volume, hsh, html, conference_title)
+            return self.get_paper_json(
+                volume, hsh, html, conference_title, cache
+            )
         except HTTPError:
-            return self.get_paper_bibtex(volume, hsh, html, conference_title)
+            return self.get_paper_bibtex(
+                volume, hsh, html, conference_title, cache
+            )
 
-    def get_volume(self, volume, names, cache=False):
+    def get_volume(self, volume, names, cache=False, workers=1):
         print(f"Fetching NeurIPS {volume}")
         try:
-            index = readpage(
+            index = self.read_index(
+                volume,
                 f"{self.urlbase}/paper_files/paper/{volume}",
                 format="html",
-                cache_into=cache
-                and papconf.paths.cache
-                and papconf.paths.cache / "neurips" / f"{volume}",
+                names=names,
+                cache=cache,
             )
         except Exception:
             print_exc()
             return
 
+        if index is None:
+            return
+
         conference_title = index.select_one("h4").text
         assert "Neural Information Processing Systems" in conference_title
 
+        # Only fetch the metadata of papers with at least one matching author
+        accept = self.name_filter(names)
+        jobs = []
         for entry in index.select("li"):
             link = entry.select_one("a")["href"]
             if f"paper/{volume}/hash" in link:
                 hsh = link.split("/")[-1].split("-")[0]
                 if names:
                     authors = asciiify(entry.select_one("i").text).lower()
-                    if not any(name in authors for name in names):
+                    if not accept(authors):
                         continue
-                paper = self.get_paper(volume, hsh, link, conference_title)
-                if paper:
-                    yield paper
+                jobs.append((volume, hsh, link, conference_title, cache))
+
+        yield from self.fetch_papers(self.get_paper, jobs, workers)
 
     def list_volumes(self):
         return self.extract_volumes(
@@ -1,25 +1,29 @@
 import pprint
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 
-from coleo import tooled, Option
+from coleo import Option, tooled
+from requests import RequestException
 
-from .base import BaseScraper
-from ..acquire import HTTPSAcquirer
 from ...model import (
-    Paper,
-    Release,
-    Venue,
-    Link,
     Author,
-    Topic,
-    PaperAuthor,
+    DatePrecision,
     Institution,
     InstitutionCategory,
+    Link,
+    Meta,
+    Paper,
+    PaperAuthor,
+    Release,
+    Topic,
+    Venue,
     VenueType,
-    DatePrecision,
 )
 from ...utils import QueryError, link_generators as LINK_GENERATORS
+from ..acquire import HTTPSAcquirer, concurrent_map
+from ..helpers import filter_papers, filter_researchers_interface
+from .base import BaseScraper
 
 # https://docs.openalex.org/api-entities/institutions/institution-object#type
 INSTITUTION_CATEGORY_MAPPING = {
@@ -71,8 +75,13 @@ def _get_link(link_type: str, link_value: str) -> Link:
 
 
 class OpenAlexQueryManager:
+    # OpenAlex allows at most 10 requests per second
+    REQUEST_DELAY = 0.1
+
     def __init__(self, *, mailto=None):
-        self.conn = HTTPSAcquirer("api.openalex.org", format="json")
+        self.conn = HTTPSAcquirer(
+            "api.openalex.org", format="json", delay=self.REQUEST_DELAY
+        )
         self.mailto = mailto
 
     def find_author_id(self, author: str) -> Optional[str]:
@@ -98,33 +107,55 @@ class OpenAlexQueryManager:
         per_page: int = None,
         page: int = None,
         verbose=False,
+        mark: dict = None,
         **params,
     ):
-        pagination = page is not None and per_page is not None
-        if page is None:
-            page = 1
-        if per_page is None:
-            per_page = 25
-        while True:
-            local_params = {"page": page, "per-page": per_page, **params}
-            results = self._evaluate(path, **local_params)
-            if not results["results"]:
-                # No more results.
-                break
+        if page is not None and per_page is not None:
+            # Display only this page
+            results = self._evaluate(
+                path, page=page, **{"per-page": per_page}, **params
+            )
             if verbose:
-                nb_results = len(results["results"])
-                nb_total = results["meta"]["count"]
-                nb_page = nb_total // per_page + bool(nb_total % per_page)
-                print(
-                    f"[page {page} / {nb_page}, {nb_results} results per page, {nb_total} total results]"
-                )
-            for entry in results["results"]:
-                yield entry
-            if pagination:
-                # Display only this page
-                break
-            # Next page
-            page += 1
+                self._print_progress(results, page, per_page)
+            yield from results["results"]
+            return
+
+        if per_page is None:
+            per_page = 200
+
+        # Use cursor pagination, which is not limited in depth, and fetch the
+        # next page in the background while the current one is processed.
+        # If mark is given, the listing starts at mark["cursor"], which is
+        # moved past each page once all of its entries have been yielded.
+        def fetch(cursor):
+            return self._evaluate(
+                path, cursor=cursor, **{"per-page": per_page}, **params
+            )
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(fetch, mark["cursor"] if mark else "*")
+            page = 1
+            while future is not None:
+                results = future.result()
+                if not results["results"]:
+                    # No more results.
+                    break
+                cursor = results["meta"].get("next_cursor", None)
+                future = executor.submit(fetch, cursor) if cursor else None
+                if verbose:
+                    self._print_progress(results, page, per_page)
+                yield from results["results"]
+                if mark is not None and cursor:
+                    mark["cursor"] = cursor
+                page += 1
+
+    def _print_progress(self, results, page, per_page):
+        nb_results = len(results["results"])
+        nb_total = results["meta"]["count"]
+        nb_page = nb_total // per_page + bool(nb_total % per_page)
+        print(
+            f"[page {page} / {nb_page}, {nb_results} results per page, {nb_total} total results]"
+        )
 
     def _evaluate(self, path: str, **params):
         if self.mailto:
@@ -403,7 +434,56 @@ class OpenAlexScraper(BaseScraper):
     @tooled
     def acquire(self):
         # paperoni acquire openalex
-        return []
+
+        # Number of authors to query in parallel
+        workers: Option & int = 4
+
+        queries = self.generate_ids(scraper="openalex")
+        queries = filter_researchers_interface(
+            list(queries), getname=lambda row: row[0]
+        )
+        jobs = [
+            (name, oaid, start, end, self.saved_cursor(f"author:{oaid}"))
+            for name, ids, start, end in queries
+            for oaid in ids
+            if not self.is_done(f"author:{oaid}")
+        ]
+
+        qm = OpenAlexQueryManager(mailto=self.config.mailto)
+
+        def fetch(job):
+            name, oaid, start, end, cursor = job
+            print(f"Fetch papers for {name} (ID={oaid})")
+            filters = [
+                f"author.id:{oaid}",
+                f"from_publication_date:{start.strftime('%Y-%m-%d')}",
+            ]
+            mark = {"cursor": cursor or "*"}
+            papers = []
+            try:
+                for paper in filter_papers(
+                    papers=qm.works(filter=",".join(filters), mark=mark),
+                    start=start,
+                    end=end,
+                ):
+                    papers.append(paper)
+            except (RequestException, QueryError) as exc:
+                # Save how far we got, so that --resume continues from there
+                ckpt = self.checkpoint(f"author:{oaid}", cursor=mark["cursor"])
+                return [*papers, ckpt], exc
+            return [*papers, self.checkpoint(f"author:{oaid}")], None
+
+        yield Meta(
+            scraper="openalex",
+            date=datetime.now(),
+        )
+
+        for papers, error in concurrent_map(
+            fetch, jobs, workers=workers, ordered=False
+        ):
+            yield from papers
+            if error is not None:
+                raise error
 
 
 __scrapers__ = {"openalex": OpenAlexScraper}
@@ -1,3 +1,4 @@
+import json
 import re
 import sys
 import time
@@ -6,11 +7,14 @@ from fnmatch import fnmatch
 from functools import reduce
 
 import openreview
+import requests
 from coleo import Option, tooled
+from sqlalchemy import select
 
 from paperoni.display import display
 
 from ...config import papconf
+from ...db import schema as sch
 from ...model import (
     Author,
     DatePrecision,
@@ -28,6 +32,7 @@ from ...model import (
     VenueType,
 )
 from ...utils import Doing, covguard, extract_date
+from ..acquire import RateLimiter, concurrent_map
 from ..helpers import (
     filter_papers,
     filter_researchers_interface,
@@ -59,11 +64,29 @@ def parse_openreview_venue(venue):
 
 
 class OpenReviewScraperBase(BaseScraper):
+    # Minimal delay between two requests for notes, across all threads
+    REQUEST_DELAY = 0.2
+    # Number of notes fetched by each request
+    PAGE_SIZE = 1000
+
     def __init__(self, config, db, api_version):
         super().__init__(config=config, db=db)
         self.api_version = api_version
+        self.limiter = RateLimiter(self.REQUEST_DELAY)
+        self.venue_members = None
+        self.tmdate_scraper = f"{self.scraper_prefix}-tmdate"
+        self.decision_scraper = f"{self.scraper_prefix}-decision"
+        self.unlogged_scopes.add(self.decision_scraper)
+        # note id -> (replies signature, decision)
+        self.decisions = {}
+        # venue -> decisions of its notes, as saved by the last crawl
+        self.saved_decisions = {}
         self.set_client()
 
+    @property
+    def scraper_prefix(self):
+        return {1: "openreview", 2: "openreview2"}[self.api_version]
+
     def set_client(self):
         api = {1: "api", 2: "api2"}[self.api_version]
         self.client = openreview.Client(baseurl=f"https://{api}.openreview.net")
@@ -175,6 +198,81 @@ class OpenReviewScraperBase(BaseScraper):
         # welp. whatever.
         return None
 
+    def decide(self, note):
+        """Cached version of figure_out_the_fking_decision.
+
+        The decision is only recomputed if the replies to the note changed
+        since the last time we saw it.
+        """
+        replies = note.details["replies"]
+        signature = [
+            len(replies),
+            max((r.get("tmdate") or 0 for r in replies), default=0),
+            note.tmdate,
+        ]
+        cached_signature, decision = self.decisions.get(note.id, (None, None))
+        if cached_signature != signature:
+            decision = self.figure_out_the_fking_decision(note)
+            self.decisions[note.id] = (signature, decision)
+        return decision
+
+    def load_decisions(self):
+        """Return the decisions saved by the previous crawls, by venue."""
+        q = select(sch.ScraperData).filter(
+            sch.ScraperData.scraper == self.decision_scraper
+        )
+        return {
+            sd.tag: {
+                note_id: tuple(entry)
+                for note_id, entry in json.loads(sd.data).items()
+            }
+            for (sd,) in self.db.session.execute(q)
+        }
+
+    def decision_entries(self, venue, note_ids, complete=False):
+        """Yield a ScraperData for the decisions of the venue, if changed.
+
+        The decisions of note_ids are merged with the ones saved for the
+        venue, unless complete is True, in which case note_ids are all the
+        notes of the venue and replace the saved ones.
+        """
+        saved = self.saved_decisions.get(venue, {})
+        entries = {} if complete else dict(saved)
+        for note_id in note_ids:
+            if note_id in self.decisions:
+                entries[note_id] = self.decisions[note_id]
+        if entries != saved:
+            yield ScraperData(
+                scraper=self.decision_scraper,
+                tag=venue,
+                data=json.dumps(entries),
+                date=datetime.now(),
+            )
+
+    def load_tmdates(self):
+        """Return the tmdate high-water mark of each venue we crawled."""
+        q = select(sch.ScraperData).filter(
+            sch.ScraperData.scraper == self.tmdate_scraper
+        )
+        return {
+            sd.tag: int(sd.data)
+            for (sd,) in self.db.session.execute(q)
+            if sd.data
+        }
+
+    def _get_notes(self, params, since=None):
+        """Fetch the page of notes that starts at params["offset"].
+
+        If since is given, the notes are sorted from the most to the least
+        recently modified, so that the crawl can stop at the first note that
+        was not modified after since.
+        """
+        self.limiter.wait()
+        sort = {"sort": "tmdate:desc"} if since else {}
+        return self.client.get_notes(
+            **params, limit=self.PAGE_SIZE, details="replies", **sort
+        )
+
     @staticmethod
     def _map_venue_type(venueid):
         for v_type in VenueType:
@@ -183,12 +281,25 @@ class OpenReviewScraperBase(BaseScraper):
         else:
             return VenueType.unknown
 
-    def _query(self, params, total=0, limit=1000000):
-        next_offset = 0
+    def _query(self, params, total=0, limit=1000000, since=None, mark=None):
+        # The query starts at params["offset"], and mark["offset"] is moved
+        # past each page once all of its notes have been processed
+        next_offset = params.get("offset", 0) or 0
         while total < limit:
             params["offset"] = next_offset
-            notes = self.client.get_all_notes(**params, details="replies")
+            page = self._get_notes(params, since=since)
+            notes = [n for n in page if not since or n.tmdate > since]
             for note in notes:
+                if mark is not None:
+                    mark["tmdate"] = max(
+                        mark["tmdate"],
+                        note.tmdate or 0,
+                        *(
+                            r.get("tmdate") or 0
+                            for r in note.details["replies"]
+                        ),
+                    )
+                    mark["notes"].append(note.id)
                 vid = self.get_venue_id(note)
                 if not vid:
                     continue
@@ -235,7 +346,7 @@ class OpenReviewScraperBase(BaseScraper):
 
                 venue = self.get_content_field(note, "venue") or note.invitation
                 venue_data = parse_openreview_venue(venue)
-                decision = self.figure_out_the_fking_decision(note) or "unknown"
+                decision = self.decide(note) or "unknown"
 
                 if "status" not in venue_data and note.pdate:
                     venue_data["status"] = "published"
@@ -287,28 +398,131 @@ class OpenReviewScraperBase(BaseScraper):
                     links=_links,
                     citation_count=None,
                 )
-            next_offset += len(notes)
-            if not notes or "id" in params:
+            next_offset += len(page)
+            if mark is not None:
+                mark["offset"] = next_offset
+            if (
+                len(page) < self.PAGE_SIZE
+                or len(notes) < len(page)
+                or "id" in params
+            ):
                 break
         total += next_offset
 
     def _query_papers_from_venues(
-        self, params, venues=None, total=0, limit=1000000
+        self,
+        params,
+        venues=None,
+        total=0,
+        limit=1000000,
+        track_tmdate=False,
+        full=False,
+        workers=1,
     ):
+        """Query papers from each venue.
+
+        If track_tmdate is True, a ScraperData entry with the latest
+        modification date seen is yielded after each venue, and unless full
+        is True, only the notes that were modified since the last crawl of
+        each venue are fetched.
+
+        Up to ``workers`` venues are crawled at the same time, sharing the
+        same client. The papers of a venue are yielded as soon as that venue
+        is complete, and an error in one venue does not affect the others.
+        With track_tmdate, the venue that failed is checkpointed at the page
+        where it stopped, and ``acquire --resume`` continues it from there.
+        """
         if not venues:  # pragma: no cover
             venues = self.client.get_group(id="venues").members
 
-        for v in venues:
+        tmdates = self.load_tmdates() if track_tmdate and not full else {}
+        if track_tmdate:
+            venues = [v for v in venues if not self.is_done(f"venue:{v}")]
+            self.saved_decisions = self.load_decisions()
+            for saved in self.saved_decisions.values():
+                self.decisions.update(saved)
+        cursors = {v: self.saved_cursor(f"venue:{v}") for v in venues}
+
+        def crawl(v):
+            venue_params = params
             if v is not None:
                 print(f"Fetching from venue {v}")
-                params = {
+                venue_params = {
                     **params,
                     "content": {**params["content"], "venueid": v},
                 }
 
-            for paper in self._query(params, total, limit):
-                total += 1
-                yield paper
+            since = tmdates.get(v, None)
+            # A new reply, such as a decision, does not necessarily change
+            # the tmdate of the submission, and get_notes only documents
+            # exact invitation ids, so there is no reliable way to list the
+            # new replies of a venue. Venues with submissions that are still
+            # waiting for a decision are therefore crawled in full, and they
+            # go back to incremental crawls once every decision is known.
+            if any(
+                decision is None
+                for _, decision in self.saved_decisions.get(v, {}).values()
+            ):
+                since = None
+            mark = {"tmdate": since or 0, "notes": [], "offset": 0}
+            if cursor := cursors[v]:
+                # Continue the crawl that failed, in the same order
+                since = cursor["since"]
+                mark.update(tmdate=cursor["tmdate"], offset=cursor["offset"])
+                venue_params = {**venue_params, "offset": cursor["offset"]}
+            results = []
+            try:
+                for paper in self._query(
+                    venue_params, total, limit, since=since, mark=mark
+                ):
+                    results.append(paper)
+            except (
+                openreview.OpenReviewException,
+                requests.exceptions.RequestException,
+            ) as exc:
+                print(f"Failed to fetch from venue {v}: {exc}", file=sys.stderr)
+                # Do not move the high-water mark past notes we did not get,
+                # but save how far we got, so that --resume continues there
+                if track_tmdate:
+                    results.extend(self.decision_entries(v, mark["notes"]))
+                    cursor = {
+                        "offset": mark["offset"],
+                        "since": since,
+                        "tmdate": mark["tmdate"],
+                    }
+                    results.append(self.checkpoint(f"venue:{v}", cursor=cursor))
+                return results
+
+            if track_tmdate:
+                results.extend(
+                    self.decision_entries(
+                        v,
+                        mark["notes"],
+                        complete=since is None and not cursors[v],
+                    )
+                )
+            if track_tmdate and v is not None and mark["tmdate"]:
+                results.append(
+                    ScraperData(
+                        scraper=self.tmdate_scraper,
+                        tag=v,
+                        data=str(mark["tmdate"]),
+                        date=datetime.now(),
+                    )
+                )
+            if track_tmdate:
+                results.append(self.checkpoint(f"venue:{v}"))
+            return results
+
+        for results in concurrent_map(
+            crawl, venues, workers=workers, ordered=False
+        ):
+            for result in results:
+                if isinstance(result, Paper):
+                    if total >= limit:
+                        continue
+                    total += 1
+                yield result
 
     def _query_venues(self, venues):
         patterns = {
@@ -440,10 +654,12 @@ class OpenReviewScraperBase(BaseScraper):
         elif "*" not in pattern:
             return [pattern]
         else:
-            members = self.client.get_group(id="venues").members
+            # The list of venues is fetched once and shared by all patterns
+            if self.venue_members is None:
+                self.venue_members = self.client.get_group(id="venues").members
             return [
                 member
-                for member in members
+                for member in self.venue_members
                 if fnmatch(pat=pattern.lower(), name=member.lower())
             ]
 
@@ -518,10 +734,21 @@ class OpenReviewPaperScraper(OpenReviewScraperBase):
         # [nargs: +]
         venue: Option = None
 
+        # Fetch all the notes of the venues, not only those that were
+        # modified since the last crawl
+        full: Option & bool = False
+
+        # Number of venues to crawl concurrently
+        workers: Option & int = 4
+
         if venue:
             venues = self._venues_from_wildcard(venue)
             yield from self._query_papers_from_venues(
-                params={"content": {}}, venues=venues
+                params={"content": {}},
+                venues=venues,
+                track_tmdate=True,
+                full=full,
+                workers=workers,
             )
 
         else:
@@ -537,16 +764,35 @@ class OpenReviewPaperScraper(OpenReviewScraperBase):
 
             for name, ids, start, end in queries:
                 for author_id in ids:
+                    key = f"author:{author_id}"
+                    if self.is_done(key):
+                        continue
                     print(f"Fetch papers for {name} (ID={author_id})")
                     params = {
                         "content": {"authorids": [author_id]},
                         "mintcdate": int(start.timestamp() * 1000),
+                        "offset": self.saved_cursor(key) or 0,
                     }
-                    yield from filter_papers(
-                        papers=self._query(params),
-                        start=start,
-                        end=end,
-                    )
+                    mark = {
+                        "tmdate": 0,
+                        "notes": [],
+                        "offset": params["offset"],
+                    }
+                    try:
+                        yield from filter_papers(
+                            papers=self._query(params, mark=mark),
+                            start=start,
+                            end=end,
+                        )
+                    except (
+                        openreview.OpenReviewException,
+                        requests.exceptions.RequestException,
+                    ):
+                        # Save how far we got, so that --resume continues
+                        # from there
+                        yield self.checkpoint(key, cursor=mark["offset"])
+                        raise
+                    yield self.checkpoint(key)
                     time.sleep(5)
 
     @tooled
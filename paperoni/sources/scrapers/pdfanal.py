@@ -1,17 +1,23 @@
+import io
 import re
+import struct
 import subprocess
 import sys
 import unicodedata
-from collections import defaultdict, deque
+import zlib
+from array import array
+from collections import defaultdict
 from functools import cached_property
 from itertools import groupby
 from typing import Generic, TypeVar
 
-import bs4
 from blessed import Terminal
+from lxml import etree
 from ovld import ovld
 from pydantic import BaseModel as _BaseModel
 
+from ...profiling import profiled
+
 T = TypeVar("T")
 term = Terminal()
 
@@ -96,38 +102,63 @@ class Document(Group[Line]):
     pass
 
 
-def coalesce(parts, initial_state, criterion):
-    def _coalesce():
-        if not q:
-            return None
-
-        elem = q.popleft()
-        results = list(elem.parts)
-        state = initial_state(elem)
-        while q:
-            elem = q[0]
-            new_state = criterion(state, elem)
-            if new_state:
-                q.popleft()
-                state = new_state
-                results.extend(elem.parts)
-            else:
-                break
-        return results
-
-    if not parts:
-        return []
-
-    q = deque(parts)
-
-    rval = []
-    while q:
-        new_parts = _coalesce()
-        if new_parts is None:
-            break
-        rval.append(new_parts)
+class Layout:
+    """Words of a layout document, stored column-wise.
+
+    Word i has text ``texts[i]`` and coordinates ``xmin[i]``, ``xmax[i]``,
+    ``ymin[i]`` and ``ymax[i]``, normalized by the dimensions of its page (the
+    y coordinates are offset by the page number). The words of line j are the
+    words in the range ``starts[j]:starts[j + 1]``.
+    """
+
+    def __init__(self):
+        self.texts = []
+        self.xmin = array("d")
+        self.xmax = array("d")
+        self.ymin = array("d")
+        self.ymax = array("d")
+        self.starts = array("q", [0])
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def add_word(self, text, xmin, xmax, ymin, ymax):
+        self.texts.append(text)
+        self.xmin.append(xmin)
+        self.xmax.append(xmax)
+        self.ymin.append(ymin)
+        self.ymax.append(ymax)
+
+    def end_line(self):
+        if len(self.texts) > self.starts[-1]:
+            self.starts.append(len(self.texts))
+
+    def spans(self):
+        return zip(self.starts, self.starts[1:])
+
+    def line_bounds(self):
+        """Return the lists of xmin, xmax, ymin and ymax for each line."""
+        spans = list(self.spans())
+        return (
+            [min(self.xmin[s:e]) for s, e in spans],
+            [max(self.xmax[s:e]) for s, e in spans],
+            [min(self.ymin[s:e]) for s, e in spans],
+            [max(self.ymax[s:e]) for s, e in spans],
+        )
 
-    return rval
+    def words(self, lines):
+        """Return the Words of the given lines, in order."""
+        return [
+            Word.construct(
+                text=self.texts[i],
+                ymin=self.ymin[i],
+                ymax=self.ymax[i],
+                xmin=self.xmin[i],
+                xmax=self.xmax[i],
+            )
+            for j in lines
+            for i in range(self.starts[j], self.starts[j + 1])
+        ]
 
 
 def overlap(min1, max1, min2, max2):
@@ -142,63 +173,62 @@ def overlap(min1, max1, min2, max2):
 
 
 def make_document_from_lines(lines):
-    def _linear_init(elem):
-        return elem.xmax
-
-    def _linear_criterion(prev_xmax, elem):
-        if 0 < elem.xmin - prev_xmax < 0.01:
-            return elem.xmax
-        else:
-            return None
+    """Make a Document from Lines, each of which is taken as a single block."""
+    layout = Layout()
+    for line in lines:
+        for block in line.parts:
+            for w in block.parts:
+                layout.add_word(w.text, w.xmin, w.xmax, w.ymin, w.ymax)
+        layout.end_line()
+    return make_document_from_columns(layout)
 
-    def _similar_y_init(elem):
-        return (elem.ymin, elem.ymax)
 
-    def _similar_y_criterion(state, elem):
-        ymin, ymax = state
-        if overlap(elem.ymin, elem.ymax, ymin, ymax):
-            ymin = min(elem.ymin, ymin)
-            ymax = min(elem.ymax, ymax)
-            return (ymin, ymax)
-        else:
-            return None
+def make_document_from_columns(layout):
+    """Make a Document from a Layout.
 
-    # Remove large blocks
-    lines = [line for line in lines if line.ymax - line.ymin < 0.05]
+    The lines are merged and grouped using their bounds, and the Word, Block
+    and Line objects are only created for the final structure.
+    """
+    xmin, xmax, ymin, ymax = layout.line_bounds()
 
-    # Reorder vertically
-    lines.sort(key=lambda line: line.ymin)
+    # Remove large blocks, and reorder vertically
+    order = sorted(
+        (j for j in range(len(layout)) if ymax[j] - ymin[j] < 0.05),
+        key=ymin.__getitem__,
+    )
 
     # Merge lines that are y-aligned
-    lines = [
-        Line(parts=sorted(parts, key=lambda block: block.xmin))
-        for parts in coalesce(
-            parts=lines,
-            initial_state=_similar_y_init,
-            criterion=_similar_y_criterion,
-        )
-    ]
+    rows = []
+    bounds = None
+    for j in order:
+        if rows and overlap(ymin[j], ymax[j], *bounds):
+            rows[-1].append(j)
+            bounds = (min(ymin[j], bounds[0]), min(ymax[j], bounds[1]))
+        else:
+            rows.append([j])
+            bounds = (ymin[j], ymax[j])
 
     # Merge blocks inside lines that are close enough to their predecessors
-    lines = [
-        Line(
-            parts=[
-                Block(parts=new_parts)
-                for new_parts in coalesce(
-                    parts=line.parts,
-                    initial_state=_linear_init,
-                    criterion=_linear_criterion,
-                )
-            ]
+    lines = []
+    for row in rows:
+        row.sort(key=xmin.__getitem__)
+        groups = [[row[0]]]
+        for prev, j in zip(row, row[1:]):
+            if 0 < xmin[j] - xmax[prev] < 0.01:
+                groups[-1].append(j)
+            else:
+                groups.append([j])
+        lines.append(
+            Line.construct(
+                parts=[Block.construct(parts=layout.words(g)) for g in groups]
+            )
         )
-        for line in lines
-    ]
 
     # Regroup the blocks into columns. Each "line" now corresponds to a
     # visually contiguous block in the document.
     lines = columnize(lines)
 
-    doc = Document(parts=lines)
+    doc = Document.construct(parts=lines)
 
     # Mark superscripts
     mark_superscripts(doc)
@@ -220,42 +250,62 @@ def columnize(lines):
                 continue
             best = candidates.pop()
             if col.ymax - 0.01 < best.ymin < col.ymax + 0.01:
-                active_columns.append(Line(parts=[*col.parts, best]))
+                active_columns.append(Line.construct(parts=[*col.parts, best]))
             else:
                 done_columns.append(col)
-                active_columns.append(Line(parts=[best]))
-        active_columns.extend(Line(parts=[block]) for block in candidates)
+                active_columns.append(Line.construct(parts=[best]))
+        active_columns.extend(
+            Line.construct(parts=[block]) for block in candidates
+        )
 
     return [*done_columns, *active_columns]
 
 
-def make_document_from_layout(content):
-    content = unicodedata.normalize("NFKC", content)
-    soup = bs4.BeautifulSoup(content, "html.parser")
-    lines = []
-    for i, page in enumerate(soup.select("page")):
-        h = float(page["height"])
-        width = float(page["width"])
-        lines += [
-            Line(
-                parts=[
-                    Block(
-                        parts=[
-                            Word(
-                                text=w.text,
-                                ymin=float(w["ymin"]) / h + i,
-                                ymax=float(w["ymax"]) / h + i,
-                                xmin=float(w["xmin"]) / width,
-                                xmax=float(w["xmax"]) / width,
-                            )
-                            for w in line.select("word")
-                        ]
-                    )
-                ]
+def _localname(tag):
+    return tag.rpartition("}")[2]
+
+
+def parse_layout(content, max_pages=None):
+    """Read the output of ``pdftotext -bbox-layout`` into a Layout.
+
+    The document is parsed incrementally, and each line is discarded once its
+    words are read. If max_pages is given, parsing stops after that many
+    pages.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf8")
+    layout = Layout()
+    page = -1
+    for event, elem in etree.iterparse(
+        io.BytesIO(content), events=("start", "end"), recover=True
+    ):
+        tag = _localname(elem.tag)
+        if event == "start":
+            if tag == "page":
+                page += 1
+                if max_pages and page >= max_pages:
+                    break
+                h = float(elem.get("height"))
+                width = float(elem.get("width"))
+        elif tag == "word":
+            layout.add_word(
+                unicodedata.normalize("NFKC", elem.text or ""),
+                xmin=float(elem.get("xMin")) / width,
+                xmax=float(elem.get("xMax")) / width,
+                ymin=float(elem.get("yMin")) / h + page,
+                ymax=float(elem.get("yMax")) / h + page,
             )
-            for line in page.select("line")
-        ]
-    return make_document_from_lines(lines)
+        elif tag == "line":
+            layout.end_line()
+            elem.clear()
+        elif tag == "page":
+            elem.clear()
+    return layout
+
+
+def make_document_from_layout(content, max_pages=None):
+    with profiled("pdf.document", bytes=len(content)):
+        return make_document_from_columns(parse_layout(content, max_pages))
 
 
 #############################
@@ -378,6 +428,111 @@ def classify_superscripts(doc, lenient=True):
     return results
 
 
+##########################
+# Serialize the document #
+##########################
+
+
+# Increment this whenever the layout analysis or the format changes, so that
+# documents cached with an older version are rebuilt
+DOCUMENT_VERSION = 1
+DOCUMENT_MAGIC = b"PDOC"
+
+_document_header = struct.Struct("<4sI")
+_document_counts = struct.Struct("<III")
+
+
+def dump_document(doc):
+    """Serialize a Document, including superscript marks, into bytes.
+
+    The Document is stored column-wise: the number of blocks in each line,
+    the number of words in each block, then the coordinates, superscript
+    flags and texts of all words. The body is compressed.
+    """
+    nblocks = array("I")
+    nwords = array("I")
+    coords = array("d")
+    flags = bytearray()
+    texts = []
+    for line in doc.parts:
+        nblocks.append(len(line.parts))
+        for block in line.parts:
+            nwords.append(len(block.parts))
+            for w in block.parts:
+                coords.extend((w.xmin, w.xmax, w.ymin, w.ymax))
+                flags.append(w.superscript)
+                texts.append(w.text)
+    body = b"".join(
+        [
+            _document_counts.pack(len(nblocks), len(nwords), len(flags)),
+            nblocks.tobytes(),
+            nwords.tobytes(),
+            coords.tobytes(),
+            flags,
+            "\0".join(texts).encode("utf8"),
+        ]
+    )
+    header = _document_header.pack(DOCUMENT_MAGIC, DOCUMENT_VERSION)
+    return header + zlib.compress(body)
+
+
+def document_version(data):
+    """Return the version of a serialized Document, or None if invalid."""
+    if len(data) < _document_header.size:
+        return None
+    magic, version = _document_header.unpack_from(data)
+    return version if magic == DOCUMENT_MAGIC else None
+
+
+def load_document(data):
+    """Load a Document serialized with dump_document.
+
+    Returns None if the data was serialized with a different version.
+    """
+    if document_version(data) != DOCUMENT_VERSION:
+        return None
+    body = zlib.decompress(data[_document_header.size :])
+    nlines, nblocks_total, nwords_total = _document_counts.unpack_from(body)
+    pos = _document_counts.size
+
+    def take(typecode, n):
+        nonlocal pos
+        arr = array(typecode)
+        size = n * arr.itemsize
+        arr.frombytes(body[pos : pos + size])
+        pos += size
+        return arr
+
+    nblocks = take("I", nlines)
+    nwords = take("I", nblocks_total)
+    coords = take("d", 4 * nwords_total)
+    flags = body[pos : pos + nwords_total]
+    texts = body[pos + nwords_total :].decode("utf8").split("\0")
+
+    words = [
+        Word.construct(
+            text=texts[i],
+            ymin=coords[4 * i + 2],
+            ymax=coords[4 * i + 3],
+            xmin=coords[4 * i],
+            xmax=coords[4 * i + 1],
+            superscript=bool(flags[i]),
+        )
+        for i in range(nwords_total)
+    ]
+    blocks = []
+    start = 0
+    for n in nwords:
+        blocks.append(Block.construct(parts=words[start : start + n]))
+        start += n
+    lines = []
+    start = 0
+    for n in nblocks:
+        lines.append(Line.construct(parts=blocks[start : start + n]))
+        start += n
+    return Document.construct(parts=lines)
+
+
 ########################
 # Display the document #
 ########################
@@ -1,58 +1,118 @@
+import gzip
+import html
 import json
+import os
 import re
 import subprocess
+import tempfile
+import threading
 import unicodedata
+from contextlib import nullcontext
 from types import SimpleNamespace
 
 import requests
 import requests_cache
-from eventlet.timeout import Timeout
 from tqdm import tqdm
 
 from ...config import papconf
 from ...model import Institution, InstitutionCategory
-from ..acquire import readpage
+from ...profiling import profiled
+from ..acquire import Progress, concurrent_map, readpage
 from .pdfanal import (
+    DOCUMENT_VERSION,
     classify_superscripts,
+    document_version,
+    dump_document,
+    load_document,
     make_document_from_layout,
     normalize,
     undertext,
 )
 
+# Link types for which PDF.get_url may find a PDF
+PDF_LINK_TYPES = ("arxiv", "openreview", "doi", "pdf")
 
-def download(url, filename):
-    """Download the given url into the given filename."""
 
-    def iter_with_timeout(r, chunk_size, timeout):
-        it = r.iter_content(chunk_size=chunk_size)
-        try:
-            while True:
-                with Timeout(timeout):
-                    yield next(it)
-        except StopIteration:
-            pass
-        finally:
-            it.close()
+def download(url, filename, progress=True):
+    """Download the given url into the given filename.
 
+    The download is aborted if the server sends nothing for 5 seconds. If
+    progress is False, no progress bar is shown, which is preferable when
+    downloading multiple files concurrently.
+    """
     with requests_cache.disabled():
         print(f"Downloading {url}")
-        r = requests.get(url, stream=True)
+        r = requests.get(url, stream=True, timeout=(30, 5))
         total = int(r.headers.get("content-length") or "1024")
         with open(filename, "wb") as f:
-            with tqdm(total=total) as progress:
-                for chunk in iter_with_timeout(
-                    r, chunk_size=max(total // 100, 1), timeout=5
-                ):
+            with tqdm(total=total, disable=not progress) as bar:
+                for chunk in r.iter_content(chunk_size=max(total // 100, 1)):
                     f.write(chunk)
                     f.flush()
-                    progress.update(len(chunk))
+                    bar.update(len(chunk))
         print(f"Saved {filename}")
 
 
+def pdftotext(*args, slots=None):
+    """Run pdftotext with the given arguments.
+
+    If slots is a semaphore, it is held while pdftotext runs, which bounds
+    the number of pdftotext processes that run at the same time.
+    """
+    with slots or nullcontext():
+        with profiled("pdftotext") as event:
+            result = subprocess.run(["pdftotext", *args], capture_output=True)
+            event["bytes"] = len(result.stdout or b"")
+        return result
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+_layout_tags = re.compile(
+    r"<(/?)(page|block|line)\b[^>]*>|<word\b[^>]*>([^<]*)</word>"
+)
+
+
+def layout_to_text(layout):
+    """Derive the plain text of a PDF from the output of pdftotext -bbox-layout.
+
+    Words are separated by spaces, lines by newlines, blocks by empty lines
+    and pages by form feeds, like the plain output of pdftotext. Newlines
+    between words are then removed.
+    """
+    pages = []
+    blocks = lines = words = None
+    for m in _layout_tags.finditer(layout):
+        closing, tag, word = m.groups()
+        if word is not None:
+            words.append(html.unescape(word))
+        elif closing:
+            match tag:
+                case "line":
+                    lines.append(" ".join(words))
+                case "block":
+                    blocks.append("\n".join(lines))
+                case "page":
+                    pages.append("".join(f"{block}\n\n" for block in blocks))
+        else:
+            match tag:
+                case "line":
+                    words = []
+                case "block":
+                    lines = []
+                case "page":
+                    blocks = []
+    text = "\f".join(pages)
+    # Remove newlines between words
+    return re.sub(string=text, pattern=r"(\w) *\n *(\w)", repl=r"\1 \2")
+
+
 class PDF:
-    def __init__(self, link, cache_policy="use"):
+    def __init__(self, link, cache_policy="use", pages=None):
         self.link = link
         self.cache_policy = cache_policy
+        # Only the first pages are needed, unless the full text is requested
+        self.pages = pages or None
 
         lnk = link.link.replace("/", "__")
         if not lnk.endswith(".pdf"):
@@ -63,13 +123,21 @@ class PDF:
         if len(str(self.pdf_path)) > 255:
             # Weird stuff happens if this is true, so we just ignore it I guess?
             self.pdf_path = self.data_path = self.text_path = self.meta_path = (
-                None
-            )
+                self.head_path
+            ) = self.document_path = None
             self.meta = {"failure": "bad_path"}
         else:
             self.data_path = self.pdf_path.with_suffix(".data")
             self.text_path = self.pdf_path.with_suffix(".txt")
             self.meta_path = self.pdf_path.with_suffix(".json")
+            # Layout of the first pages only
+            self.head_path = self.pages and self.pdf_path.with_suffix(
+                f".p{self.pages}.data"
+            )
+            # Parsed layout document, see get_document
+            self.document_path = self.pdf_path.with_suffix(
+                f".p{self.pages}.doc" if self.pages else ".doc"
+            )
 
             if self.meta_path.exists():
                 self.meta = json.loads(self.meta_path.read_text())
@@ -108,7 +176,19 @@ class PDF:
             case _:
                 return None
 
-    def acquire_and_process(self):
+    def is_processed(self):
+        if not self.pdf_path:
+            return False
+        if self.pages and self.head_path.exists():
+            return True
+        return self.data_path.exists() and self.text_path.exists()
+
+    def acquire_and_process(self, progress=True, slots=None, full=False):
+        """Download the PDF if needed and extract its layout and text.
+
+        If self.pages is set and full is False, only the layout of the first
+        pages is extracted, into head_path.
+        """
         pdf = self.pdf_path
         if not pdf:
             return False
@@ -128,68 +208,113 @@ class PDF:
             if url is None:
                 return False
             try:
-                download(filename=pdf, url=url)
+                download(filename=pdf, url=url, progress=progress)
             except requests.exceptions.SSLError:
                 print(f"failed to download pdf file for {self}")
                 self.clear(failure="ssl-error")
                 return False
 
-        # With metadata
-        outcome = subprocess.run(
-            ["pdftotext", "-bbox-layout", str(pdf), str(self.data_path)],
-            capture_output=True,
+        head = self.pages and not full
+        page_range = ["-f", "1", "-l", str(self.pages)] if head else []
+
+        # A single pass of pdftotext gives us the layout, from which we also
+        # derive the plain text
+        outcome = pdftotext(
+            *page_range, "-bbox-layout", str(pdf), "-", slots=slots
         )
         if outcome.returncode != 0:
             print(f"pdftotext failed to process pdf file for {self}")
             self.clear(failure="invalid-pdf")
             return False
 
-        if not self.data_path.stat().st_size:
+        if not outcome.stdout:
             self.pdf_path.unlink()
-            self.data_path.unlink()
+            self.data_path.unlink(missing_ok=True)
             self.clear(failure="empty")
             return False
 
-        # Without
-        outcome = subprocess.run(
-            ["pdftotext", str(pdf), str(self.text_path)],
-            capture_output=True,
-        )
-        # Remove newlines between words
-        self.text_path.write_text(
-            re.sub(
-                string=self.text_path.read_text(),
-                pattern=r"(\w) *\n *(\w)",
-                repl=r"\1 \2",
-            )
-        )
+        if head:
+            self.head_path.write_bytes(gzip.compress(outcome.stdout))
+            return True
+
+        layout = outcome.stdout.decode("utf8", errors="replace")
+        self.data_path.write_bytes(gzip.compress(outcome.stdout))
+        self.text_path.write_text(layout_to_text(layout))
         return True
 
+    def read_data(self, path=None):
+        """Read the layout, which may or may not be compressed."""
+        data = (path or self.data_path).read_bytes()
+        if data[:2] == GZIP_MAGIC:
+            data = gzip.decompress(data)
+        return data.decode("utf8", errors="replace")
+
+    def _read_or_process(self, target, read, full):
+        if target.exists():
+            if self.cache_policy != "force":
+                return read()
+        elif self.cache_policy == "only":
+            return None
+
+        if self.acquire_and_process(full=full):
+            return read()
+        else:
+            return None
+
     def get_fulltext(self, fulldata=True):
         if not self.pdf_path:
             return None
 
         if fulldata:
-            target = self.data_path
+            return self._read_or_process(self.data_path, self.read_data, True)
         else:
             target = self.text_path
+            return self._read_or_process(target, target.read_text, True)
+
+    def get_head(self):
+        """Return the layout of the first self.pages pages of the PDF.
+
+        The full layout is returned if it is available or if self.pages is
+        not set.
+        """
+        if (
+            not self.pages
+            or not self.pdf_path
+            or (self.data_path.exists() and self.cache_policy != "force")
+        ):
+            return self.get_fulltext()
+
+        return self._read_or_process(
+            self.head_path, lambda: self.read_data(self.head_path), False
+        )
 
-        if target.exists():
-            if self.cache_policy != "force":
-                return target.read_text()
-        elif self.cache_policy == "only":
+    def read_document(self):
+        """Read the cached document, if it is up to date with the layout."""
+        if self.cache_policy == "force":
             return None
-
-        if self.acquire_and_process():
-            return target.read_text()
-        else:
+        try:
+            mtime = self.document_path.stat().st_mtime
+        except (AttributeError, FileNotFoundError):
             return None
+        for source in (self.data_path, self.head_path):
+            if source and source.exists() and source.stat().st_mtime > mtime:
+                return None
+        return load_document(self.document_path.read_bytes())
+
+    def write_document(self, doc):
+        fd, tmp = tempfile.mkstemp(dir=self.document_path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(dump_document(doc))
+        os.replace(tmp, self.document_path)
 
     def get_document(self):
-        fulltext = self.get_fulltext()
-        if not fulltext:
-            return None
-        doc = make_document_from_layout(fulltext)
+        doc = self.read_document()
+        if doc is None:
+            layout = self.get_head()
+            if not layout:
+                return None
+            doc = make_document_from_layout(layout, max_pages=self.pages)
+            self.write_document(doc)
         for line in doc.parts:
             if line.ymin < 1:
                 # First page
@@ -210,6 +335,9 @@ class PDF:
         self.write_meta(failure=failure)
         self.pdf_path.unlink(missing_ok=True)
         self.data_path.unlink(missing_ok=True)
+        if self.head_path:
+            self.head_path.unlink(missing_ok=True)
+        self.document_path.unlink(missing_ok=True)
 
     def write_meta(self, **data):
         self.meta.update(data)
@@ -219,6 +347,60 @@ class PDF:
         return f"{self.link.type}:{self.link.link}"
 
 
+def process_pdfs(pdfs, workers=8, processes=None):
+    """Download and process many PDFs concurrently.
+
+    The PDFs are downloaded by a pool of ``workers`` threads, and at most
+    ``processes`` pdftotext processes run at the same time (by default, one
+    per core). PDFs that were already processed are skipped. A progress
+    event is given after each PDF, and (pdf, success) pairs are yielded in
+    order of completion.
+    """
+    pdfs = [pdf for pdf in pdfs if not pdf.is_processed()]
+    slots = threading.BoundedSemaphore(processes or os.cpu_count() or 1)
+    progress = Progress(len(pdfs))
+
+    def process(pdf):
+        try:
+            success = pdf.acquire_and_process(progress=False, slots=slots)
+        except Exception as exc:
+            print(f"Failed to process {pdf}: {exc}")
+            success = False
+        return pdf, success
+
+    for pdf, success in concurrent_map(
+        process, pdfs, workers=workers, ordered=False
+    ):
+        # Progress is reported from this thread, because the events given
+        # in the worker threads do not reach the listeners
+        status = progress.step(pdf=str(pdf), success=success)
+        print(f"{status} Processed {pdf}")
+        yield pdf, success
+
+
+def cleanup_documents(root):
+    """Delete the cached documents under root that cannot be used anymore.
+
+    These are the documents cached by an older version of the layout
+    analysis, and those whose layout file was deleted. Returns the number of
+    deleted files.
+    """
+    deleted = 0
+    for path in root.rglob("*.doc"):
+        sources = [path.with_suffix(".data")]
+        if m := re.fullmatch(r"(.*)\.p[0-9]+\.doc", path.name):
+            # Documents of the first pages may come from the full layout
+            sources.append(path.with_name(f"{m.group(1)}.data"))
+        with open(path, "rb") as f:
+            version = document_version(f.read(16))
+        if version != DOCUMENT_VERSION or not any(
+            src.exists() for src in sources
+        ):
+            path.unlink(missing_ok=True)
+            deleted += 1
+    return deleted
+
+
 def recognize_known_institution(entry, institutions):
     normalized = unicodedata.normalize("NFKC", entry.strip().strip(","))
     if normalized and normalized in institutions:
@@ -226,20 +408,63 @@ def recognize_known_institution(entry, institutions):
     return None
 
 
-def recognize_unknown_institution(entry):
+class InstitutionMatcher:
+    """Match entries against a list of institution patterns.
+
+    The patterns are combined into a single regular expression, which finds
+    the first pattern that matches the start of an entry in one pass.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns or [])
+        try:
+            self.regexp = re.compile(
+                "|".join(
+                    f"(?P<p{i}>{defn.pattern})"
+                    for i, defn in enumerate(self.patterns)
+                ),
+                flags=re.IGNORECASE,
+            )
+        except re.error:
+            # Patterns that cannot be combined (e.g. because they use
+            # backreferences or global flags) are tried one by one
+            self.regexp = None
+
+    def match(self, entry):
+        """Return the first pattern that matches entry, or None."""
+        if self.regexp is None:
+            for defn in self.patterns:
+                if re.match(defn.pattern, entry, flags=re.IGNORECASE):
+                    return defn
+            return None
+        m = self.regexp.match(entry)
+        return m and self.patterns[int(m.lastgroup[1:])]
+
+
+_institution_matcher = [None, None]
+
+
+def institution_matcher():
+    """Return the matcher for papconf.institution_patterns.
+
+    The matcher is built once, and rebuilt only if the patterns change.
+    """
     patterns = papconf.institution_patterns
-    if not patterns or not entry or "@" in entry:
+    if _institution_matcher[0] is not patterns:
+        _institution_matcher[:] = [patterns, InstitutionMatcher(patterns)]
+    return _institution_matcher[1]
+
+
+def recognize_unknown_institution(entry):
+    if not papconf.institution_patterns or not entry or "@" in entry:
         return None
-    for defn in patterns:
-        pattern = defn.pattern
-        category = defn.category
-        m = re.match(pattern=pattern, string=entry, flags=re.IGNORECASE)
-        if m:
-            return Institution(
-                name=entry,
-                aliases=[],
-                category=getattr(InstitutionCategory, category),
-            )
+    defn = institution_matcher().match(entry)
+    if defn:
+        return Institution(
+            name=entry,
+            aliases=[],
+            category=getattr(InstitutionCategory, defn.category),
+        )
     else:
         return None
 
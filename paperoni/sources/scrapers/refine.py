@@ -6,12 +6,11 @@ import urllib
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
-from functools import reduce
+from functools import cache, reduce
 from operator import itemgetter
 from types import SimpleNamespace
 
 from coleo import Option, tooled
-from fake_useragent import UserAgent
 from ovld import ovld
 from sqlalchemy import select
 
@@ -23,6 +22,7 @@ from ...model import (
     Institution,
     InstitutionCategory,
     Link,
+    Meta,
     Paper,
     PaperAuthor,
     Release,
@@ -42,12 +42,24 @@ from ...utils import (
 )
 from ..acquire import readpage
 from .base import BaseScraper
-from .pdftools import PDF, find_fulltext_affiliations
+from .pdftools import (
+    PDF,
+    PDF_LINK_TYPES,
+    find_fulltext_affiliations,
+    process_pdfs,
+)
 
-ua = UserAgent()
 refiners = defaultdict(list)
 
 
+@cache
+def user_agent():
+    """Return the UserAgent generator, which loads its data on creation."""
+    from fake_useragent import UserAgent
+
+    return UserAgent()
+
+
 @dataclass
 class Refiner:
     type: str
@@ -618,7 +630,9 @@ def refine_doi_with_sciencedirect(db, paper, link):
         with covguard():
             return
 
-    soup = readpage(url2, format="html", headers={"User-Agent": ua.chrome})
+    soup = readpage(
+        url2, format="html", headers={"User-Agent": user_agent().chrome}
+    )
     data = json.loads(soup.select_one('script[type="application/json"]').text)
 
     authors_raw = _sd_find(data["authors"], "author", [])
@@ -772,7 +786,7 @@ _institutions = [None, None]
 
 
 def _pdf_refiner(db, paper, link):
-    doc = PDF(link).get_document()
+    doc = PDF(link, pages=papconf.affiliation_pages).get_document()
     if not doc:
         return None
 
@@ -949,8 +963,19 @@ class Refiner(BaseScraper):
 
         limit: Option & int = None
 
+        # Number of papers for which to download PDFs ahead of time
+        batch_size: Option & int = 32
+
+        # Number of PDFs to download concurrently
+        workers: Option & int = 8
+
+        # Maximal number of pdftotext processes (default: number of cores)
+        processes: Option & int = None
+
         now = datetime.now()
 
+        yield Meta(scraper="refine", date=now)
+
         # Select all papers and order them from most recent
         pq = select(sch.Paper).distinct(sch.Paper.paper_id)
         pq = pq.join(sch.Paper.release).join(sch.Release.venue)
@@ -958,32 +983,52 @@ class Refiner(BaseScraper):
 
         papers = self.db.session.execute(pq)
 
-        i = 0
-        for (paper,) in papers:
-            if limit and (i == limit):
-                break
-
-            links = [l for l in paper.links if not been_processed(l)]
-
-            if not links:
-                continue
-
-            print(i, paper.title)
-
-            for _, result in self.refine(paper, merge=True, links=links):
-                yield result
-
-            for l in links:
-                tag = f"{l.type}:{l.link}"
-                processed_cache.add(tag)
-                yield ScraperData(
-                    scraper="refine",
-                    tag=tag,
-                    data="",
-                    date=now,
-                )
-
-            i += 1
+        def batches():
+            batch = []
+            i = 0
+            for (paper,) in papers:
+                if limit and (i == limit):
+                    break
+                links = [l for l in paper.links if not been_processed(l)]
+                if not links:
+                    continue
+                batch.append((i, paper, links))
+                i += 1
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        for batch in batches():
+            # Download and process the PDFs of the whole batch in parallel,
+            # so that the PDF refiners find them in the cache
+            pdfs = {}
+            for _, _, links in batch:
+                for l in links:
+                    if l.type in PDF_LINK_TYPES:
+                        pdf = PDF(l, pages=papconf.affiliation_pages)
+                        pdfs.setdefault(pdf.pdf_path, pdf)
+            for _ in process_pdfs(
+                pdfs.values(), workers=workers, processes=processes
+            ):
+                pass
+
+            for i, paper, links in batch:
+                print(i, paper.title)
+
+                for _, result in self.refine(paper, merge=True, links=links):
+                    yield result
+
+                for l in links:
+                    tag = f"{l.type}:{l.link}"
+                    processed_cache.add(tag)
+                    yield ScraperData(
+                        scraper="refine",
+                        tag=tag,
+                        data="",
+                        date=now,
+                    )
 
         yield from []
 
@@ -1,9 +1,12 @@
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import partial
 
+import backoff
 from coleo import Option, tooled
-from requests import HTTPError
+from requests import HTTPError, RequestException
 
 from ...config import papconf
 from ...model import (
@@ -19,7 +22,7 @@ from ...model import (
     VenueType,
 )
 from ...utils import QueryError, best_name, quality_int
-from ..acquire import HTTPSAcquirer
+from ..acquire import HTTPSAcquirer, Progress, concurrent_map
 from ..helpers import (
     filter_papers,
     filter_researchers_interface,
@@ -28,6 +31,16 @@ from ..helpers import (
 )
 from .base import BaseScraper
 
+# Maximal time in seconds to retry a batch after a rate limit or server error
+BATCH_RETRY_TIME = 300
+
+
+def _transient(exc):
+    # Errors that say nothing about the ids in the batch
+    resp = exc.response
+    return resp is None or resp.status_code == 429 or resp.status_code >= 500
+
+
 external_ids_mapping = {
     "pubmedcentral": "pmc",
 }
@@ -196,28 +209,96 @@ class SemanticScholarQueryManager:
             raise QueryError(jdata["error"] if jdata else "Received bad JSON")
         return jdata
 
+    def _batch(self, path: str, ids: list[str], fields: tuple[str], block_size):
+        """Fetch entries by ID through a batch endpoint.
+
+        Yields ``(id, data)`` pairs, where data is None if the entry could not
+        be found. If a request is rejected, the chunk is split in two and each
+        half is retried separately, so that a single bad ID does not prevent
+        the others from being fetched. Rate limits and server errors are
+        retried for the whole chunk instead, and raised if they persist.
+        """
+        ids = list(ids)
+        for i in range(0, len(ids), block_size):
+            yield from self._batch_chunk(path, ids[i : i + block_size], fields)
+
+    @backoff.on_exception(
+        backoff.expo,
+        HTTPError,
+        giveup=lambda exc: not _transient(exc),
+        max_time=lambda: BATCH_RETRY_TIME,
+    )
+    def _post_batch(self, path, ids, fields):
+        return self.conn.post(
+            f"/graph/v1/{path}",
+            params={"fields": ",".join(fields)},
+            json={"ids": ids},
+            headers={"x-api-key": papconf.get_token("semantic_scholar")},
+        )
+
+    def _batch_chunk(self, path, ids, fields):
+        try:
+            jdata = self._post_batch(path, ids, fields)
+            if not isinstance(jdata, list) or len(jdata) != len(ids):
+                raise QueryError(
+                    jdata.get("error", jdata.get("message", "Unknown error"))
+                    if isinstance(jdata, dict)
+                    else "Received bad JSON"
+                )
+        except (HTTPError, QueryError) as exc:
+            if isinstance(exc, HTTPError) and _transient(exc):
+                raise
+            if len(ids) == 1:
+                print(f"Could not fetch {ids[0]}:", exc)
+                yield ids[0], None
+            else:
+                mid = len(ids) // 2
+                yield from self._batch_chunk(path, ids[:mid], fields)
+                yield from self._batch_chunk(path, ids[mid:], fields)
+            return
+        yield from zip(ids, jdata)
+
     def _list(
         self,
         path: str,
         fields: tuple[str],
         block_size: int = 100,
         limit: int = 10000,
+        mark: dict = None,
         **params,
     ):
+        """List the entries at path, page by page.
+
+        If mark is given, the listing starts at ``mark["offset"]``, which is
+        moved past each page once all of its entries have been yielded.
+        """
         params = {
             "fields": ",".join(fields),
             "limit": min(block_size or 10000, limit),
             **params,
         }
-        next_offset = 0
-        while next_offset is not None and next_offset < limit:
-            results = self._evaluate(path, offset=next_offset, **params)
-            next_offset = results.get("next", None)
-            if "data" not in results:
-                print("Could not get data:", results["message"])
-                return
-            for entry in results["data"]:
-                yield entry
+
+        def fetch(offset):
+            return self._evaluate(path, offset=offset, **params)
+
+        # The next page is requested as soon as we know its offset, so that it
+        # downloads while the current page is being processed
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(fetch, mark["offset"] if mark else 0)
+            while future is not None:
+                results = future.result()
+                next_offset = results.get("next", None)
+                if next_offset is not None and next_offset < limit:
+                    future = executor.submit(fetch, next_offset)
+                else:
+                    future = None
+                if "data" not in results:
+                    print("Could not get data:", results["message"])
+                    return
+                for entry in results["data"]:
+                    yield entry
+                if mark is not None and next_offset is not None:
+                    mark["offset"] = next_offset
 
     def _wrap_paper_author(self, data):
         return PaperAuthor(
@@ -322,6 +403,21 @@ class SemanticScholarQueryManager:
             self._evaluate(f"paper/{paper_id}", fields=",".join(fields))
         )
 
+    def papers(self, paper_ids, fields=PAPER_FIELDS, block_size=500):
+        """Fetch many papers, up to block_size per request.
+
+        Yields ``(paper_id, paper)`` pairs, in the same order as paper_ids.
+        The paper is None if it could not be found or processed.
+        """
+        for pid, data in self._batch(
+            "paper/batch", paper_ids, fields, block_size
+        ):
+            try:
+                yield pid, data and self._wrap_paper(data)
+            except KeyError as exc:
+                print("KeyError", exc)
+                yield pid, None
+
     def paper_authors(
         self, paper_id, fields=PAPER_AUTHORS_FIELDS, **params
     ):  # pragma: no cover
@@ -360,6 +456,22 @@ class SemanticScholarQueryManager:
                 )
             )
 
+    def authors(self, author_ids, fields=AUTHOR_FIELDS, block_size=500):
+        """Fetch many authors, up to block_size per request.
+
+        Yields ``(author_id, author)`` pairs, in the same order as author_ids.
+        The author is None if it could not be found or processed.
+        """
+        wrap_author = partial(self._wrap_author, quality=(0.5,))
+        for aid, data in self._batch(
+            "author/batch", author_ids, fields, block_size
+        ):
+            try:
+                yield aid, data and wrap_author(data)
+            except KeyError as exc:
+                print("KeyError", exc)
+                yield aid, None
+
     def author_with_papers(self, name, fields=AUTHOR_FIELDS, **params):
         name = name.replace("-", " ")
         authors = self._list(
@@ -419,21 +531,58 @@ class SemanticScholarScraper(BaseScraper):
             list(queries), getname=lambda row: row[0]
         )
 
+        # Number of authors to query in parallel
+        workers: Option & int = 4
+
+        jobs = [
+            (name, ssid, start, end, self.saved_cursor(f"author:{ssid}"))
+            for name, ids, start, end in queries
+            for ssid in ids
+            if not self.is_done(f"author:{ssid}")
+        ]
+        progress = Progress(len(jobs))
+
         ss = SemanticScholarQueryManager()
 
+        def fetch(job):
+            name, ssid, start, end, cursor = job
+            t0 = time.time()
+            mark = {"offset": cursor or 0}
+            papers = []
+            error = None
+            try:
+                for paper in filter_papers(
+                    papers=ss.author_papers(ssid, block_size=1000, mark=mark),
+                    start=start,
+                    end=end,
+                ):
+                    papers.append(paper)
+            except (RequestException, QueryError) as exc:
+                error = exc
+            return job, papers, mark["offset"], error, time.time() - t0
+
         yield Meta(
             scraper="ssch",
             date=datetime.now(),
         )
 
-        for name, ids, start, end in queries:
-            for ssid in ids:
-                print(f"Fetch papers for {name} (ID={ssid})")
-                yield from filter_papers(
-                    papers=ss.author_papers(ssid, block_size=1000),
-                    start=start,
-                    end=end,
-                )
+        for (name, ssid, _, _, _), papers, offset, error, t in concurrent_map(
+            fetch, jobs, workers=workers, ordered=False
+        ):
+            # Progress is reported here rather than in fetch, because the
+            # events given in the worker threads do not reach the listeners
+            status = progress.step(
+                author=name, id=ssid, npapers=len(papers), time=t
+            )
+            print(
+                f"{status} Fetched {len(papers)} papers for {name} (ID={ssid}) in {t:.1f}s"
+            )
+            yield from papers
+            if error is not None:
+                # Save how far we got, so that --resume continues from there
+                yield self.checkpoint(f"author:{ssid}", cursor=offset)
+                raise error
+            yield self.checkpoint(f"author:{ssid}")
 
     @tooled
     def prepare(self, controller=prompt_controller):
@@ -476,23 +625,15 @@ class SemanticScholarAuthorScraper(BaseScraper):
             LIMIT {limit}
         """
         with self.db:
-            results = self.db.session.execute(query)
-            ss = SemanticScholarQueryManager()
-            for _, ssid in results:
-                print(f"Getting more information about author ID: {ssid}")
-                try:
-                    yield from ss.author(
-                        author_id=ssid, fields=_author_fields()
-                    )
-                except HTTPError as exc:
-                    if exc.response.status_code == 404:
-                        print("Author not found, resuming")
-                    else:
-                        raise
-                except QueryError as exc:
-                    print("QueryError", exc)
-                except KeyError as exc:
-                    print("KeyError", exc)
+            ssids = [ssid for _, ssid in self.db.session.execute(query)]
+
+        print(f"Getting more information about {len(ssids)} authors")
+        ss = SemanticScholarQueryManager()
+        for ssid, author in ss.authors(ssids, fields=_author_fields()):
+            if author is None:
+                print(f"Author not found: {ssid}")
+            else:
+                yield author
 
     @tooled
     def prepare(self):
@@ -0,0 +1,305 @@
+"""Persistent store for HTTP responses, used as a requests_cache backend.
+
+Response bodies are compressed and saved on disk under the hash of their
+contents, so that identical bodies are only stored once. A small SQLite index
+maps each cache key to the body's hash and to the rest of the response (status,
+headers, expiry date, etc.), serialized as JSON.
+
+The index is opened in WAL mode with one connection per thread, and bodies are
+written atomically, so the store can be shared by concurrent threads and
+processes.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from datetime import timedelta
+from hashlib import sha256
+from pathlib import Path
+from urllib.parse import urlparse
+
+from requests_cache import DO_NOT_CACHE, NEVER_EXPIRE
+from requests_cache.backends import BaseCache, BaseStorage
+from requests_cache.serializers.preconf import json_preconf_stage
+
+# Bodies that are not referenced by the index are only deleted once they
+# are older than this, so that cleanup never races with a concurrent write
+ORPHAN_GRACE_PERIOD = 3600
+
+_schema = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    host TEXT,
+    created REAL NOT NULL,
+    expires REAL,
+    size INTEGER NOT NULL,
+    meta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_digest ON responses (digest);
+CREATE TABLE IF NOT EXISTS redirects (
+    key TEXT PRIMARY KEY,
+    target TEXT NOT NULL
+);
+"""
+
+
+def expiry_policies(policies):
+    """Convert a {url pattern: days} mapping into requests_cache's format.
+
+    A negative number of days means that the responses never expire, and zero
+    means that they are not cached at all.
+    """
+    results = {}
+    for pattern, days in (policies or {}).items():
+        if days is None or days < 0:
+            results[pattern] = NEVER_EXPIRE
+        elif days == 0:
+            results[pattern] = DO_NOT_CACHE
+        else:
+            results[pattern] = timedelta(days=days)
+    return results
+
+
+class StoreIndex:
+    """SQLite index of the store, with one connection per thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_schema)
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60)
+            self.local.conn = conn
+        return conn
+
+    def execute(self, query, params=()):
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def executemany(self, query, params):
+        with self.connection() as conn:
+            conn.executemany(query, params)
+
+
+class StoredResponses(BaseStorage):
+    """Mapping from cache keys to responses, backed by a ResponseStore."""
+
+    def __init__(self, store, **kwargs):
+        super().__init__(serializer=json_preconf_stage, **kwargs)
+        self.store = store
+        self.index = store.index
+
+    def __getitem__(self, key):
+        rows = self.index.execute(
+            "SELECT digest, meta FROM responses WHERE key = ?", (key,)
+        )
+        if not rows:
+            raise KeyError(key)
+        ((digest, meta),) = rows
+        body = self.store.read_body(digest)
+        if body is None:
+            raise KeyError(key)
+        response = self.serializer.loads(json.loads(meta))
+        response.history = [self.serializer.loads(r) for r in response.history]
+        response._content = body
+        response.raw.reset(body)
+        return response
+
+    def __setitem__(self, key, response):
+        body = response._content or b""
+        digest = self.store.write_body(body)
+        meta = self.serializer.dumps(response)
+        meta.pop("_content", None)
+        if response.history:
+            # cattrs does not (un)structure the redirect history by itself
+            meta["history"] = [
+                self.serializer.dumps(r) for r in response.history
+            ]
+        expires = response.expires and response.expires.timestamp()
+        self.index.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                digest,
+                urlparse(response.url or "").hostname,
+                time.time(),
+                expires,
+                len(body),
+                json.dumps(meta),
+            ),
+        )
+
+    def __delitem__(self, key):
+        if not self.index.execute(
+            "SELECT key FROM responses WHERE key = ?", (key,)
+        ):
+            raise KeyError(key)
+        self.index.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def bulk_delete(self, keys):
+        self.index.executemany(
+            "DELETE FROM responses WHERE key = ?", [(k,) for k in keys]
+        )
+
+    def __iter__(self):
+        for (key,) in self.index.execute("SELECT key FROM responses"):
+            yield key
+
+    def __len__(self):
+        ((n,),) = self.index.execute("SELECT COUNT(*) FROM responses")
+        return n
+
+    def clear(self):
+        self.index.execute("DELETE FROM responses")
+
+
+class StoredRedirects(BaseStorage):
+    """Mapping from redirect keys to the cache key of the final response."""
+
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self.index = store.index
+
+    def __getitem__(self, key):
+        rows = self.index.execute(
+            "SELECT target FROM redirects WHERE key = ?", (key,)
+        )
+        if not rows:
+            raise KeyError(key)
+        return rows[0][0]
+
+    def __setitem__(self, key, target):
+        self.index.execute(
+            "INSERT OR REPLACE INTO redirects VALUES (?, ?)", (key, target)
+        )
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.index.execute("DELETE FROM redirects WHERE key = ?", (key,))
+
+    def bulk_delete(self, keys):
+        self.index.executemany(
+            "DELETE FROM redirects WHERE key = ?", [(k,) for k in keys]
+        )
+
+    def __iter__(self):
+        for (key,) in self.index.execute("SELECT key FROM redirects"):
+            yield key
+
+    def __len__(self):
+        ((n,),) = self.index.execute("SELECT COUNT(*) FROM redirects")
+        return n
+
+    def clear(self):
+        self.index.execute("DELETE FROM redirects")
+
+
+class ResponseStore(BaseCache):
+    """requests_cache backend that stores responses under ``root``."""
+
+    def __init__(self, root, **kwargs):
+        super().__init__(**kwargs)
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index = StoreIndex(self.root / "index.sqlite")
+        self.responses = StoredResponses(self)
+        self.redirects = StoredRedirects(self)
+
+    def body_path(self, digest):
+        return self.objects / digest[:2] / digest[2:]
+
+    def read_body(self, digest):
+        try:
+            return zlib.decompress(self.body_path(digest).read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def write_body(self, body):
+        digest = sha256(body).hexdigest()
+        path = self.body_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            # Write to a temporary file first, so that readers never see a
+            # partially written body
+            fd, tmp = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(body))
+            os.replace(tmp, path)
+        return digest
+
+    def stats(self):
+        """Return the number of responses and their total size, per host."""
+        return self.index.execute(
+            """
+            SELECT host, COUNT(*), SUM(size) FROM responses
+            GROUP BY host ORDER BY SUM(size) DESC
+            """
+        )
+
+    def cleanup(self, older_than=None, max_size=None, hosts=None):
+        """Evict responses from the store and delete unreferenced bodies.
+
+        Arguments:
+            older_than: Evict responses created more than this many days ago.
+            max_size: Evict the oldest responses until the total size of the
+                bodies, in bytes, is below this number.
+            hosts: Evict all responses from these hosts.
+
+        Expired responses are always evicted. Returns a dict with the number
+        of evicted responses and of deleted bodies.
+        """
+        now = time.time()
+        evicted = 0
+
+        def evict(query, params=()):
+            nonlocal evicted
+            keys = [k for (k,) in self.index.execute(query, params)]
+            self.responses.bulk_delete(keys)
+            evicted += len(keys)
+
+        evict("SELECT key FROM responses WHERE expires < ?", (now,))
+        if older_than is not None:
+            cutoff = now - older_than * 86400
+            evict("SELECT key FROM responses WHERE created < ?", (cutoff,))
+        for host in hosts or []:
+            evict("SELECT key FROM responses WHERE host = ?", (host,))
+        if max_size is not None:
+            total = 0
+            keys = []
+            for key, size in self.index.execute(
+                "SELECT key, size FROM responses ORDER BY created DESC"
+            ):
+                total += size
+                if total > max_size:
+                    keys.append(key)
+            self.responses.bulk_delete(keys)
+            evicted += len(keys)
+
+        self._prune_redirects()
+
+        referenced = {
+            d for (d,) in self.index.execute("SELECT digest FROM responses")
+        }
+        deleted = 0
+        for path in self.objects.glob("*/*"):
+            digest = path.parent.name + path.name
+            if digest not in referenced and (
+                now - path.stat().st_mtime > ORPHAN_GRACE_PERIOD
+            ):
+                path.unlink(missing_ok=True)
+                deleted += 1
+
+        self.index.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"evicted": evicted, "deleted": deleted}
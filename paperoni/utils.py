@@ -1,4 +1,5 @@
 import functools
+import heapq
 import inspect
 import itertools
 import re
@@ -34,14 +35,62 @@ class MutuallyExclusiveError(RuntimeError):
         return param if isinstance(param, str) else f"({', '.join(param)})"
 
 
+# Maximal number of distinct strings for which normalized forms are kept
+NORMALIZATION_CACHE_SIZE = 2**16
+
+
+class NormalizedName:
+    """Normalized forms of a name (or of any text), computed on demand."""
+
+    def __init__(self, name):
+        self.name = name
+
+    @functools.cached_property
+    def ascii(self):
+        norm = unicodedata.normalize("NFD", self.name)
+        stripped = norm.encode("ASCII", "ignore")
+        return stripped.decode("utf8")
+
+    @functools.cached_property
+    def squashed(self):
+        return re.sub(pattern=r"[^a-z0-9]+", string=self.ascii.lower(), repl="")
+
+    @functools.cached_property
+    def plain(self):
+        name = unidecode(self.name).lower()
+        name = re.sub(string=name, pattern="[()-]", repl=" ")
+        name = re.sub(string=name, pattern="['.]", repl="")
+        return name
+
+    @functools.cached_property
+    def words(self):
+        return frozenset(self.plain.split())
+
+    @functools.cached_property
+    def initials(self):
+        return frozenset(word[0] for word in self.words)
+
+    @functools.cached_property
+    def bag(self):
+        return self.words | self.initials
+
+
+@functools.lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def normalized(name: str) -> NormalizedName:
+    """Return the normalized forms of a name.
+
+    The same NormalizedName is returned for the same string, as long as it
+    remains in the cache, so that each form is only computed once.
+    """
+    return NormalizedName(name)
+
+
 def asciiify(s: str) -> str:
     """Translate a string to pure ASCII, removing accents and the like.
 
     Non-ASCII characters that are not accented characters are removed.
     """
-    norm = unicodedata.normalize("NFD", s)
-    stripped = norm.encode("ASCII", "ignore")
-    return stripped.decode("utf8")
+    return normalized(s).ascii
 
 
 def squash_text(txt: str) -> str:
@@ -51,8 +100,7 @@ def squash_text(txt: str) -> str:
     * Uppercase is converted to lowercase
     * All spaces and special characters are removed, only letters and numbers remain
     """
-    txt = asciiify(txt).lower()
-    return re.sub(pattern=r"[^a-z0-9]+", string=txt, repl="")
+    return normalized(txt).squashed
 
 
 url_extractors = {
@@ -101,29 +149,78 @@ def canonicalize_links(links: dict[str, str]) -> dict[str, str]:
     return [{"type": typ, "link": lnk} for typ, lnk in links]
 
 
-def similarity(s1, s2):
+def similarity(s1, s2, cutoff=None):
+    """Return the similarity ratio of two names, between 0 and 1.
+
+    If cutoff is given and the similarity is certainly lower than the cutoff,
+    a cheaper upper bound (also lower than the cutoff) is returned instead.
+    """
     s1 = plainify(s1)
     s2 = plainify(s2)
-    return SequenceMatcher(a=s1, b=s2).ratio()
+    matcher = SequenceMatcher(a=s1, b=s2)
+    if cutoff is not None:
+        if (bound := matcher.real_quick_ratio()) < cutoff:
+            return bound
+        if (bound := matcher.quick_ratio()) < cutoff:
+            return bound
+    return matcher.ratio()
+
+
+# Precision of the similarities in the queue used by associate(). At equal
+# values, bounds are refined before exact similarities are processed.
+_LENGTH_BOUND = 0
+_CHARACTER_BOUND = 1
+_EXACT = 2
 
 
 def associate(names1, names2):
+    """Pair up the names of names1 and names2 that are similar enough.
+
+    The pairs are processed from the most to the least similar. Instead of
+    computing all similarities upfront, each pair is first ranked using a
+    cheap upper bound on its similarity, which is only refined when the pair
+    reaches the front of the queue (and skipped if either name was already
+    paired up). The results are the same as processing the sorted matrix of
+    all similarities.
+    """
     if names1 == names2:
         return [(i, i) for i in range(len(names1))]
 
-    matrix = [
-        (similarity(n1, n2), i, j)
-        for i, n1 in enumerate(names1)
-        for j, n2 in enumerate(names2)
-    ]
+    plain1 = [plainify(n) for n in names1]
+    plain2 = [plainify(n) for n in names2]
+    matchers = [SequenceMatcher(b=p2) for p2 in plain2]
+    queue = []
+    for i, p1 in enumerate(plain1):
+        for j, p2 in enumerate(plain2):
+            if p1 == p2:
+                queue.append((-1.0, _EXACT, -i, -j))
+            else:
+                n1, n2 = len(p1), len(p2)
+                bound = 2.0 * min(n1, n2) / (n1 + n2)
+                queue.append((-bound, _LENGTH_BOUND, -i, -j))
+    heapq.heapify(queue)
+
+    bags1 = [name_bag(n) for n in names1]
+    bags2 = [name_bag(n) for n in names2]
     results = []
     to_process1 = set(range(len(names1)))
     to_process2 = set(range(len(names2)))
-    matrix.sort(reverse=True)
-    for sim, i, j in matrix:
+    while queue:
+        sim, precision, i, j = heapq.heappop(queue)
+        sim, i, j = -sim, -i, -j
         if i not in to_process1 or j not in to_process2:
             continue
-        elif sim >= 0.7 or (sim >= 0.4 and consistent([names1[i], names2[j]])):
+        elif precision != _EXACT and sim >= 0.4:
+            # Pairs below 0.4 are never associated, so bounds below that
+            # do not need to be refined
+            matcher = matchers[j]
+            matcher.set_seq1(plain1[i])
+            if precision == _LENGTH_BOUND:
+                refined = (-matcher.quick_ratio(), _CHARACTER_BOUND, -i, -j)
+            else:
+                refined = (-matcher.ratio(), _EXACT, -i, -j)
+            heapq.heappush(queue, refined)
+        elif sim >= 0.7 or (sim >= 0.4 and consistent_bags(bags1[i], bags2[j])):
             to_process1.discard(i)
             to_process2.discard(j)
             results.append((i, j))
@@ -283,6 +380,12 @@ class EquivalenceGroups:
             results[v].add(k)
         return results
 
+    def merges(self):
+        """Yield the merge for each group, without printing anything."""
+        for main, ids in self.groups().items():
+            assert len(ids) > 1
+            yield self.classes[main](ids=ids)
+
     def __iter__(self):
         for main, ids in self.groups().items():
             assert len(ids) > 1
@@ -430,24 +533,22 @@ def quality_int(quality_tuple):
 
 
 def plainify(name):
-    name = unidecode(name).lower()
-    name = re.sub(string=name, pattern="[()-]", repl=" ")
-    name = re.sub(string=name, pattern="['.]", repl="")
-    return name
+    return normalized(name).plain
 
 
-def consistent_pair(name1, name2):
-    def bag(name):
-        name = plainify(name)
-        bag = set(name.split())
-        return bag | {word[0] for word in bag}
+def name_bag(name):
+    """Return the set of words of a name, along with their initials."""
+    return normalized(name).bag
+
 
-    b1 = bag(name1)
-    b2 = bag(name2)
+def consistent_bags(b1, b2):
     b1x = b1 - b2
     b2x = b2 - b1
-    consistent = not (b1x and b2x)
-    return consistent
+    return not (b1x and b2x)
+
+
+def consistent_pair(name1, name2):
+    return consistent_bags(name_bag(name1), name_bag(name2))
 
 
 def consistent(aliases):
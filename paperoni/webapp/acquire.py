@@ -8,7 +8,6 @@ from ..config import papconf
 from ..model import Flag
 from ..sources.scrapers.openreview import OpenReviewScraperBase
 from ..sources.scrapers.semantic_scholar import SemanticScholarQueryManager
-from ..utils import QueryError
 from .common import mila_template
 
 here = Path(__file__).parent
@@ -38,6 +37,7 @@ async def app(page, box):
 
         async for event in q:
             box[results].clear()
+            refs = []
             for paper in event["refs"].split("\n"):
                 if "semanticscholar" in paper:
                     typ = "semantic_scholar"
@@ -51,33 +51,38 @@ async def app(page, box):
                 ref = ref and ref.split("?id=")[-1]
                 if ref:
                     box[results].print(H.div(f"Trying to acquire: {typ}:{ref}"))
-                    if typ == "semantic_scholar":
-                        try:
-                            paper = ss.paper(paper_id=ref)
-                        except QueryError:
-                            paper = None
-                    elif typ == "openreview":
-                        paper = None
+                    refs.append((typ, ref))
+
+            # Fetch all Semantic Scholar papers in as few requests as possible
+            ss_papers = dict(
+                ss.papers(
+                    [ref for typ, ref in refs if typ == "semantic_scholar"]
+                )
+            )
+
+            for typ, ref in refs:
+                if typ == "semantic_scholar":
+                    paper = ss_papers.get(ref, None)
+                elif typ == "openreview":
+                    paper = None
+                    try:
+                        for paper in orv._query({"id": ref}, limit=1):
+                            break
+                    except OpenReviewException:
                         try:
-                            for paper in orv._query({"id": ref}, limit=1):
+                            for paper in orv2._query({"id": ref}, limit=1):
                                 break
                         except OpenReviewException:
-                            try:
-                                for paper in orv2._query({"id": ref}, limit=1):
-                                    break
-                            except OpenReviewException:
-                                pass
-                    if paper:
-                        if results["validate"]:
-                            paper.flags.append(
-                                Flag(flag_name="validation", flag=True)
-                            )
-                        db.acquire(paper)
-                        box[results].print(H.div(f"Acquired: {typ}:{ref}"))
-                    else:
-                        box[results].print(
-                            H.div(f"Could not acquire: {typ}:{ref}")
+                            pass
+                if paper:
+                    if results["validate"]:
+                        paper.flags.append(
+                            Flag(flag_name="validation", flag=True)
                         )
+                    db.acquire(paper)
+                    box[results].print(H.div(f"Acquired: {typ}:{ref}"))
+                else:
+                    box[results].print(H.div(f"Could not acquire: {typ}:{ref}"))
 
 
 ROUTES = app
@@ -0,0 +1,39 @@
+import asyncio
+
+from hrepr import H
+
+from ...profiling import Profile
+from ..common import mila_template
+
+# Collects the events of the server process from the moment it starts
+profile = Profile().start()
+
+
+def profile_table():
+    columns = ["stage", "count", "total (s)", "p50 (ms)", "p95 (ms)", "bytes"]
+    return H.table["sql-results"](
+        H.tr(H.th(column) for column in columns),
+        *(
+            H.tr(
+                H.td(stage),
+                H.td(s["count"]),
+                H.td(f"{s['total']:.3f}"),
+                H.td(f"{s['p50'] * 1000:.2f}"),
+                H.td(f"{s['p95'] * 1000:.2f}"),
+                H.td(s["bytes"]),
+            )
+            for stage, s in profile.summary().items()
+        ),
+    )
+
+
+@mila_template(help="/help#profile")
+async def app(page, box):
+    """Time spent in the main stages."""
+    box.print(area := H.div().autoid())
+    while True:
+        page[area].set(profile_table())
+        await asyncio.sleep(2)
+
+
+ROUTES = app
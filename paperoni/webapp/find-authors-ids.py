@@ -1,4 +1,5 @@
 from datetime import datetime
+from functools import cache
 from pathlib import Path
 
 from hrepr import H
@@ -15,7 +16,10 @@ from .render import paper_html
 
 here = Path(__file__).parent
 
-ss = SemanticScholarQueryManager()
+
+@cache
+def semantic_scholar():
+    return SemanticScholarQueryManager()
 
 
 async def prepare(
@@ -194,9 +198,9 @@ async def app(page, box):
         )
         the_author = list(db.session.execute(author_query))[0][0]
         tabIDS = []
-        current_query_name = ss.author_with_papers
+        current_query_name = semantic_scholar().author_with_papers
         if scraper == "semantic_scholar":
-            current_query_name = ss.author_with_papers
+            current_query_name = semantic_scholar().author_with_papers
         elif scraper == "openreview":
             or_scraper = OpenReviewPaperScraper(papconf, db)
             all_venues = or_scraper._venues_from_wildcard("*")
@@ -1,7 +1,9 @@
 from pytest import fixture
 
+from paperoni.model import ScraperData
 from paperoni.sources.helpers import filter_researchers
-from paperoni.sources.scrapers.base import BaseScraper
+from paperoni.sources.scrapers import base
+from paperoni.sources.scrapers.base import BaseScraper, ProceedingsScraper
 
 
 @fixture
@@ -30,3 +32,89 @@ def test_author_queries(scraper_p):
 
     auqx = filter_researchers(auq, after="a", before="z")
     assert {a.name for a in auqx} == {"Doina Precup", "Yoshua Bengio"}
+
+
+def test_name_filter(config_profs):
+    scraper = ProceedingsScraper(config_profs, config_profs.database)
+    accept = scraper.name_filter({"yoshua bengio", "doina precup"})
+    assert accept("aaron courville, yoshua bengio")
+    assert accept("doina precup")
+    assert not accept("yoshua, bengio")
+    assert scraper.name_filter(None)("anyone")
+
+
+def test_fetch_papers(config_profs):
+    scraper = ProceedingsScraper(config_profs, config_profs.database)
+    jobs = [(i, i % 3) for i in range(20)]
+    papers = scraper.fetch_papers(lambda i, r: r and i, jobs, workers=4)
+    assert list(papers) == [i for i, r in jobs if r]
+
+
+def test_read_index_without_cache(config_profs, monkeypatch):
+    downloads = []
+
+    def readpage(url, **kwargs):
+        downloads.append(url)
+        return '{"papers": [1, 2]}'
+
+    monkeypatch.setattr(base, "readpage", readpage)
+    scraper = ProceedingsScraper(config_profs, config_profs.database)
+    index = scraper.read_index("v1", "https://x/v1", "json", cache=False)
+    assert index == {"papers": [1, 2]}
+    assert downloads == ["https://x/v1"]
+    assert "v1" in scraper.volume_signatures
+
+
+def test_checkpoints(config_profs):
+    scraper = BaseScraper(config_profs, config_profs.database)
+    with scraper.db as db:
+        db.import_all(
+            [
+                scraper.checkpoint("author:1"),
+                scraper.checkpoint("author:2", cursor=100),
+            ],
+            history_file=False,
+        )
+
+        # Checkpoints are ignored unless we resume
+        assert not scraper.is_done("author:1")
+
+        scraper.resume = True
+        assert scraper.is_done("author:1")
+        assert scraper.saved_cursor("author:1") is None
+        assert not scraper.is_done("author:2")
+        assert scraper.saved_cursor("author:2") == 100
+        assert scraper.saved_checkpoint("author:3") is None
+
+        scraper.clear_checkpoints()
+        assert not scraper.is_done("author:1")
+
+
+class FakeProceedings(ProceedingsScraper):
+    scraper_name = "fake"
+
+    def list_volumes(self):
+        return ["ok", "failed", "unchanged"]
+
+    def list_names(self):
+        return []
+
+    def get_volume(self, volume, names, cache, workers):
+        if volume == "ok":
+            self.volume_signatures[volume] = "abc"
+        elif volume == "unchanged":
+            self.unchanged_volumes.add(volume)
+        return []
+
+
+def test_failed_volume_not_done(config_profs, monkeypatch):
+    monkeypatch.setattr(base.time, "sleep", lambda t: None)
+    scraper = FakeProceedings(config_profs, config_profs.database)
+    with scraper.db:
+        entries = list(scraper.acquire())
+    done = {
+        e.tag
+        for e in entries
+        if isinstance(e, ScraperData) and e.scraper == scraper.checkpoint_scope
+    }
+    assert done == {"volume:ok", "volume:unchanged"}
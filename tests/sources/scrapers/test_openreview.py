@@ -1,11 +1,16 @@
+import json
+
 import coleo
+import openreview
 import pytest
+import requests
 from giving import given
 from pytest import fixture
 
-from paperoni.model import Paper
+from paperoni.model import Paper, ScraperData
 from paperoni.sources.scrapers.openreview import (
     OpenReviewPaperScraper,
+    OpenReviewPaperScraperV1,
     OpenReviewProfileScraper,
     OpenReviewVenueScraper,
 )
@@ -18,6 +23,11 @@ def scraper(config_empty):
     return OpenReviewPaperScraper(config_empty, config_empty.database)
 
 
+@fixture
+def scraper_v1(config_empty):
+    return OpenReviewPaperScraperV1(config_empty, config_empty.database)
+
+
 @fixture
 def vscraper(config_empty):
     return OpenReviewVenueScraper(config_empty, config_empty.database)
@@ -174,3 +184,276 @@ def test_acquire_venues(vscraper, data_regression):
     data_regression.check([x.tagged_dict() for x in confs])
     with vscraper.db as db:
         db.import_all(confs, history_file=False)
+
+
+class FakeNote(openreview.Note):
+    def __init__(self, id, tmdate, replies=[], venueid="Conf/2023/Conference"):
+        super().__init__(
+            id=id,
+            invitation="Conf/2023/Conference/-/Blind_Submission",
+            readers=[],
+            writers=[],
+            signatures=[],
+            content={
+                "title": f"Paper {id}",
+                "authors": ["Alice Smith"],
+                "authorids": ["~Alice_Smith1"],
+                "venueid": venueid,
+                "venue": "Conf 2023",
+            },
+            tmdate=tmdate,
+            details={"replies": replies},
+        )
+
+
+class FakeClient:
+    def __init__(self, notes):
+        self.notes = notes
+        self.calls = []
+
+    def set_decision(self, note, decision, tmdate):
+        # The reply does not change the tmdate of the submission
+        note.details["replies"] = [
+            {
+                "invitation": "Conf/2023/Conference/Paper1/-/Decision",
+                "content": {"decision": decision},
+                "tmdate": tmdate,
+            }
+        ]
+
+    def get_notes(self, offset=0, limit=1000, sort=None, **params):
+        self.calls.append(offset)
+        notes = self.notes
+        if sort is not None:
+            assert sort == "tmdate:desc"
+            notes = sorted(notes, key=lambda n: -n.tmdate)
+        return notes[offset : offset + limit]
+
+
+def test_incremental_venue(scraper_v1):
+    scraper = scraper_v1
+    notes = [FakeNote(f"n{i}", tmdate=1000 + i) for i in range(5)]
+    scraper.client = FakeClient(notes)
+    with scraper.db:
+        results = list(
+            scraper._query_papers_from_venues(
+                params={"content": {}},
+                venues=["Conf/2023/Conference"],
+                track_tmdate=True,
+            )
+        )
+        papers = [r for r in results if isinstance(r, Paper)]
+        *_, mark, ckpt = results
+        assert len(papers) == 5
+        assert ckpt.tag == "venue:Conf/2023/Conference"
+        assert mark.tag == "Conf/2023/Conference"
+        assert mark.data == "1004"
+        scraper.db.import_all([mark], history_file=False)
+
+    notes.append(FakeNote("n5", tmdate=2000))
+    with scraper.db:
+        *results, mark, _ = scraper._query_papers_from_venues(
+            params={"content": {"venueid": "Conf/2023/Conference"}},
+            venues=["Conf/2023/Conference"],
+            track_tmdate=True,
+        )
+    assert [p.title for p in results if isinstance(p, Paper)] == ["Paper n5"]
+    assert mark.data == "2000"
+
+
+def test_paged_venue(scraper_v1, monkeypatch):
+    scraper = scraper_v1
+    monkeypatch.setattr(scraper, "PAGE_SIZE", 2)
+    waits = []
+    monkeypatch.setattr(scraper.limiter, "wait", lambda: waits.append(1))
+    notes = [FakeNote(f"n{i}", tmdate=1000 + i) for i in range(5)]
+    scraper.client = FakeClient(notes)
+    with scraper.db:
+        papers = list(
+            scraper._query_papers_from_venues(
+                params={"content": {}},
+                venues=["Conf/2023/Conference"],
+            )
+        )
+    assert len(papers) == 5
+    # The full crawl waits for the rate limiter before each page
+    assert scraper.client.calls == [0, 2, 4]
+    assert len(waits) == 3
+
+
+def test_resume_venue(scraper_v1, monkeypatch):
+    scraper = scraper_v1
+    monkeypatch.setattr(scraper, "PAGE_SIZE", 2)
+    notes = [FakeNote(f"n{i}", tmdate=1000 + i) for i in range(5)]
+    scraper.client = FakeClient(notes)
+    get_notes = scraper.client.get_notes
+
+    def failing_get_notes(offset=0, **params):
+        if offset == 2:
+            raise requests.exceptions.ConnectionError("Connection reset")
+        return get_notes(offset=offset, **params)
+
+    def crawl():
+        with scraper.db as db:
+            results = list(
+                scraper._query_papers_from_venues(
+                    params={"content": {}},
+                    venues=["Conf/2023/Conference"],
+                    track_tmdate=True,
+                )
+            )
+            db.import_all(
+                [r for r in results if isinstance(r, ScraperData)],
+                history_file=False,
+            )
+        return results
+
+    scraper.client.get_notes = failing_get_notes
+    *papers, ckpt = crawl()
+    assert [p.title for p in papers if isinstance(p, Paper)] == [
+        "Paper n0",
+        "Paper n1",
+    ]
+    assert json.loads(ckpt.data)["cursor"] == {
+        "offset": 2,
+        "since": None,
+        "tmdate": 1001,
+    }
+
+    # The venue is continued from the page that failed
+    scraper.client.get_notes = get_notes
+    scraper.client.calls.clear()
+    scraper.resume = True
+    results = crawl()
+    *_, mark, ckpt = results
+    assert [p.title for p in results if isinstance(p, Paper)] == [
+        "Paper n2",
+        "Paper n3",
+        "Paper n4",
+    ]
+    assert scraper.client.calls == [2, 4]
+    assert mark.data == "1004"
+    assert json.loads(ckpt.data)["done"]
+
+
+def test_incremental_reply(scraper_v1, monkeypatch):
+    venue = "Conf/2023/Conference"
+
+    def crawl():
+        with scraper.db as db:
+            results = list(
+                scraper._query_papers_from_venues(
+                    params={"content": {"venueid": venue}},
+                    venues=[venue],
+                    track_tmdate=True,
+                )
+            )
+            data = [r for r in results if isinstance(r, ScraperData)]
+            db.import_all(data, history_file=False)
+        saved.append(
+            [d.tag for d in data if d.scraper == scraper.decision_scraper]
+        )
+        return {
+            p.title: p.releases[0].status
+            for p in results
+            if isinstance(p, Paper)
+        }
+
+    scraper = scraper_v1
+    saved = []
+    notes = [FakeNote(f"n{i}", tmdate=1000 + i) for i in range(3)]
+    scraper.client = FakeClient(notes)
+    scraper.client.set_decision(notes[0], "Reject", tmdate=1100)
+    scraper.client.set_decision(notes[2], "Reject", tmdate=1100)
+    assert crawl()["Paper n1"] == "unknown"
+
+    # Only the decision changes, the submission keeps its tmdate, but the
+    # venue is crawled again since it was waiting for that decision
+    scraper.client.set_decision(notes[1], "Accept (oral)", tmdate=1200)
+    assert crawl() == {
+        "Paper n0": "rejected",
+        "Paper n1": "oral",
+        "Paper n2": "rejected",
+    }
+
+    # Every decision is known, so only the modified notes are fetched
+    notes[2].tmdate = 1300
+    assert crawl() == {"Paper n2": "rejected"}
+
+    # Nothing changed, and the decisions saved in the database are reused
+    decided = []
+    monkeypatch.setattr(
+        scraper, "figure_out_the_fking_decision", decided.append
+    )
+    assert crawl() == {}
+    assert decided == []
+
+    # The decisions are saved once per venue, and only when they changed
+    assert saved == [[venue], [venue], [venue], []]
+    with scraper.db:
+        assert scraper.load_decisions()[venue]["n1"][1] == "oral"
+
+
+def test_decision_cache(scraper_v1, monkeypatch):
+    scraper = scraper_v1
+    decided = []
+    original = scraper.figure_out_the_fking_decision
+
+    def figure_out(note):
+        decided.append(note.id)
+        return original(note)
+
+    monkeypatch.setattr(scraper, "figure_out_the_fking_decision", figure_out)
+
+    reply = {
+        "invitation": "Conf/2023/Conference/Paper1/-/Decision",
+        "content": {"decision": "Accept (poster)"},
+        "tmdate": 10,
+    }
+    note = FakeNote("n1", tmdate=5, replies=[reply])
+    assert scraper.decide(note) == "poster"
+    assert scraper.decide(note) == "poster"
+    assert decided == ["n1"]
+
+    note = FakeNote(
+        "n1",
+        tmdate=5,
+        replies=[{**reply, "content": {"decision": "Reject"}, "tmdate": 20}],
+    )
+    assert scraper.decide(note) == "rejected"
+    assert decided == ["n1", "n1"]
+
+
+class FakeVenueClient:
+    def __init__(self, venues):
+        self.venues = venues
+
+    def get_notes(self, offset=0, limit=1000, content={}, **params):
+        notes = self.venues[content["venueid"]]
+        if notes is None:
+            raise openreview.OpenReviewException("Forbidden")
+        return notes[offset : offset + limit]
+
+
+def test_parallel_venues(scraper_v1):
+    scraper = scraper_v1
+    scraper.client = FakeVenueClient(
+        {
+            f"Conf{i}/2023": [
+                FakeNote(f"n{i}-{j}", tmdate=1, venueid=f"Conf{i}/2023")
+                for j in range(3)
+            ]
+            for i in range(6)
+        }
+        | {"Broken/2023": None}
+    )
+    papers = list(
+        scraper._query_papers_from_venues(
+            params={"content": {}},
+            venues=["Broken/2023", *[f"Conf{i}/2023" for i in range(6)]],
+            workers=3,
+        )
+    )
+    assert sorted(p.title for p in papers) == sorted(
+        f"Paper n{i}-{j}" for i in range(6) for j in range(3)
+    )
@@ -0,0 +1,91 @@
+from paperoni.sources.scrapers.pdfanal import (
+    DOCUMENT_VERSION,
+    Block,
+    Line,
+    Word,
+    classify_superscripts,
+    document_version,
+    dump_document,
+    load_document,
+    make_document_from_layout,
+    make_document_from_lines,
+    parse_layout,
+)
+
+from .test_pdftools import LAYOUT
+
+
+def word(text, xmin, xmax, ymin, ymax):
+    return Word(text=text, xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax)
+
+
+def structure(doc):
+    return [
+        [
+            [
+                (w.text, w.xmin, w.xmax, w.ymin, w.ymax, w.superscript)
+                for w in block.parts
+            ]
+            for block in line.parts
+        ]
+        for line in doc.parts
+    ]
+
+
+def test_parse_layout():
+    layout = parse_layout(LAYOUT)
+    assert len(layout) == 4
+    assert layout.texts == ["Deep", "learning", "R&D", "Mila", "End."]
+    assert list(layout.starts) == [0, 2, 3, 4, 5]
+    assert layout.xmin[1] == 45 / 612
+    assert layout.ymin[4] == 10 / 792 + 1
+
+
+def test_make_document_from_layout():
+    doc = make_document_from_layout(LAYOUT)
+    assert [line.text for line in doc.parts] == [
+        "Deep learning R&D",
+        "Mila",
+        "End.",
+    ]
+
+
+def test_columns_and_superscripts():
+    lines = [
+        # Two columns
+        [
+            word("Alice", 0.1, 0.15, 0.1, 0.11),
+            word("1", 0.151, 0.155, 0.097, 0.103),
+        ],
+        [word("Bob", 0.6, 0.65, 0.1, 0.11)],
+        [word("Mila", 0.1, 0.2, 0.11, 0.12)],
+        [word("Montreal", 0.6, 0.7, 0.11, 0.12)],
+        [
+            word("1", 0.1, 0.105, 0.9, 0.905),
+            word("Mila", 0.106, 0.2, 0.9, 0.91),
+        ],
+    ]
+    doc = make_document_from_lines(
+        [Line(parts=[Block(parts=words)]) for words in lines]
+    )
+    assert [line.text for line in doc.parts] == [
+        "Alice 1 Mila",
+        "Bob Montreal",
+        "1 Mila",
+    ]
+    assert [w.superscript for w in doc.parts[0].parts[0].parts] == [False, True]
+    assert classify_superscripts(doc)["alice"] == {"Mila"}
+
+
+def test_parse_layout_max_pages():
+    layout = parse_layout(LAYOUT, max_pages=1)
+    assert layout.texts == ["Deep", "learning", "R&D", "Mila"]
+
+
+def test_dump_document():
+    doc = make_document_from_layout(LAYOUT)
+    doc.parts[0].parts[0].parts[1].superscript = True
+    data = dump_document(doc)
+    assert document_version(data) == DOCUMENT_VERSION
+    assert structure(load_document(data)) == structure(doc)
+    assert load_document(b"PDOC\x00\x00\x00\x00") is None
@@ -0,0 +1,231 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from giving import given
+
+from paperoni.config import InstitutionPattern
+from paperoni.model import Link
+from paperoni.sources.scrapers import pdftools
+from paperoni.sources.scrapers.pdftools import process_pdfs
+
+
+class FakePDF:
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def __init__(self, name, processed=False):
+        self.name = name
+        self.processed = processed
+
+    def is_processed(self):
+        return self.processed
+
+    def acquire_and_process(self, progress=True, slots=None):
+        assert not progress
+        with slots:
+            with FakePDF.lock:
+                FakePDF.running += 1
+                FakePDF.max_running = max(FakePDF.max_running, FakePDF.running)
+            time.sleep(0.01)
+            with FakePDF.lock:
+                FakePDF.running -= 1
+        if self.name == "bad":
+            raise Exception("oops")
+        return True
+
+    def __str__(self):
+        return self.name
+
+
+def test_process_pdfs():
+    pdfs = [FakePDF(f"p{i}") for i in range(20)]
+    pdfs += [FakePDF("done", processed=True), FakePDF("bad")]
+    results = dict(
+        (str(pdf), success)
+        for pdf, success in process_pdfs(pdfs, workers=8, processes=2)
+    )
+    assert "done" not in results
+    assert results.pop("bad") is False
+    assert len(results) == 20 and all(results.values())
+    assert FakePDF.max_running <= 2
+
+
+def test_process_pdfs_progress():
+    pdfs = [FakePDF(f"p{i}") for i in range(5)]
+    with given() as gv:
+        progress = gv["?progress"].accum()
+        list(process_pdfs(pdfs, workers=4, processes=2))
+    assert sorted(progress) == [1, 2, 3, 4, 5]
+
+
+def test_pdftotext_slots(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        pdftools.subprocess,
+        "run",
+        lambda args, **kw: calls.append(args) or SimpleNamespace(stdout=b""),
+    )
+    slots = threading.BoundedSemaphore(1)
+    pdftools.pdftotext("a.pdf", "a.txt", slots=slots)
+    assert calls == [["pdftotext", "a.pdf", "a.txt"]]
+    # The slot was released
+    assert slots.acquire(blocking=False)
+
+
+LAYOUT = """<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<body>
+<doc>
+  <page width="612.000000" height="792.000000">
+    <flow>
+      <block xMin="10" yMin="10" xMax="100" yMax="30">
+        <line xMin="10" yMin="10" xMax="100" yMax="20">
+          <word xMin="10" yMin="10" xMax="40" yMax="20">Deep</word>
+          <word xMin="45" yMin="10" xMax="100" yMax="20">learning</word>
+        </line>
+        <line xMin="10" yMin="20" xMax="100" yMax="30">
+          <word xMin="10" yMin="20" xMax="100" yMax="30">R&amp;D</word>
+        </line>
+      </block>
+      <block xMin="10" yMin="40" xMax="100" yMax="50">
+        <line xMin="10" yMin="40" xMax="100" yMax="50">
+          <word xMin="10" yMin="40" xMax="100" yMax="50">Mila</word>
+        </line>
+      </block>
+    </flow>
+  </page>
+  <page width="612.000000" height="792.000000">
+    <flow>
+      <block xMin="10" yMin="10" xMax="100" yMax="20">
+        <line xMin="10" yMin="10" xMax="100" yMax="20">
+          <word xMin="10" yMin="10" xMax="100" yMax="20">End.</word>
+        </line>
+      </block>
+    </flow>
+  </page>
+</doc>
+</body>
+</html>
+"""
+
+
+def test_layout_to_text():
+    assert pdftools.layout_to_text(LAYOUT) == (
+        "Deep learning R&D\n\nMila\n\n\fEnd.\n\n"
+    )
+
+
+def test_acquire_and_process(config_empty, monkeypatch):
+    calls = []
+
+    def fake_pdftotext(*args, slots=None):
+        calls.append(args)
+        return SimpleNamespace(returncode=0, stdout=LAYOUT.encode("utf8"))
+
+    monkeypatch.setattr(pdftools, "pdftotext", fake_pdftotext)
+
+    pdf = pdftools.PDF(Link(type="pdf", link="test-single-pass.pdf"))
+    pdf.pdf_path.parent.mkdir(parents=True, exist_ok=True)
+    pdf.pdf_path.write_bytes(b"%PDF")
+    try:
+        assert pdf.acquire_and_process()
+        assert len(calls) == 1
+        assert pdf.data_path.read_bytes()[:2] == pdftools.GZIP_MAGIC
+        assert pdf.get_fulltext(fulldata=True) == LAYOUT
+        assert pdf.get_fulltext(fulldata=False).startswith("Deep learning")
+        assert pdf.get_document().text.startswith("Deep learning")
+    finally:
+        for path in (
+            pdf.pdf_path,
+            pdf.data_path,
+            pdf.text_path,
+            pdf.document_path,
+        ):
+            path.unlink(missing_ok=True)
+
+
+def test_acquire_first_pages(config_empty, monkeypatch):
+    calls = []
+
+    def fake_pdftotext(*args, slots=None):
+        calls.append(args)
+        return SimpleNamespace(returncode=0, stdout=LAYOUT.encode("utf8"))
+
+    monkeypatch.setattr(pdftools, "pdftotext", fake_pdftotext)
+
+    pdf = pdftools.PDF(Link(type="pdf", link="test-first-pages.pdf"), pages=1)
+    pdf.pdf_path.parent.mkdir(parents=True, exist_ok=True)
+    pdf.pdf_path.write_bytes(b"%PDF")
+    try:
+        doc = pdf.get_document()
+        assert calls == [
+            ("-f", "1", "-l", "1", "-bbox-layout", str(pdf.pdf_path), "-")
+        ]
+        assert pdf.head_path.exists() and not pdf.data_path.exists()
+        assert pdf.is_processed()
+        assert "End." not in doc.text
+        # The full text is extracted on demand
+        assert pdf.get_fulltext(fulldata=False).startswith("Deep learning")
+        assert len(calls) == 2 and "-f" not in calls[1]
+    finally:
+        for path in (
+            pdf.pdf_path,
+            pdf.data_path,
+            pdf.text_path,
+            pdf.head_path,
+            pdf.document_path,
+        ):
+            path.unlink(missing_ok=True)
+
+
+def test_cached_document(config_empty, monkeypatch):
+    pdf = pdftools.PDF(Link(type="pdf", link="test-document.pdf"))
+    pdf.data_path.parent.mkdir(parents=True, exist_ok=True)
+    pdf.data_path.write_text(LAYOUT)
+    try:
+        doc = pdf.get_document()
+        assert pdf.document_path.exists()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("The document should be cached")
+
+        monkeypatch.setattr(pdftools, "make_document_from_layout", fail)
+        cached = pdf.get_document()
+        assert [line.text for line in cached.parts] == [
+            line.text for line in doc.parts
+        ]
+
+        # Outdated documents are deleted
+        root = pdf.document_path.parent
+        assert pdftools.cleanup_documents(root) == 0
+        pdf.data_path.unlink()
+        assert pdftools.cleanup_documents(root) == 1
+        assert not pdf.document_path.exists()
+    finally:
+        for path in (pdf.data_path, pdf.document_path):
+            path.unlink(missing_ok=True)
+
+
+def test_institution_matcher():
+    patterns = [
+        InstitutionPattern(pattern=".*universit", category="academia"),
+        InstitutionPattern(pattern=".*(inc|corp)\\b", category="industry"),
+        InstitutionPattern(pattern="mila", category="academia"),
+    ]
+    matcher = pdftools.InstitutionMatcher(patterns)
+    assert matcher.regexp is not None
+    assert matcher.match("McGill University") is patterns[0]
+    assert matcher.match("Google Inc.") is patterns[1]
+    assert matcher.match("MILA, Montreal") is patterns[2]
+    assert matcher.match("Montreal, Mila") is None
+
+    # Patterns that cannot be combined are tried one by one
+    patterns.append(
+        InstitutionPattern(pattern="(?P<p0>x)", category="industry")
+    )
+    matcher = pdftools.InstitutionMatcher(patterns)
+    assert matcher.regexp is None
+    assert matcher.match("Google Inc.") is patterns[1]
+    assert matcher.match("x") is patterns[3]
@@ -0,0 +1,17 @@
+from importlib import import_module
+from pathlib import Path
+
+from paperoni.sources import scrapers
+from paperoni.sources.scrapers import load_scraper, scraper_entry_points
+
+
+def test_entry_points_match_modules():
+    # Every scraper that a module declares must be in the registry
+    declared = {}
+    for file in Path(scrapers.__file__).parent.glob("*.py"):
+        if not file.name.startswith("__"):
+            mod = import_module(f"{scrapers.__name__}.{file.stem}")
+            declared.update(getattr(mod, "__scrapers__", {}))
+    assert declared == {
+        name: load_scraper(name) for name in scraper_entry_points
+    }
@@ -1,10 +1,19 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
 import coleo
 import pytest
 from giving import given
 from pytest import fixture
+from requests import HTTPError
 
 from paperoni.model import Paper
-from paperoni.sources.scrapers.semantic_scholar import SemanticScholarScraper
+from paperoni.sources.scrapers import semantic_scholar
+from paperoni.sources.scrapers.semantic_scholar import (
+    SemanticScholarQueryManager,
+    SemanticScholarScraper,
+)
 from paperoni.utils import QueryError
 
 from .utils import controller_from_generator, isin
@@ -159,3 +168,147 @@ def test_acquire(scraper_y):
     papers = list(scraper_y.acquire())
     print(len(papers))
     assert len(papers) > 900
+
+
+def test_batch_split(config_empty, monkeypatch):
+    ss = SemanticScholarQueryManager()
+    requests = []
+
+    def post(url, params=None, json=None, headers={}):
+        ids = json["ids"]
+        requests.append(ids)
+        if "bad" in ids:
+            raise QueryError("bad id")
+        return [None if i.startswith("x") else {"id": i} for i in ids]
+
+    monkeypatch.setattr(ss.conn, "post", post)
+
+    ids = ["a", "b", "xc", "bad", "e", "f", "g"]
+    results = list(ss._batch("paper/batch", ids, fields=(), block_size=4))
+    assert [i for i, _ in results] == ids
+    assert [d and d["id"] for _, d in results] == [
+        "a",
+        "b",
+        None,
+        None,
+        "e",
+        "f",
+        "g",
+    ]
+    assert requests[0] == ["a", "b", "xc", "bad"]
+    assert ["e", "f", "g"] in requests
+    assert ["bad"] in requests
+
+
+def test_papers_bad_entry(config_empty, monkeypatch):
+    ss = SemanticScholarQueryManager()
+
+    def post(url, params=None, json=None, headers={}):
+        return [{"title": i} if i != "bad" else {"id": i} for i in json["ids"]]
+
+    monkeypatch.setattr(ss.conn, "post", post)
+    monkeypatch.setattr(ss, "_wrap_paper", lambda data: data["title"])
+
+    results = list(ss.papers(["a", "bad", "c"]))
+    assert results == [("a", "a"), ("bad", None), ("c", "c")]
+
+
+def test_acquire_progress(scraper, monkeypatch):
+    monkeypatch.setattr(
+        scraper,
+        "generate_ids",
+        lambda scraper: [
+            ("Alice", ["1", "2", "3"], datetime(2020, 1, 1), datetime.now())
+        ],
+    )
+    monkeypatch.setattr(
+        SemanticScholarQueryManager,
+        "author_papers",
+        lambda self, ssid, block_size, mark: [],
+    )
+    with given() as gv:
+        progress = gv["?progress"].accum()
+        list(scraper.acquire())
+    assert sorted(progress) == [1, 2, 3]
+
+
+def http_error(status):
+    return HTTPError(response=SimpleNamespace(status_code=status))
+
+
+def test_batch_transient_error(config_empty, monkeypatch):
+    ss = SemanticScholarQueryManager()
+    requests = []
+
+    def post(url, params=None, json=None, headers={}):
+        requests.append(json["ids"])
+        if len(requests) == 1:
+            raise http_error(429)
+        return [{"id": i} for i in json["ids"]]
+
+    monkeypatch.setattr(ss.conn, "post", post)
+
+    results = list(
+        ss._batch("paper/batch", ["a", "b"], fields=(), block_size=4)
+    )
+    assert results == [("a", {"id": "a"}), ("b", {"id": "b"})]
+    # The whole chunk is retried rather than split
+    assert requests == [["a", "b"], ["a", "b"]]
+
+    def fail(url, params=None, json=None, headers={}):
+        requests.append(json["ids"])
+        raise http_error(503)
+
+    monkeypatch.setattr(ss.conn, "post", fail)
+    monkeypatch.setattr(semantic_scholar, "BATCH_RETRY_TIME", 0)
+    requests.clear()
+    with pytest.raises(HTTPError):
+        list(ss._batch("paper/batch", ["a", "b"], fields=(), block_size=4))
+    assert requests == [["a", "b"]]
+
+
+def test_acquire_resume(scraper, monkeypatch):
+    monkeypatch.setattr(
+        scraper,
+        "generate_ids",
+        lambda scraper: [
+            ("Alice", ["1"], datetime(2020, 1, 1), datetime.now())
+        ],
+    )
+    offsets = []
+    failures = [2]
+
+    def evaluate(self, path, offset, **params):
+        offsets.append(offset)
+        if offset in failures:
+            raise QueryError("Too many requests")
+        data = [{"title": f"p{i}"} for i in range(offset, min(offset + 2, 5))]
+        return (
+            {"data": data, "next": offset + 2} if offset < 3 else {"data": data}
+        )
+
+    monkeypatch.setattr(SemanticScholarQueryManager, "_evaluate", evaluate)
+    monkeypatch.setattr(
+        SemanticScholarQueryManager,
+        "_wrap_paper",
+        lambda self, data: SimpleNamespace(releases=[], title=data["title"]),
+    )
+
+    entries = []
+    with pytest.raises(QueryError):
+        for entry in scraper.acquire():
+            entries.append(entry)
+    _, *papers, ckpt = entries
+    assert [p.title for p in papers] == ["p0", "p1"]
+    assert json.loads(ckpt.data) == {"cursor": 2, "done": False}
+
+    # The author is continued from the page that failed
+    failures.clear()
+    offsets.clear()
+    scraper.resume = True
+    with scraper.db as db:
+        db.import_all([ckpt], history_file=False)
+        _, *papers, ckpt = scraper.acquire()
+    assert offsets == [2, 4]
+    assert [p.title for p in papers] == ["p2", "p3", "p4"]
+    assert json.loads(ckpt.data)["done"]
@@ -0,0 +1,79 @@
+import time
+
+from paperoni.sources import acquire
+from paperoni.sources.acquire import (
+    RateLimiter,
+    concurrent_map,
+    revalidate_into,
+)
+
+
+def _slow_square(x):
+    time.sleep(0.01 * (x % 3))
+    return x * x
+
+
+def test_concurrent_map_ordered():
+    results = list(concurrent_map(_slow_square, range(20), workers=4))
+    assert results == [x * x for x in range(20)]
+
+
+def test_concurrent_map_unordered():
+    results = list(
+        concurrent_map(_slow_square, range(20), workers=4, ordered=False)
+    )
+    assert sorted(results) == [x * x for x in range(20)]
+
+
+def test_concurrent_map_serial():
+    results = list(concurrent_map(_slow_square, iter(range(5)), workers=1))
+    assert results == [0, 1, 4, 9, 16]
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(0.02)
+
+    def call(_):
+        limiter.wait()
+        return time.monotonic()
+
+    times = sorted(concurrent_map(call, range(5), workers=5))
+    assert times[-1] - times[0] >= 0.07
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers={}):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode("utf8")
+        self.headers = headers
+        self.encoding = self.apparent_encoding = "utf-8"
+
+    def raise_for_status(self):
+        assert self.status_code < 400
+
+
+def test_revalidate_into(tmp_path, monkeypatch):
+    server = {"etag": '"v1"', "text": "version 1"}
+    sent = []
+
+    def get(url, headers={}, **kwargs):
+        sent.append(headers)
+        if headers.get("If-None-Match", None) == server["etag"]:
+            return FakeResponse(304)
+        return FakeResponse(200, server["text"], {"ETag": server["etag"]})
+
+    monkeypatch.setattr(acquire.requests, "get", get)
+
+    dest = tmp_path / "page"
+    assert revalidate_into("https://x", dest)
+    assert dest.read_text() == "version 1"
+    assert "If-None-Match" not in sent[-1]
+
+    assert not revalidate_into("https://x", dest)
+    assert sent[-1]["If-None-Match"] == '"v1"'
+    assert dest.read_text() == "version 1"
+
+    server.update(etag='"v2"', text="version 2")
+    assert revalidate_into("https://x", dest)
+    assert dest.read_text() == "version 2"
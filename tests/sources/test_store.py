@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from requests_cache.models import CachedResponse
+
+from paperoni.sources import store as store_module
+from paperoni.sources.acquire import concurrent_map
+from paperoni.sources.store import ResponseStore, expiry_policies
+
+
+def _response(url, body, expires=None):
+    response = CachedResponse(
+        status_code=200,
+        url=url,
+        headers={"Content-Type": "text/plain"},
+        expires=expires,
+    )
+    response._content = body
+    return response
+
+
+def test_store_roundtrip(tmp_path):
+    store = ResponseStore(tmp_path / "store")
+    store.responses["a"] = _response("https://example.com/a", b"hello")
+    store.responses["b"] = _response("https://example.com/b", b"hello")
+
+    response = store.responses["a"]
+    assert response.content == b"hello"
+    assert response.text == "hello"
+    assert response.url == "https://example.com/a"
+    assert response.headers["Content-Type"] == "text/plain"
+
+    # Identical bodies are only stored once
+    assert len(list(store.objects.glob("*/*"))) == 1
+    assert set(store.responses) == {"a", "b"}
+    assert store.stats() == [("example.com", 2, 10)]
+
+
+def test_store_concurrent(tmp_path):
+    store = ResponseStore(tmp_path / "store")
+
+    def write(i):
+        key = f"k{i}"
+        store.responses[key] = _response(f"https://x.com/{i}", b"%d" % (i % 5))
+        return store.responses[key].content
+
+    results = list(concurrent_map(write, range(50), workers=8))
+    assert results == [b"%d" % (i % 5) for i in range(50)]
+    assert len(store.responses) == 50
+
+
+def test_store_cleanup(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "ORPHAN_GRACE_PERIOD", -1)
+    store = ResponseStore(tmp_path / "store")
+    past = datetime.now() - timedelta(days=1)
+    store.responses["old"] = _response("https://a.com/1", b"old", expires=past)
+    store.responses["new"] = _response("https://a.com/2", b"new")
+    store.responses["other"] = _response("https://b.com/1", b"other")
+
+    assert store.cleanup() == {"evicted": 1, "deleted": 1}
+    assert set(store.responses) == {"new", "other"}
+
+    assert store.cleanup(hosts=["b.com"]) == {"evicted": 1, "deleted": 1}
+    assert set(store.responses) == {"new"}
+    assert store.responses["new"].content == b"new"
+
+
+def test_expiry_policies():
+    policies = expiry_policies({"*.openreview.net": -1, "x.com": 0, "y": 2})
+    assert policies == {
+        "*.openreview.net": -1,
+        "x.com": 0,
+        "y": timedelta(days=2),
+    }
@@ -0,0 +1,315 @@
+from datetime import datetime
+
+import pytest
+
+from paperoni import model as M
+from paperoni.db import merge
+from paperoni.db.database import Database
+from paperoni.db.lsh import LSHIndex, jaccard, shingles
+from paperoni.db.merge import (
+    author_block_key,
+    merge_authors_fuzzy,
+    merge_checkpoint,
+    merge_checkpoint_entry,
+    merge_papers_by_name,
+    merge_papers_fuzzy,
+)
+from paperoni.db.plan import (
+    affected_rows,
+    estimate_time,
+    group_sizes,
+    read_plan,
+    size_bucket,
+    write_plan,
+)
+from paperoni.model import AuthorMerge, PaperMerge
+from paperoni.utils import EquivalenceGroups
+
+
+def test_author_block_key():
+    assert author_block_key("Yoshua Bengio") == ("bengio", "y")
+    assert author_block_key("Y. Bengio") == ("bengio", "y")
+    assert author_block_key("Bengio, Yoshua") == ("bengio", "y")
+    assert author_block_key("Jean-Luc Godard Jr.") == ("godard", "j")
+    assert author_block_key("Bengio") is None
+
+
+def _paper(title, authors, venue, year):
+    return M.Paper(
+        title=title,
+        abstract="",
+        authors=[
+            M.PaperAuthor(
+                author=M.Author(name=name, roles=[], aliases=[], links=[]),
+                affiliations=[],
+            )
+            for name in authors
+        ],
+        releases=[
+            M.Release(
+                venue=M.Venue(
+                    type=M.VenueType.conference,
+                    name=f"{venue} {year}",
+                    series=venue,
+                    date=datetime(year, 1, 1),
+                    date_precision=M.DatePrecision.year,
+                    volume=None,
+                    publisher=None,
+                    aliases=[],
+                    links=[],
+                ),
+                status="published",
+                pages=None,
+            )
+        ],
+        topics=[],
+        links=[],
+        citation_count=0,
+    )
+
+
+@pytest.fixture
+def fuzzy_db(config_empty, tmp_path):
+    db = Database(tmp_path / "fuzzy.db")
+    papers = [
+        _paper(
+            "Paper one",
+            ["Yoshua Bengio", "Aaron Courville", "Ian Goodfellow"],
+            "NeurIPS",
+            2019,
+        ),
+        _paper(
+            "Paper two",
+            ["Y. Bengio", "A. Courville", "I. Goodfellow"],
+            "NeurIPS",
+            2020,
+        ),
+        _paper("Paper three", ["Yves Bengio", "Jane Doe"], "ICML", 2020),
+    ]
+    db.import_all(papers, history_file=False)
+    with db:
+        yield db
+
+
+def test_merge_authors_fuzzy(fuzzy_db):
+    eqv = EquivalenceGroups()
+    merge_authors_fuzzy(fuzzy_db, eqv)
+    names = sorted(eqv.names[main] for main in eqv.groups())
+    assert len(names) == 3
+    assert {name.split()[-1] for name in names} == {
+        "Bengio",
+        "Courville",
+        "Goodfellow",
+    }
+    # Yves Bengio has nothing in common with Yoshua Bengio
+    assert all(len(ids) == 2 for ids in eqv.groups().values())
+
+
+def test_lsh_candidates():
+    titles = {
+        "a": "Attention is all you need for sequence transduction",
+        "b": "Attention Is All You Need for Sequence-Transduction.",
+        "c": "Generative adversarial networks for image synthesis",
+    }
+    index = LSHIndex(bands=8, rows=4)
+    for key, title in titles.items():
+        index.add(key, shingles(title))
+    assert index.candidates() == {("a", "b")}
+    assert jaccard(shingles(titles["a"]), shingles(titles["b"])) == 1
+    assert jaccard(shingles(titles["a"]), shingles(titles["c"])) < 0.2
+
+
+def test_merge_papers_fuzzy(config_empty, tmp_path, monkeypatch):
+    authors = ["Yoshua Bengio", "Aaron Courville", "Pascal Vincent"]
+    papers = [
+        _paper(
+            "Representation learning: a review and new perspectives",
+            authors,
+            "TPAMI",
+            2013,
+        ),
+        _paper(
+            "Representation Learning - A Review and New Perspectives",
+            ["Y. Bengio", "A. Courville", "P. Vincent"],
+            "arXiv",
+            2012,
+        ),
+        # Same title, different authors
+        _paper(
+            "Representation learning: a review and new perspective",
+            ["Jane Doe", "John Smith"],
+            "Blog",
+            2014,
+        ),
+    ]
+    db = Database(tmp_path / "fuzzy.db")
+    db.import_all(papers, history_file=False)
+    with db:
+        eqv = EquivalenceGroups()
+        merge_papers_fuzzy(db, eqv)
+        groups = [
+            ids
+            for main, ids in eqv.groups().items()
+            if eqv.classes[main] is PaperMerge
+        ]
+        assert len(groups) == 1
+        (ids,) = groups
+        titles = dict(
+            tuple(row)
+            for row in db.session.execute(
+                "SELECT hex(paper_id), title FROM paper"
+            )
+        )
+        assert sorted(titles[entry.id] for entry in ids) == [
+            "Representation Learning - A Review and New Perspectives",
+            "Representation learning: a review and new perspectives",
+        ]
+
+    # The bands of the papers are saved, so that the next runs only hash
+    # the papers that were added or changed
+    hashed = []
+    band_keys = LSHIndex.band_keys
+
+    def count_band_keys(self, hashes):
+        hashed.append(hashes)
+        return band_keys(self, hashes)
+
+    monkeypatch.setattr(LSHIndex, "band_keys", count_band_keys)
+    # The authors are queried in chunks of papers
+    monkeypatch.setattr(merge, "FUZZY_PAPER_CHUNK_SIZE", 1)
+    db.import_all(
+        [
+            _paper(
+                "An unrelated paper about something else",
+                ["Jane Doe"],
+                "ICML",
+                2020,
+            )
+        ],
+        history_file=False,
+    )
+    with db:
+        eqv = EquivalenceGroups()
+        merge_papers_fuzzy(db, eqv)
+        assert len(hashed) == 1
+        assert [
+            len(ids)
+            for main, ids in eqv.groups().items()
+            if eqv.classes[main] is PaperMerge
+        ] == [2]
+
+    # The bands of the papers that were merged away are removed
+    db.import_all(eqv, history_file=False)
+    with db:
+        merge_papers_fuzzy(db, EquivalenceGroups())
+        ((nbands,),) = db.session.execute(
+            "SELECT count(*) FROM scraper_data WHERE scraper = :scope",
+            {"scope": merge.FUZZY_PAPER_BANDS_SCOPE},
+        )
+        ((npapers,),) = db.session.execute("SELECT count(*) FROM paper")
+        assert nbands == npapers == 3
+
+
+def test_merge_incremental(config_empty, tmp_path):
+    old = datetime(2020, 1, 1)
+    new = datetime(2023, 1, 1)
+    title1 = "A paper that was acquired twice a long time ago"
+    title2 = "A paper that was acquired again just now"
+    db = Database(tmp_path / "incremental.db")
+    db.import_all(
+        [
+            M.Meta(scraper="test", date=old),
+            _paper(title1, ["Alice Smith"], "ICML", 2019),
+            _paper(title1, ["Alice Smith"], "arXiv", 2019),
+            _paper(title2, ["Bob Smith"], "ICML", 2020),
+            M.Meta(scraper="test", date=new),
+            _paper(title2, ["Bob Smith"], "NeurIPS", 2022),
+        ],
+        history_file=False,
+    )
+    with db:
+        titles = dict(
+            tuple(row)
+            for row in db.session.execute(
+                "SELECT hex(paper_id), title FROM paper"
+            )
+        )
+
+        def merged(since):
+            eqv = EquivalenceGroups()
+            merge_papers_by_name(db, eqv, since=since)
+            return sorted(
+                {titles[entry.id] for entry in ids}.pop()
+                for main, ids in eqv.groups().items()
+                if eqv.classes[main] is PaperMerge
+            )
+
+        assert merged(None) == [title2, title1]
+        assert merged(new.timestamp()) == [title2]
+        assert merged(datetime(2024, 1, 1).timestamp()) == []
+
+        assert merge_checkpoint(db, "paper_name") is None
+        db.import_all(
+            [merge_checkpoint_entry("paper_name", new.timestamp())],
+            history_file=False,
+        )
+        assert merge_checkpoint(db, "paper_name") == new.timestamp()
+
+
+def test_size_bucket():
+    assert [size_bucket(n) for n in (2, 3, 4, 7, 8, 20)] == [
+        "2",
+        "3",
+        "4-7",
+        "4-7",
+        "8-15",
+        "16-31",
+    ]
+
+
+def test_merge_plan(config_empty, tmp_path):
+    title = "A paper that was acquired three times"
+    db = Database(tmp_path / "plan.db")
+    db.import_all(
+        [
+            _paper(title, ["Alice Smith", "Bob Smith"], "ICML", 2019),
+            _paper(title, ["A. Smith", "B. Smith"], "arXiv", 2019),
+            _paper(title, ["Alice Smith", "B. Smith"], "NeurIPS", 2019),
+        ],
+        history_file=False,
+    )
+
+    def count(table):
+        ((n,),) = db.session.execute(f"SELECT count(*) FROM {table}")
+        return n
+
+    with db:
+        eqv = EquivalenceGroups()
+        merge_papers_by_name(db, eqv)
+        merges = list(eqv.merges())
+
+        assert group_sizes(merges) == {
+            PaperMerge: {"3": 1},
+            AuthorMerge: {"2": 2},
+        }
+        rows = affected_rows(db, merges)
+        assert rows[PaperMerge]["paper"] == 3
+        assert rows[PaperMerge]["paper_author"] == 6
+        assert rows[PaperMerge]["paper_release"] == 3
+        assert rows[AuthorMerge]["author"] == 4
+
+        # The estimate does not change the database
+        assert estimate_time(db, merges) > 0
+        assert count("paper") == 3
+
+    write_plan(merges, tmp_path / "plan.jsonl")
+    plan = read_plan(tmp_path / "plan.jsonl")
+    assert sorted(type(m).__name__ for m in plan) == [
+        "AuthorMerge",
+        "AuthorMerge",
+        "PaperMerge",
+    ]
+    db.import_all(plan, history_file=False)
+    with db:
+        assert count("paper") == 1
+        assert count("author") == 2
@@ -0,0 +1,39 @@
+from giving import given
+
+from paperoni.profiling import Profile, percentile, profiled, profiled_iter
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile([3], 95) == 3
+    assert percentile([], 50) == 0.0
+
+
+def test_profile():
+    with Profile() as prof:
+        for i in range(3):
+            with profiled("readpage", key="example.com") as event:
+                event["bytes"] = 100
+        with profiled("pdftotext"):
+            pass
+    # Events are not collected once the profile is stopped
+    with profiled("pdftotext"):
+        pass
+
+    summary = prof.summary()
+    assert summary["readpage[example.com]"]["count"] == 3
+    assert summary["readpage[example.com]"]["bytes"] == 300
+    assert summary["pdftotext"]["count"] == 1
+    assert "readpage[example.com]" in prof.format()
+
+
+def test_profiled_iter():
+    with given() as gv:
+        events = gv.where(situation="profile").accum()
+        assert list(profiled_iter("search.fetch", range(5))) == [0, 1, 2, 3, 4]
+        # Abandoned iterations are also reported
+        for x in profiled_iter("search.fetch", range(5)):
+            break
+    assert [e["items"] for e in events] == [5, 1]
@@ -0,0 +1,54 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Modules that are slow to import or set up, and that the commands that do
+# not need them should not load
+HEAVY_MODULES = [
+    "bibtexparser",
+    "fake_useragent",
+    "openreview",
+    "questionary",
+    "paperoni.sources.helpers",
+    "paperoni.sources.scrapers.pdftools",
+    "paperoni.sources.scrapers.refine",
+]
+
+
+def imported_modules(code):
+    # A fresh interpreter, since the tests import most modules
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import json, sys; {code}; print(json.dumps(list(sys.modules)))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(json.loads(proc.stdout.splitlines()[-1]))
+
+
+def test_cli_startup():
+    modules = imported_modules("import paperoni.cli")
+    assert not modules & set(HEAVY_MODULES)
+
+
+def test_cli_scraper_commands():
+    modules = imported_modules(
+        "from paperoni.cli import scraper_commands;"
+        " scraper_commands(['acquire', 'semantic_scholar'])"
+    )
+    assert "paperoni.sources.scrapers.semantic_scholar" in modules
+    assert "paperoni.sources.helpers" in modules
+    assert "paperoni.sources.scrapers.refine" not in modules
+
+
+@pytest.mark.parametrize(
+    "module", ["paperoni.sources.scrapers.refine", "paperoni.webapp.search"]
+)
+def test_no_user_agent_on_import(module):
+    assert "fake_useragent" not in imported_modules(f"import {module}")
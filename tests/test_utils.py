@@ -10,11 +10,13 @@ from paperoni.utils import (
     asciiify,
     associate,
     canonicalize_links,
+    consistent,
     covguard,
     covguard_fn,
     extract_date,
     get_uuid_tag,
     is_canonical_uuid,
+    normalized,
     similarity,
     squash_text,
     tag_uuid,
@@ -41,6 +43,15 @@ def test_squash_text():
         assert squash_text(x) == y
 
 
+def test_normalized():
+    name = normalized("Jean-Luc O'Brien")
+    assert normalized("Jean-Luc O'Brien") is name
+    assert name.plain == "jean luc obrien"
+    assert name.squashed == "jeanlucobrien"
+    assert name.bag == {"jean", "luc", "obrien", "j", "l", "o"}
+    assert name.initials == {"j", "l", "o"}
+
+
 def test_extract_date():
     tests = {
         "Jan 06, 2023": (2023, 1, 6, DatePrecision.day),
@@ -242,6 +253,54 @@ def test_associate_real_close_initials():
     assert associate(names1, names2) == [(0, 1), (1, 0)]
 
 
+def _associate_full_matrix(names1, names2):
+    matrix = [
+        (similarity(n1, n2), i, j)
+        for i, n1 in enumerate(names1)
+        for j, n2 in enumerate(names2)
+    ]
+    results = []
+    to_process1 = set(range(len(names1)))
+    to_process2 = set(range(len(names2)))
+    matrix.sort(reverse=True)
+    for sim, i, j in matrix:
+        if i not in to_process1 or j not in to_process2:
+            continue
+        elif sim >= 0.7 or (sim >= 0.4 and consistent([names1[i], names2[j]])):
+            to_process1.discard(i)
+            to_process2.discard(j)
+            results.append((i, j))
+        else:
+            break
+    results += [(i, None) for i in to_process1]
+    results += [(None, j) for j in to_process2]
+    results.sort(key=lambda x: x[1] if x[0] is None else x[0])
+    return results
+
+
+def test_associate_same_as_full_matrix():
+    rng = random.Random(1234)
+    firsts = ["James", "Annette", "Jean-Luc", "José", "Li", "Ann", "Anne"]
+    lasts = ["Smith", "Smeth", "O'Neil", "Lee", "Li", "Larochelle"]
+
+    def name():
+        return f"{rng.choice(firsts)} {rng.choice(lasts)}"
+
+    def vary(n):
+        first, last = n.split(" ")
+        return rng.choice(
+            [n, f"{first[0]}. {last}", f"{last}, {first}", name()]
+        )
+
+    for _ in range(200):
+        names1 = [name() for _ in range(rng.randint(0, 8))]
+        names2 = [vary(n) for n in names1] + [name()]
+        rng.shuffle(names2)
+        assert associate(names1, names2) == _associate_full_matrix(
+            names1, names2
+        )
+
+
 def test_covguard():
     with given() as gv:
         gv.where(a=1, b=2, c=3).fail_if_empty()